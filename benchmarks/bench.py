@@ -0,0 +1,318 @@
+"""Benchmarks of julia_brot, written to a JSON file and compared against a baseline.
+
+Run from the root of the repository, with the package built or installed::
+
+    python benchmarks/bench.py -o results.json
+    python benchmarks/bench.py --compare baseline.json
+
+Every metric records whether lower or higher values are better, so that `--compare`
+flags the metrics that got worse than the baseline by more than `--tolerance` and
+exits with a non-zero status.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from julia_brot.common import _colorize, _handle_img, _normalize
+from julia_brot.engine import simd_level
+from julia_brot.julia import fast_julia
+from julia_brot.mandelbrot import fast_mandelbrot
+from julia_brot.mandelbrot_set import _generate_mandelbrot_img
+from julia_brot.parallel import max_threads, openmp_enabled
+
+# Viewports of the kernel benchmarks: (zmin, zmax, max_iter).
+VIEWPORTS = {
+    "interior": (-0.6 - 0.4j, 0.2 + 0.4j, 500),
+    "boundary": (-0.7440 + 0.1305j, -0.7425 + 0.1320j, 500),
+    "exterior": (0.5 + 0.5j, 1.5 + 1.5j, 500),
+}
+JULIA_C = -0.8 + 0.156j
+
+Metrics = Dict[str, Dict[str, object]]
+
+
+def _best_time(function: Callable, repeat: int) -> float:
+    """Shortest wall time of `repeat` calls, after a warm-up call."""
+    function()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _metric(metrics: Metrics, name: str, value: float, unit: str, better: str):
+    metrics[name] = {"value": value, "unit": unit, "better": better}
+
+
+def bench_kernels(metrics: Metrics, size: int, repeat: int):
+    """Pixels and iterations per second of the kernels on typical viewports."""
+    for name, (zmin, zmax, max_iter) in VIEWPORTS.items():
+        pixel_size = (zmax.real - zmin.real) / size
+        counts = np.asarray(
+            fast_mandelbrot(zmin, zmax, pixel_size, max_iter, 1, symmetry=False)
+        )
+        seconds = _best_time(
+            lambda: fast_mandelbrot(
+                zmin, zmax, pixel_size, max_iter, 1, symmetry=False
+            ),
+            repeat,
+        )
+        _metric(metrics, f"kernel.mandelbrot.{name}.seconds", seconds, "s", "lower")
+        _metric(
+            metrics,
+            f"kernel.mandelbrot.{name}.pixels_per_s",
+            counts.size / seconds,
+            "1/s",
+            "higher",
+        )
+        # Nominal iterations: the escape counts, whatever the kernel skips.
+        _metric(
+            metrics,
+            f"kernel.mandelbrot.{name}.iterations_per_s",
+            float(counts.sum(dtype=np.int64)) / seconds,
+            "1/s",
+            "higher",
+        )
+    pixel_size = 4 / size
+    counts = np.asarray(
+        fast_julia(JULIA_C, -2 - 2j, 2 + 2j, pixel_size, 500, 1, symmetry=False)
+    )
+    seconds = _best_time(
+        lambda: fast_julia(
+            JULIA_C, -2 - 2j, 2 + 2j, pixel_size, 500, 1, symmetry=False
+        ),
+        repeat,
+    )
+    _metric(metrics, "kernel.julia.seconds", seconds, "s", "lower")
+    _metric(
+        metrics,
+        "kernel.julia.iterations_per_s",
+        float(counts.sum(dtype=np.int64)) / seconds,
+        "1/s",
+        "higher",
+    )
+
+
+def bench_threads(metrics: Metrics, size: int, repeat: int):
+    """Speedup of the boundary viewport with the number of threads."""
+    zmin, zmax, max_iter = VIEWPORTS["boundary"]
+    pixel_size = (zmax.real - zmin.real) / size
+    threads = [1]
+    while threads[-1] * 2 <= max_threads():
+        threads.append(threads[-1] * 2)
+    if threads[-1] != max_threads():
+        threads.append(max_threads())
+    single = None
+    for n in threads:
+        seconds = _best_time(
+            lambda: fast_mandelbrot(zmin, zmax, pixel_size, max_iter, n), repeat
+        )
+        single = single or seconds
+        _metric(metrics, f"threads.{n}.seconds", seconds, "s", "lower")
+        _metric(metrics, f"threads.{n}.speedup", single / seconds, "x", "higher")
+
+
+def bench_colour(metrics: Metrics, size: int, repeat: int):
+    """Cost of colouring integer and smooth counts, and of `_normalize`."""
+    counts = np.asarray(fast_mandelbrot(-2 - 2j, 2 + 2j, 4 / size, 600))
+    smooth = np.asarray(
+        fast_mandelbrot(-2 - 2j, 2 + 2j, 4 / size, 600, dtype=np.float32)
+    )
+    _metric(
+        metrics,
+        "colour.integer.seconds",
+        _best_time(lambda: _colorize(counts), repeat),
+        "s",
+        "lower",
+    )
+    _metric(
+        metrics,
+        "colour.smooth.seconds",
+        _best_time(lambda: _colorize(smooth), repeat),
+        "s",
+        "lower",
+    )
+    _metric(
+        metrics,
+        "colour.normalize.seconds",
+        _best_time(lambda: _normalize(smooth), repeat),
+        "s",
+        "lower",
+    )
+
+
+def bench_png(metrics: Metrics, size: int, repeat: int):
+    """Time to save an image as a PNG file."""
+    img = _generate_mandelbrot_img(-2 - 2j, 2 + 2j, 4 / size, 200)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "out.png")
+        seconds = _best_time(lambda: _handle_img(img, path, show=False), repeat)
+        _metric(metrics, "png.save.seconds", seconds, "s", "lower")
+        _metric(metrics, "png.size.bytes", os.path.getsize(path), "B", "lower")
+
+
+def bench_memory(metrics: Metrics, size: int, repeat: int):
+    """Peak memory allocated while generating an image."""
+    _generate_mandelbrot_img(-2 - 2j, 2 + 2j, 4 / size, 200)
+    tracemalloc.start()
+    _generate_mandelbrot_img(-2 - 2j, 2 + 2j, 4 / size, 200)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    _metric(metrics, "memory.generate_img.peak_bytes", peak, "B", "lower")
+    _metric(
+        metrics, "memory.generate_img.bytes_per_pixel", peak / size**2, "B", "lower"
+    )
+
+
+def _cold_start(code: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, capture_output=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_startup(metrics: Metrics, size: int, repeat: int):
+    """Cold start of the interpreter, of `import julia_brot` and of the CLI."""
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "out.png")
+        cli = (
+            "import sys; from julia_brot.mandelbrot_set import _plot_mandelbrot_cli; "
+            f"sys.argv = ['MandelBrotPlot', '--no-show', '-o', {output!r}]; "
+            "_plot_mandelbrot_cli()"
+        )
+        _metric(
+            metrics, "startup.python.seconds", _cold_start("pass", repeat), "s", "lower"
+        )
+        _metric(
+            metrics,
+            "startup.import.seconds",
+            _cold_start("import julia_brot", repeat),
+            "s",
+            "lower",
+        )
+        _metric(metrics, "startup.cli.seconds", _cold_start(cli, repeat), "s", "lower")
+
+
+BENCHMARKS = {
+    "kernels": bench_kernels,
+    "threads": bench_threads,
+    "colour": bench_colour,
+    "png": bench_png,
+    "memory": bench_memory,
+    "startup": bench_startup,
+}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Print the ratios of the metrics to the baseline.
+
+    Parameters
+    ----------
+    results : dict
+        Current results.
+    baseline : dict
+        Results of the baseline.
+    tolerance : float
+        Relative change beyond which a metric getting worse is a regression.
+
+    Returns
+    -------
+    List[str]
+        Names of the regressed metrics.
+    """
+    regressions = []
+    print(f"{'metric':48} {'baseline':>12} {'current':>12} {'ratio':>7}")
+    for name, metric in results["metrics"].items():
+        old = baseline["metrics"].get(name)
+        if old is None or not old["value"]:
+            continue
+        ratio = metric["value"] / old["value"]
+        worse = (
+            ratio > 1 + tolerance
+            if metric["better"] == "lower"
+            else ratio < 1 - tolerance
+        )
+        if worse:
+            regressions.append(name)
+        print(
+            f"{name:48} {old['value']:12.4g} {metric['value']:12.4g} {ratio:7.2f}"
+            + ("  REGRESSION" if worse else "")
+        )
+    return regressions
+
+
+def main(args: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="julia_brot benchmarks.")
+    parser.add_argument("-o", "--output", help="JSON file receiving the results.")
+    parser.add_argument("--compare", help="JSON results of a baseline to compare to.")
+    parser.add_argument(
+        "--tolerance",
+        help="Relative change beyond which a metric getting worse is a regression.",
+        type=float,
+        default=0.2,
+    )
+    parser.add_argument(
+        "--only",
+        help="Comma-separated benchmarks to run, among " + ", ".join(BENCHMARKS),
+        default=",".join(BENCHMARKS),
+    )
+    parser.add_argument(
+        "--size", help="Side of the images, in pixels.", type=int, default=1000
+    )
+    parser.add_argument(
+        "--repeat",
+        help="Number of timed runs, the best one being kept.",
+        type=int,
+        default=5,
+    )
+    args = parser.parse_args(args)
+
+    metrics: Metrics = {}
+    for name in args.only.split(","):
+        print(f"Running {name}...", file=sys.stderr)
+        BENCHMARKS[name](metrics, args.size, args.repeat)
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "threads": max_threads(),
+            "openmp": openmp_enabled(),
+            "simd": simd_level(),
+            "size": args.size,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "metrics": metrics,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metrics regressed.", file=sys.stderr)
+            return 1
+    elif not args.output:
+        json.dump(results, sys.stdout, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,21 +2,97 @@
     Setup file for julia_brot.
     Use setup.cfg to configure the project.
 """
+import os
 import pathlib
+import tempfile
 
 from setuptools import Extension, setup
+from setuptools.command.build_ext import build_ext as _build_ext
 
 try:
     from Cython.Build import cythonize, build_ext
 except ImportError:
     cythonize = None
+    build_ext = _build_ext
+
+OPENMP_TEST = """
+#include <omp.h>
+int main(void) {
+    int n = 0;
+    #pragma omp parallel reduction(+:n)
+    n += 1;
+    return n > 0 ? 0 : 1;
+}
+"""
+
+
+def _openmp_flags(compiler):
+    """Find the compile and link flags enabling OpenMP with `compiler`.
+
+    Each candidate is checked by building a small OpenMP program. Setting the
+    `JULIA_BROT_NO_OPENMP` environment variable skips the detection.
+
+    Returns
+    -------
+    Tuple[List[str], List[str]]
+        Compile and link flags, both empty if OpenMP is not supported.
+    """
+    if os.getenv("JULIA_BROT_NO_OPENMP"):
+        return [], []
+    if compiler.compiler_type == "msvc":
+        candidates = [(["/openmp"], [])]
+    else:
+        candidates = [
+            (["-fopenmp"], ["-fopenmp"]),
+            # Apple clang only accepts OpenMP through the preprocessor and libomp.
+            (["-Xpreprocessor", "-fopenmp"], ["-lomp"]),
+        ]
+    with tempfile.TemporaryDirectory() as tmp:
+        src = pathlib.Path(tmp, "openmp_test.c")
+        src.write_text(OPENMP_TEST)
+        for compile_args, link_args in candidates:
+            try:
+                objects = compiler.compile(
+                    [str(src)], output_dir=tmp, extra_postargs=compile_args
+                )
+                compiler.link_executable(
+                    objects, "openmp_test", output_dir=tmp, extra_postargs=link_args
+                )
+            except Exception:  # noqa
+                continue
+            return compile_args, link_args
+    return [], []
+
+
+class OpenMPBuildExt(build_ext):
+    """`build_ext` command enabling OpenMP when the compiler supports it."""
+
+    def build_extensions(self):
+        compile_args, link_args = _openmp_flags(self.compiler)
+        if compile_args:
+            print(f"Building with OpenMP: {' '.join(compile_args)}")
+        else:
+            print("OpenMP is not available, building single-threaded kernels.")
+        if self.compiler.compiler_type != "msvc":
+            # Fused multiply-adds would round the vectorized and scalar kernels
+            # differently, and change the counts with the instruction set.
+            compile_args = compile_args + ["-ffp-contract=off"]
+        for ext in self.extensions:
+            ext.extra_compile_args = list(ext.extra_compile_args or []) + compile_args
+            ext.extra_link_args = list(ext.extra_link_args or []) + link_args
+        super().build_extensions()
+
 
 if __name__ == "__main__":
     try:
-        cmdclass = {}
+        cmdclass = {"build_ext": OpenMPBuildExt}
         extensions = {
             "julia": "src/julia_brot/julia.c",
             "mandelbrot": "src/julia_brot/mandelbrot.c",
+            "parallel": "src/julia_brot/parallel.c",
+            "engine": "src/julia_brot/engine.c",
+            "color": "src/julia_brot/color.c",
+            "perturbation": "src/julia_brot/perturbation.c",
         }
         CYTHONIZE = True
         for name, file in extensions.items():
@@ -26,7 +102,6 @@ if __name__ == "__main__":
         if CYTHONIZE:
             for name, file in extensions.items():
                 extensions[name] = file.replace(".c", ".pyx")
-            cmdclass.update({"build_ext": build_ext})
         extensions = [
             Extension(f"julia_brot.{name}", [file]) for name, file in extensions.items()
         ]
@@ -1,19 +1,47 @@
-from importlib.metadata import PackageNotFoundError  # pragma: no cover
-from importlib.metadata import version
+import importlib
 
 __author__ = "Charles Zablit"
 __copyright__ = "Charles Zablit"
 __license__ = "MIT"
 
-try:
-    dist_name = __name__
-    __version__ = version(dist_name)
-except PackageNotFoundError:  # pragma: no cover
-    __version__ = "unknown"
-finally:
-    del version, PackageNotFoundError
+# The public functions are imported on first access, keeping `import julia_brot` free
+# of numpy, matplotlib and of the compiled kernels.
+_LAZY_ATTRIBUTES = {
+    "plot_mandelbrot": ".mandelbrot_set",
+    "is_in_mandelbrot": ".mandelbrot_set",
+    "mandelbrot_escape_counts": ".mandelbrot_set",
+    "plot_julia": ".julia_set",
+    "is_in_julia": ".julia_set",
+    "julia_escape_counts": ".julia_set",
+    "IterationState": ".state",
+    "openmp_enabled": ".parallel",
+    "max_threads": ".parallel",
+}
 
-from .julia_set import is_in_julia, plot_julia
-from .mandelbrot_set import is_in_mandelbrot, plot_mandelbrot
+__all__ = list(_LAZY_ATTRIBUTES)
 
-__all__ = ["plot_mandelbrot", "is_in_mandelbrot", "plot_julia", "is_in_julia"]
+
+def _get_version() -> str:
+    """Version of the installed distribution, "unknown" if it is not installed."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version(__name__)
+    except PackageNotFoundError:  # pragma: no cover
+        return "unknown"
+
+
+def __getattr__(name):
+    if name == "__version__":
+        value = _get_version()
+    elif name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | {"__version__"})
@@ -0,0 +1,280 @@
+"""Asynchronous, cancellable renders for event loops.
+
+The renders run in an executor, the kernels releasing the GIL, while the event loop
+follows their progress through a counter of the pixels computed, updated by the
+kernels as they finish their tiles. Cancelling the task awaiting a render sets a flag
+checked by the kernels before every row of pixels, so that an abandoned render frees
+its threads within milliseconds.
+"""
+
+import asyncio
+import os
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Optional, Tuple, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from PIL.Image import Image
+
+from .common import _colorize, _grid_size
+
+if os.getenv("DOCS_BUILD", 0) == 0:
+    from julia_brot.engine import render_view
+
+ProgressCallback = Callable[[int, int], None]
+
+
+class AsyncRender:
+    """Render of a viewport in an executor, awaitable and cancellable.
+
+    Awaiting it starts the render if needed and gives its result. Iterating over it
+    with ``async for`` yields the number of pixels computed and the total number of
+    pixels while it runs. Cancelling the task awaiting or iterating over it, or
+    calling `cancel`, stops the kernels before their next row.
+
+    Parameters
+    ----------
+    zmin : complex
+        Lower bound limit.
+    zmax : complex
+        Upper bound limit.
+    pixel_size : float
+        Pixel size of the resulting plot.
+    max_iter : int
+        Maximum number of iterations.
+    julia : bool
+        Compute the Julia set of `c` instead of the Mandelbrot set.
+    c : complex
+        Julia constant, ignored for the Mandelbrot set.
+    image : bool
+        Give an RGB `Image` instead of the counts.
+    cmap : str
+        Name of the matplotlib colormap of the image.
+    executor : Optional[Executor]
+        Executor running the render, the default one of the event loop if None.
+    interval : float
+        Time between two progress reports, in seconds.
+    **options
+        Options of `_fast_mandelbrot`, such as `num_threads`, `dtype`, `method`,
+        `precision` or `supersample`.
+    """
+
+    def __init__(
+        self,
+        zmin: complex,
+        zmax: complex,
+        pixel_size: float,
+        max_iter: int,
+        julia: bool = False,
+        c: complex = 0j,
+        image: bool = False,
+        cmap: str = "inferno",
+        executor: Optional[Executor] = None,
+        interval: float = 0.02,
+        **options,
+    ):
+        self.zmin = zmin
+        self.zmax = zmax
+        self.pixel_size = pixel_size
+        self.max_iter = max_iter
+        self.julia = julia
+        self.c = complex(c)
+        self.image = image
+        self.cmap = cmap
+        self.executor = executor
+        self.interval = interval
+        self.options = {"interior_check": True, "periodicity_check": True, **options}
+        width, height = _grid_size(zmin, zmax, pixel_size)
+        adaptive = options.get("adaptive") and options.get("supersample", 1) > 1
+        self.total = (2 if adaptive else 1) * width * height
+        self._progress = np.zeros(1, dtype=np.int64)
+        self._cancel = np.zeros(1, dtype=np.uint8)
+        self._future: Optional[asyncio.Future] = None
+
+    @property
+    def done(self) -> int:
+        """Number of pixels computed so far, counted by tiles."""
+        return int(self._progress[0])
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the render was asked to stop."""
+        return bool(self._cancel[0])
+
+    def cancel(self):
+        """Stop the render, the kernels returning before their next row."""
+        self._cancel[0] = 1
+
+    def _run(self) -> Optional[Union[np.ndarray, "Image"]]:
+        counts = render_view(
+            self.zmin,
+            self.zmax,
+            self.pixel_size,
+            self.c,
+            self.max_iter,
+            julia=self.julia,
+            progress=self._progress,
+            cancel=self._cancel,
+            **self.options,
+        )
+        if self.cancelled:
+            return None
+        if not self.image:
+            return np.asarray(counts)
+        rgb = _colorize(counts, self.cmap, self.options.get("num_threads", 0))
+        from PIL import Image
+
+        return Image.fromarray(rgb)
+
+    def start(self) -> asyncio.Future:
+        """Submit the render to the executor, once.
+
+        Returns
+        -------
+        asyncio.Future
+            Future of the result of the render, None if it was cancelled.
+        """
+        if self._future is None:
+            loop = asyncio.get_running_loop()
+            self._future = loop.run_in_executor(self.executor, self._run)
+        return self._future
+
+    async def _stop(self):
+        """Cancel the render and wait for the executor to be done with it."""
+        self.cancel()
+        await asyncio.wait({self.start()})
+
+    async def __aiter__(self) -> AsyncIterator[Tuple[int, int]]:
+        future = self.start()
+        last = -1
+        try:
+            while True:
+                await asyncio.wait({future}, timeout=self.interval)
+                if self.done != last:
+                    last = self.done
+                    yield last, self.total
+                if future.done():
+                    break
+        finally:
+            if not future.done():
+                # The task iterating was cancelled, or stopped iterating.
+                self.cancel()
+
+    async def result(
+        self, progress: Optional[ProgressCallback] = None
+    ) -> Union[np.ndarray, "Image"]:
+        """Wait for the result of the render.
+
+        Parameters
+        ----------
+        progress : Optional[ProgressCallback]
+            Function called from the event loop with the number of pixels computed
+            and the total number of pixels, whenever the first one changes.
+
+        Returns
+        -------
+        Union[np.ndarray, Image]
+            Counts of shape `(height, width)`, or the image with `image=True`.
+
+        Raises
+        ------
+        asyncio.CancelledError
+            If the render was cancelled.
+        """
+        future = self.start()
+        try:
+            if progress is not None:
+                async for done, total in self:
+                    progress(done, total)
+            result = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            await self._stop()
+            raise
+        if result is None:
+            raise asyncio.CancelledError()
+        return result
+
+    def __await__(self):
+        return self.result().__await__()
+
+
+async def mandelbrot_async(
+    zmin: complex = -2 - 2j,
+    zmax: complex = 2 + 2j,
+    pixel_size: float = 0.1,
+    max_iter: int = 600,
+    progress: Optional[ProgressCallback] = None,
+    image: bool = False,
+    **options,
+) -> Union[np.ndarray, "Image"]:
+    """Compute the Mandelbrot set in an executor, without blocking the event loop.
+
+    Parameters
+    ----------
+    zmin : complex
+        Lower bound limit.
+    zmax : complex
+        Upper bound limit.
+    pixel_size : float
+        Pixel size of the resulting plot.
+    max_iter : int
+        Maximum number of iterations.
+    progress : Optional[ProgressCallback]
+        Function called with the number of pixels computed and the total number of
+        pixels as the render progresses.
+    image : bool
+        Give an RGB `Image` instead of the counts.
+    **options
+        Options of `AsyncRender`.
+
+    Returns
+    -------
+    Union[np.ndarray, Image]
+        Counts of shape `(height, width)`, or the image with `image=True`.
+    """
+    render = AsyncRender(zmin, zmax, pixel_size, max_iter, image=image, **options)
+    return await render.result(progress)
+
+
+async def julia_async(
+    c: complex,
+    zmin: complex = -2 - 2j,
+    zmax: complex = 2 + 2j,
+    pixel_size: float = 0.1,
+    max_iter: int = 600,
+    progress: Optional[ProgressCallback] = None,
+    image: bool = False,
+    **options,
+) -> Union[np.ndarray, "Image"]:
+    """Compute a Julia set in an executor, without blocking the event loop.
+
+    Parameters
+    ----------
+    c : complex
+        Julia constant.
+    zmin : complex
+        Lower bound limit.
+    zmax : complex
+        Upper bound limit.
+    pixel_size : float
+        Pixel size of the resulting plot.
+    max_iter : int
+        Maximum number of iterations.
+    progress : Optional[ProgressCallback]
+        Function called with the number of pixels computed and the total number of
+        pixels as the render progresses.
+    image : bool
+        Give an RGB `Image` instead of the counts.
+    **options
+        Options of `AsyncRender`.
+
+    Returns
+    -------
+    Union[np.ndarray, Image]
+        Counts of shape `(height, width)`, or the image with `image=True`.
+    """
+    render = AsyncRender(
+        zmin, zmax, pixel_size, max_iter, julia=True, c=c, image=image, **options
+    )
+    return await render.result(progress)
@@ -0,0 +1,318 @@
+"""Persistent cache of iteration counts.
+
+Counts are cached by square tiles of the lattice of the multiples of the pixel size,
+so that overlapping viewports share them. Tiles are stored as `.npy` files, loaded
+memory-mapped, and the least recently used ones are evicted once the cache exceeds
+its size limit.
+"""
+
+import collections
+import dataclasses
+import hashlib
+import logging
+import os
+import pathlib
+import tempfile
+import threading
+from typing import Optional, Union
+
+import numpy as np
+
+from .common import _snap_to_lattice
+
+if os.getenv("DOCS_BUILD", 0) == 0:
+    from julia_brot.engine import KERNEL_VERSION, check_method, empty_counts, render
+
+_logger = logging.getLogger(__name__)
+
+CACHE_TILE_SIZE = 256
+
+
+@dataclasses.dataclass
+class CacheStats:
+    """Counters of a `TileCache`."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class TileCache:
+    """On-disk cache of iteration count tiles with a least recently used eviction.
+
+    Parameters
+    ----------
+    directory : Union[str, os.PathLike]
+        Directory of the cache, created if needed.
+    max_bytes : int
+        Size above which the least recently used tiles are evicted.
+    tile_size : int
+        Side of the cached tiles, in pixels.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, os.PathLike],
+        max_bytes: int = 1 << 30,
+        tile_size: int = CACHE_TILE_SIZE,
+    ):
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.tile_size = tile_size
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        # Tile file names in least recently used order, with their size.
+        self._index = collections.OrderedDict()
+        files = []
+        for path in self.directory.glob("*.npy"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # pragma: no cover
+                continue
+            files.append((stat.st_mtime, path.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._index[name] = size
+        self._size = sum(self._index.values())
+
+    @property
+    def size(self) -> int:
+        """Total size of the cached tiles, in bytes."""
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def key(
+        self,
+        julia: bool,
+        c: complex,
+        col: int,
+        row: int,
+        pixel_size: float,
+        max_iter: int,
+        dtype: np.dtype,
+        method: str = "escape",
+        exact: bool = False,
+    ) -> str:
+        """Name of the file of a tile.
+
+        Parameters
+        ----------
+        julia : bool
+            Whether the tile belongs to a Julia set or to the Mandelbrot set.
+        c : complex
+            Julia constant, ignored for the Mandelbrot set.
+        col : int
+            Lattice index of the first column of the tile.
+        row : int
+            Lattice index of the first row of the tile.
+        pixel_size : float
+            Pixel size of the tile.
+        max_iter : int
+            Maximum number of iterations.
+        dtype : np.dtype
+            Type of the counts.
+        method : str
+            Rendering method of the tile.
+        exact : bool
+            Exact mode of the "mariani" method.
+
+        Returns
+        -------
+        str
+            Content address of the tile.
+        """
+        c = complex(c) if julia else 0j
+        fields = (
+            "julia" if julia else "mandelbrot",
+            c.real.hex(),
+            c.imag.hex(),
+            col,
+            row,
+            self.tile_size,
+            float(pixel_size).hex(),
+            max_iter,
+            np.dtype(dtype).str,
+            method,
+            bool(exact) and method == "mariani",
+            KERNEL_VERSION,
+        )
+        digest = hashlib.sha256(repr(fields).encode()).hexdigest()
+        return f"{digest}.npy"
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Load a cached tile.
+
+        Parameters
+        ----------
+        key : str
+            Name of the tile, as given by `key`.
+
+        Returns
+        -------
+        Optional[np.ndarray]
+            Read-only memory-mapped tile, None if it is not cached.
+        """
+        path = self.directory.joinpath(key)
+        try:
+            tile = np.load(path, mmap_mode="r")
+            os.utime(path)
+        except (FileNotFoundError, ValueError, OSError):
+            with self._lock:
+                self.stats.misses += 1
+                if key in self._index:
+                    self._size -= self._index.pop(key)
+            return None
+        with self._lock:
+            self.stats.hits += 1
+            if key in self._index:
+                self._index.move_to_end(key)
+            else:
+                self._index[key] = path.stat().st_size
+                self._size += self._index[key]
+        return tile
+
+    def put(self, key: str, tile: np.ndarray):
+        """Store a tile, evicting the least recently used ones if needed.
+
+        Parameters
+        ----------
+        key : str
+            Name of the tile, as given by `key`.
+        tile : np.ndarray
+            Iteration counts of the tile.
+        """
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, tile)
+            os.replace(tmp, self.directory.joinpath(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        size = self.directory.joinpath(key).stat().st_size
+        with self._lock:
+            self._size += size - self._index.pop(key, 0)
+            self._index[key] = size
+            while self._size > self.max_bytes and len(self._index) > 1:
+                name, old_size = self._index.popitem(last=False)
+                self._size -= old_size
+                self.stats.evictions += 1
+                try:
+                    self.directory.joinpath(name).unlink()
+                except FileNotFoundError:  # pragma: no cover
+                    pass
+
+    def clear(self):
+        """Remove every cached tile."""
+        with self._lock:
+            for name in self._index:
+                try:
+                    self.directory.joinpath(name).unlink()
+                except FileNotFoundError:  # pragma: no cover
+                    pass
+            self._index.clear()
+            self._size = 0
+
+    def render(
+        self,
+        julia: bool,
+        c: complex,
+        zmin: complex,
+        zmax: complex,
+        pixel_size: float,
+        max_iter: int,
+        dtype: Optional[np.dtype] = None,
+        num_threads: int = 0,
+        method: str = "escape",
+        exact: bool = False,
+    ) -> np.ndarray:
+        """Compute the counts of a viewport, only rendering the tiles not cached yet.
+
+        The viewport is snapped to the lattice of the multiples of `pixel_size`, which
+        moves it by less than half a pixel.
+
+        Parameters
+        ----------
+        julia : bool
+            Compute the Julia set of `c` instead of the Mandelbrot set.
+        c : complex
+            Julia constant, ignored for the Mandelbrot set.
+        zmin : complex
+            Lower bound limit.
+        zmax : complex
+            Upper bound limit.
+        pixel_size : float
+            Pixel size of the resulting plot.
+        max_iter : int
+            Maximum number of iterations.
+        dtype : Optional[np.dtype]
+            Type of the counts, the smallest integer type holding `max_iter` if None.
+        num_threads : int
+            Number of threads rendering the missing tiles, all the available ones if 0.
+        method : str
+            Rendering method of the missing tiles, "escape" or "mariani".
+        exact : bool
+            Exact mode of the "mariani" method.
+
+        Returns
+        -------
+        np.ndarray
+            Counts of shape `(height, width)`.
+        """
+        check_method(method)
+        col0, row0, width, height = _snap_to_lattice(zmin, zmax, pixel_size)
+        out = empty_counts((height, width), max_iter, dtype)
+        size = self.tile_size
+        offsets = np.arange(size)
+        for ty in range(row0 // size, -(-(row0 + height) // size)):
+            for tx in range(col0 // size, -(-(col0 + width) // size)):
+                col, row = tx * size, ty * size
+                key = self.key(
+                    julia, c, col, row, pixel_size, max_iter, out.dtype, method, exact
+                )
+                tile = self.get(key)
+                if tile is None:
+                    tile = render(
+                        (col + offsets) * pixel_size,
+                        (row + offsets) * pixel_size,
+                        c,
+                        max_iter,
+                        empty_counts((size, size), max_iter, out.dtype),
+                        julia=julia,
+                        num_threads=num_threads,
+                        interior_check=True,
+                        periodicity_check=True,
+                        method=method,
+                        exact=exact,
+                    )
+                    self.put(key, tile)
+                # Copy the part of the tile overlapping the viewport.
+                j0, i0 = max(row0, row), max(col0, col)
+                j1, i1 = min(row0 + height, row + size), min(col0 + width, col + size)
+                out[j0 - row0 : j1 - row0, i0 - col0 : i1 - col0] = tile[
+                    j0 - row : j1 - row, i0 - col : i1 - col
+                ]
+        _logger.debug(f"Tile cache: {self.stats}")
+        return out
+
+
+def as_tile_cache(
+    cache: Optional[Union["TileCache", str, os.PathLike]],
+) -> Optional[TileCache]:
+    """Open a `TileCache` from its directory.
+
+    Parameters
+    ----------
+    cache : Optional[Union[TileCache, str, os.PathLike]]
+        Tile cache, or the directory of a tile cache of the default size.
+
+    Returns
+    -------
+    Optional[TileCache]
+        The tile cache, None if `cache` is None.
+    """
+    if cache is None or isinstance(cache, TileCache):
+        return cache
+    return TileCache(cache)
@@ -0,0 +1,163 @@
+"""Colouring stage mapping iteration counts to RGB pixels through a lookup table."""
+import cython
+import numpy as np
+from cython.parallel import prange
+
+from libc.stdint cimport int32_t, uint8_t, uint16_t
+
+from julia_brot.escape cimport count_t
+from julia_brot.parallel cimport resolve_threads
+
+
+ctypedef fused index_t:
+    uint8_t
+    uint16_t
+    int32_t
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def count_range(const count_t[:, ::1] counts, int num_threads=0):
+    """Smallest and largest iteration counts, computed in a single pass.
+
+    Parameters
+    ----------
+    counts : np.ndarray
+        Iteration counts of shape `(height, width)`.
+    num_threads : int
+        Number of threads to use, all the available ones if 0.
+
+    Returns
+    -------
+    Tuple[Union[int, float], Union[int, float]]
+        Minimum and maximum of `counts`.
+    """
+    if counts.shape[0] == 0 or counts.shape[1] == 0:
+        raise ValueError("counts must not be empty")
+    cdef:
+        double[::1] lows = np.empty(counts.shape[0])
+        double[::1] highs = np.empty(counts.shape[0])
+        Py_ssize_t i, j
+        count_t lo, hi, value
+        int n = resolve_threads(num_threads)
+
+    for j in prange(counts.shape[0], nogil=True, schedule='static', num_threads=n):
+        lo = counts[j, 0]
+        hi = counts[j, 0]
+        for i in range(1, counts.shape[1]):
+            value = counts[j, i]
+            if value < lo:
+                lo = value
+            elif value > hi:
+                hi = value
+        lows[j] = lo
+        highs[j] = hi
+
+    if count_t is float:
+        return float(np.min(lows)), float(np.max(highs))
+    return int(np.min(lows)), int(np.max(highs))
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def apply_lut(const index_t[:, ::1] counts, const unsigned char[:, ::1] lut, int offset,
+              unsigned char[:, :, ::1] out, int num_threads=0):
+    """Map iteration counts to colours in one pass.
+
+    Parameters
+    ----------
+    counts : np.ndarray
+        Iteration counts of shape `(height, width)`.
+    lut : np.ndarray
+        Colour of every count, of shape `(n, channels)` and type `np.uint8`.
+    offset : int
+        Count stored in the first row of `lut`.
+    out : np.ndarray
+        Buffer of shape `(height, width, channels)` receiving the colours.
+    num_threads : int
+        Number of threads to use, all the available ones if 0.
+
+    Returns
+    -------
+    np.ndarray
+        The `out` buffer.
+    """
+    if out.shape[0] != counts.shape[0] or out.shape[1] != counts.shape[1]:
+        raise ValueError("out must have the same height and width as counts")
+    if out.shape[2] != lut.shape[1]:
+        raise ValueError("out must have as many channels as lut")
+    cdef:
+        Py_ssize_t i, j, k
+        int index
+        int channels = lut.shape[1], size = lut.shape[0]
+        int n = resolve_threads(num_threads)
+        Py_ssize_t overflow = 0
+
+    for j in prange(counts.shape[0], nogil=True, schedule='static', num_threads=n):
+        for i in range(counts.shape[1]):
+            index = counts[j, i] - offset
+            if index < 0 or index >= size:
+                overflow += 1
+                index = 0
+            for k in range(channels):
+                out[j, i, k] = lut[index, k]
+
+    if overflow:
+        raise ValueError("counts are out of the range covered by lut")
+    return out.base
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def apply_palette(const float[:, ::1] counts, const unsigned char[:, ::1] palette,
+                  float low, float high, unsigned char[:, :, ::1] out, int num_threads=0):
+    """Map smooth iteration counts to colours in one pass.
+
+    The counts are normalized between `low` and `high` and reversed, the lowest
+    counts taking the last colour of `palette`, like a matplotlib colormap would.
+
+    Parameters
+    ----------
+    counts : np.ndarray
+        Smooth iteration counts of shape `(height, width)`.
+    palette : np.ndarray
+        Colours of the colormap, of shape `(n, channels)` and type `np.uint8`.
+    low : float
+        Count taking the last colour of `palette`.
+    high : float
+        Count taking the first colour of `palette`.
+    out : np.ndarray
+        Buffer of shape `(height, width, channels)` receiving the colours.
+    num_threads : int
+        Number of threads to use, all the available ones if 0.
+
+    Returns
+    -------
+    np.ndarray
+        The `out` buffer.
+    """
+    if out.shape[0] != counts.shape[0] or out.shape[1] != counts.shape[1]:
+        raise ValueError("out must have the same height and width as counts")
+    if out.shape[2] != palette.shape[1]:
+        raise ValueError("out must have as many channels as palette")
+    if not high > low:
+        raise ValueError("high must be greater than low")
+    cdef:
+        Py_ssize_t i, j, k
+        int index
+        int channels = palette.shape[1], size = palette.shape[0]
+        float scale = size / (high - low)
+        int n = resolve_threads(num_threads)
+
+    for j in prange(counts.shape[0], nogil=True, schedule='static', num_threads=n):
+        for i in range(counts.shape[1]):
+            index = <int> ((high - counts[j, i]) * scale)
+            if index < 0:
+                index = 0
+            elif index >= size:
+                index = size - 1
+            for k in range(channels):
+                out[j, i, k] = palette[index, k]
+
+    return out.base
@@ -1,11 +1,22 @@
 import argparse
+import functools
 import logging
+import math
 import os
 import sys
-from typing import List, Optional, Union
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
 
 import numpy as np
-from PIL.Image import Image
+
+from .profiling import stage
+
+if TYPE_CHECKING:
+    from PIL.Image import Image
+
+    from .profiling import RenderProfile
+
+if os.getenv("DOCS_BUILD", 0) == 0:
+    from julia_brot.color import apply_lut, apply_palette, count_range
 
 
 def _normalize(arr: np.ndarray) -> np.ndarray:
@@ -26,7 +37,227 @@ def _normalize(arr: np.ndarray) -> np.ndarray:
     return (arr - min_) / (max_ - min_)
 
 
-def _handle_img(img: Image, filename: Optional[Union[str, bytes, os.PathLike]]):
+def _flat_points(points: np.ndarray) -> np.ndarray:
+    """Flat `np.complex128` view of an array of points.
+
+    Parameters
+    ----------
+    points : np.ndarray
+        Array of complex points of any shape.
+
+    Returns
+    -------
+    np.ndarray
+        One dimensional array, sharing its memory with `points` when they are already
+        a contiguous `np.complex128` array.
+    """
+    return np.ascontiguousarray(points, dtype=np.complex128).reshape(-1)
+
+
+def _grid_size(zmin: complex, zmax: complex, pixel_size: float) -> Tuple[int, int]:
+    """Number of columns and rows of the grid of a viewport.
+
+    Parameters
+    ----------
+    zmin : complex
+        Lower bound limit.
+    zmax : complex
+        Upper bound limit.
+    pixel_size : float
+        Pixel size of the grid.
+
+    Returns
+    -------
+    Tuple[int, int]
+        Width and height of the grid, as `np.arange` gives them.
+    """
+    width = max(0, math.ceil((zmax.real - zmin.real) / pixel_size))
+    height = max(0, math.ceil((zmax.imag - zmin.imag) / pixel_size))
+    return width, height
+
+
+def _snap_to_lattice(
+    zmin: complex, zmax: complex, pixel_size: float
+) -> Tuple[int, int, int, int]:
+    """Place a viewport on the lattice of the multiples of `pixel_size`.
+
+    Pixels on the lattice have the same coordinates whatever the viewport, so that
+    they can be shared between renders. The viewport moves by less than half a pixel.
+
+    Parameters
+    ----------
+    zmin : complex
+        Lower bound limit.
+    zmax : complex
+        Upper bound limit.
+    pixel_size : float
+        Pixel size of the grid.
+
+    Returns
+    -------
+    Tuple[int, int, int, int]
+        Lattice indices of the first column and row, then width and height of the
+        grid. The pixel of indices `(i, j)` is at `(i + j * 1j) * pixel_size`.
+    """
+    width, height = _grid_size(zmin, zmax, pixel_size)
+    return round(zmin.real / pixel_size), round(zmin.imag / pixel_size), width, height
+
+
+def _default_cache_dir() -> str:
+    """Default directory of the tile cache, following the XDG convention.
+
+    Returns
+    -------
+    str
+        `$XDG_CACHE_HOME/julia_brot`, `~/.cache/julia_brot` if the variable is not set.
+    """
+    root = os.getenv("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(root, "julia_brot")
+
+
+def _get_cmap(name: str):
+    """Get a matplotlib colormap without importing `matplotlib.pyplot`.
+
+    Parameters
+    ----------
+    name : str
+        Name of the colormap.
+
+    Returns
+    -------
+    matplotlib.colors.Colormap
+        The colormap.
+    """
+    import matplotlib
+
+    return matplotlib.colormaps[name]
+
+
+@functools.lru_cache(maxsize=64)
+def _color_lut(cmap: str, low: int, high: int) -> np.ndarray:
+    """Colour of every iteration count between `low` and `high`.
+
+    The counts go through the same normalization and colormap as a full image would,
+    so that looking them up gives exactly the same pixels.
+
+    Parameters
+    ----------
+    cmap : str
+        Name of the matplotlib colormap.
+    low : int
+        Smallest iteration count of the image.
+    high : int
+        Largest iteration count of the image.
+
+    Returns
+    -------
+    np.ndarray
+        Lookup table of shape `(high - low + 1, 3)` and type `np.uint8`.
+    """
+    counts = np.arange(low, high + 1, dtype=np.float32)
+    with np.errstate(invalid="ignore"):
+        values = 1 - _normalize(counts)
+    lut = (_get_cmap(cmap)(values)[:, :3] * 255).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+
+@functools.lru_cache(maxsize=16)
+def _color_palette(cmap: str) -> np.ndarray:
+    """Colours of a colormap.
+
+    Parameters
+    ----------
+    cmap : str
+        Name of the matplotlib colormap.
+
+    Returns
+    -------
+    np.ndarray
+        Palette of shape `(N, 3)` and type `np.uint8`, `N` being the number of colours
+        of the colormap.
+    """
+    colormap = _get_cmap(cmap)
+    palette = (colormap(np.arange(colormap.N))[:, :3] * 255).astype(np.uint8)
+    palette.flags.writeable = False
+    return palette
+
+
+def _colorize(
+    counts: np.ndarray,
+    cmap: str = "inferno",
+    num_threads: int = 0,
+    bounds: Optional[Tuple[float, float]] = None,
+    profile: Optional["RenderProfile"] = None,
+) -> np.ndarray:
+    """Colour iteration counts, the lowest counts getting the brightest colours.
+
+    Parameters
+    ----------
+    counts : np.ndarray
+        Iteration counts of shape `(height, width)`, either integer counts or
+        `np.float32` smooth counts.
+    cmap : str
+        Name of the matplotlib colormap.
+    num_threads : int
+        Number of threads to use, all the available ones if 0.
+    bounds : Optional[Tuple[float, float]]
+        Smallest and largest counts of the whole image when `counts` is only a part
+        of it, those of `counts` if None.
+    profile : Optional[RenderProfile]
+        Profile receiving the "range", "lut" and "colour" stages.
+
+    Returns
+    -------
+    np.ndarray
+        RGB image of shape `(height, width, 3)` and type `np.uint8`.
+    """
+    with stage(profile, "range"):
+        counts = np.asarray(counts)
+        if counts.dtype.kind == "f":
+            counts = np.ascontiguousarray(counts, dtype=np.float32)
+        elif counts.dtype not in (np.uint8, np.uint16, np.int32):
+            counts = counts.astype(np.int32)
+        counts = np.ascontiguousarray(counts)
+        low, high = bounds or count_range(counts, num_threads)
+    if counts.dtype.kind == "f":
+        if low == high:
+            # Like the colormap, paint constant images with its "bad" colour.
+            return np.zeros(counts.shape + (3,), dtype=np.uint8)
+        with stage(profile, "lut"):
+            palette = _color_palette(cmap)
+        with stage(profile, "colour"):
+            rgb = np.empty(counts.shape + (3,), dtype=np.uint8)
+            return apply_palette(counts, palette, low, high, rgb, num_threads)
+    with stage(profile, "lut"):
+        lut = _color_lut(cmap, low, high)
+    with stage(profile, "colour"):
+        rgb = np.empty(counts.shape + (3,), dtype=np.uint8)
+        return apply_lut(counts, lut, low, rgb, num_threads)
+
+
+def _has_display() -> bool:
+    """Check whether images can be shown to the user.
+
+    Returns
+    -------
+    bool
+        `False` on Linux and BSD systems without an X11 or Wayland display, `True`
+        otherwise.
+    """
+    if sys.platform.startswith("linux") or "bsd" in sys.platform:
+        return bool(os.getenv("DISPLAY") or os.getenv("WAYLAND_DISPLAY"))
+    return True
+
+
+def _handle_img(
+    img: "Image",
+    filename: Optional[Union[str, bytes, os.PathLike]],
+    show: Optional[bool] = None,
+    profile: Optional["RenderProfile"] = None,
+):
     """Save an `Image` if the `filename` is not None and then show it.
 
     Parameters
@@ -35,11 +266,37 @@ def _handle_img(img: Image, filename: Optional[Union[str, bytes, os.PathLike]]):
         Handle to the `Image` to save and show.
     filename : Optional[Union[str, bytes, os.PathLike]]
         Path to save the image to. Will not save if None.
+    show : Optional[bool]
+        Whether to show the image, only when a display is available if None.
+    profile : Optional[RenderProfile]
+        Profile receiving the "encode" stage.
     """
     if filename is not None:
         logging.debug(f"Saving image to {filename}")
-        img.save(filename, "PNG", quality=100, subsampling=0)
-    img.show()
+        with stage(profile, "encode"):
+            img.save(filename, "PNG", quality=100, subsampling=0)
+    if show is None:
+        show = _has_display()
+    if show:
+        img.show()
+
+
+def _report_profile(profile: Optional["RenderProfile"], path: Optional[str]):
+    """Print the breakdown of a profile to the standard error, and save it as JSON.
+
+    Parameters
+    ----------
+    profile : Optional[RenderProfile]
+        Profile of the render, nothing is reported if None.
+    path : Optional[str]
+        Path of the JSON file, not written if empty or None.
+    """
+    if profile is None:
+        return
+    print(profile.report(), file=sys.stderr)
+    if path:
+        with open(path, "w") as file:
+            file.write(profile.to_json())
 
 
 def _setup_logging(loglevel: int):
@@ -109,6 +366,105 @@ def _parse_args(args: List[str], name: str) -> argparse.Namespace:
         nargs="?",
         default=50,
     )
+    if name == "Mandelbrot":
+        parser.add_argument(
+            "--center",
+            help="Center of a deep zoom, as its real and imaginary parts written with "
+            "all their digits (ex: -0.743643887037151 0.131825904205330). Replaces "
+            "--zmin, --zmax and --pixel_size.",
+            type=str,
+            nargs=2,
+            metavar=("RE", "IM"),
+            default=None,
+        )
+        parser.add_argument(
+            "--scale",
+            help="Width of the deep zoom plot (ex: 1e-40).",
+            type=str,
+            default="4",
+        )
+        parser.add_argument(
+            "--size",
+            help="Width and height of the deep zoom plot, in pixels.",
+            type=int,
+            nargs=2,
+            metavar=("W", "H"),
+            default=[800, 600],
+        )
+    parser.add_argument(
+        "-t",
+        "--threads",
+        help="Number of threads used to compute the set, all the available ones if 0.",
+        type=int,
+        nargs="?",
+        default=0,
+    )
+    parser.add_argument(
+        "--method",
+        help="Rendering method: 'escape' computes every pixel, 'mariani' skips the "
+        "regions of uniform count.",
+        choices=["escape", "mariani"],
+        default="escape",
+    )
+    parser.add_argument(
+        "--supersample",
+        help="Anti-alias the plot with N x N samples per pixel, averaged as they are "
+        "computed.",
+        type=int,
+        metavar="N",
+        default=1,
+    )
+    parser.add_argument(
+        "--adaptive",
+        help="Only supersample the pixels whose count differs from a neighbour's.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--cache",
+        help="Reuse the tiles of previous renders stored in this directory, "
+        f"{_default_cache_dir()} if not given. The plot is aligned on a multiple of "
+        "the pixel size.",
+        type=str,
+        nargs="?",
+        const=_default_cache_dir(),
+        default=None,
+    )
+    parser.add_argument(
+        "--cache-size",
+        help="Size of the tile cache in MiB, the least recently used tiles are "
+        "evicted above it.",
+        type=int,
+        default=1024,
+    )
+    parser.add_argument(
+        "--resume",
+        help="State file of the render: a render of the same plot with fewer "
+        "iterations saved there is continued instead of restarted. Takes precedence "
+        "over --cache.",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--previews",
+        help="Render progressively, saving a preview after each coarse pass to this "
+        "path formatted with the step of the pass, e.g. 'preview_{}.png'.",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--strips",
+        help="Render by strips of this many rows, written straight to the output as a "
+        "PNG, so that the memory used does not grow with the plot size.",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--memmap",
+        help="Also write the plot by strips to this .npy file, as a memory-mapped "
+        "(height, width, 3) array.",
+        type=str,
+        default=None,
+    )
     parser.add_argument(
         "-o",
         "--output",
@@ -117,6 +473,22 @@ def _parse_args(args: List[str], name: str) -> argparse.Namespace:
         nargs="?",
         default="out.png",
     )
+    parser.add_argument(
+        "--show",
+        help="Show the plot once generated. Defaults to showing it only when a display "
+        "is available.",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+    )
+    parser.add_argument(
+        "--profile",
+        help="Print the time, memory and work of every stage of the render, and also "
+        "write them as JSON to this file if given.",
+        type=str,
+        nargs="?",
+        const="",
+        default=None,
+    )
     parser.add_argument(
         "-d",
         "--debug",
@@ -127,4 +499,19 @@ def _parse_args(args: List[str], name: str) -> argparse.Namespace:
         default=logging.WARNING,
     )
 
-    return parser.parse_args(args)
+    parsed = parser.parse_args(args)
+    if getattr(parsed, "center", None):
+        unsupported = {
+            "--method": parsed.method != "escape",
+            "--supersample": parsed.supersample != 1,
+            "--adaptive": parsed.adaptive,
+            "--cache": parsed.cache,
+            "--resume": parsed.resume,
+            "--previews": parsed.previews,
+            "--strips": parsed.strips,
+            "--memmap": parsed.memmap,
+        }
+        flags = [flag for flag, given in unsupported.items() if given]
+        if flags:
+            parser.error(f"--center does not support {', '.join(flags)}")
+    return parsed
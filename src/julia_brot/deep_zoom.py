@@ -0,0 +1,264 @@
+"""Deep zooms into the Mandelbrot set, beyond the precision of doubles.
+
+A single reference orbit, at the centre of the plot, is computed in arbitrary
+precision fixed-point arithmetic, using `gmpy2` when it is installed and Python
+integers otherwise. The pixels are then computed in double precision as offsets from
+this orbit by the `perturb` kernel. At moderate depths, the pixels can instead be
+computed directly with the double-double kernels of the engine.
+"""
+
+import logging
+import math
+import os
+import re
+from fractions import Fraction
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+try:
+    from gmpy2 import mpz as _integer
+except ImportError:  # pragma: no cover
+    _integer = int
+
+if os.getenv("DOCS_BUILD", 0) == 0:
+    from julia_brot.engine import BAILOUT, dd_grid, empty_counts, render
+    from julia_brot.perturbation import perturb
+
+_logger = logging.getLogger(__name__)
+
+# Tolerance on the relative size of the last term of the series of the offsets.
+SERIES_TOLERANCE = 1e-12
+_COMPLEX = re.compile(
+    r"\(?\s*([+-]?[^+-]+(?:[eE][+-]?\d+)?)\s*([+-]\s*[^+-]+(?:[eE][+-]?\d+)?)[jJ]\s*\)?"
+)
+
+DEEP_PRECISIONS = ("perturbation", "double-double")
+
+Center = Union[complex, str, Sequence[str]]
+
+
+def parse_center(center: Center) -> Tuple[Fraction, Fraction]:
+    """Read the exact value of the centre of a plot.
+
+    Parameters
+    ----------
+    center : Union[complex, str, Sequence[str]]
+        Centre as a complex number, as a string like "-0.75+0.1j" or as a pair of
+        strings holding its real and imaginary parts. Strings keep all their digits.
+
+    Returns
+    -------
+    Tuple[Fraction, Fraction]
+        Real and imaginary parts of the centre.
+    """
+    if isinstance(center, (complex, float, int)):
+        return Fraction(complex(center).real), Fraction(complex(center).imag)
+    if not isinstance(center, str):
+        real, imag = center
+        return Fraction(real), Fraction(imag)
+    text = center.strip().replace(" ", "")
+    match = _COMPLEX.fullmatch(text)
+    if match:
+        return Fraction(match.group(1)), Fraction(match.group(2).replace(" ", ""))
+    if text.endswith(("j", "J")):
+        return Fraction(0), Fraction(text[:-1].strip("()") or "1")
+    return Fraction(text), Fraction(0)
+
+
+def _dd_split(value: Fraction) -> Tuple[float, float]:
+    """Round a number to a double-double number."""
+    hi = float(value)
+    return hi, float(value - Fraction(hi))
+
+
+def _to_float(value, bits: int) -> float:
+    """Round a fixed-point number with `bits` fractional bits to a double."""
+    shift = max(bits - 60, 0)
+    return math.ldexp(int(value >> shift), shift - bits)
+
+
+def reference_orbit(
+    center: Tuple[Fraction, Fraction], max_iter: int, bits: int
+) -> np.ndarray:
+    """Orbit of 0 under z**2 + c for the centre c, until it escapes.
+
+    Parameters
+    ----------
+    center : Tuple[Fraction, Fraction]
+        Real and imaginary parts of c.
+    max_iter : int
+        Maximum number of iterations.
+    bits : int
+        Number of fractional bits of the fixed-point arithmetic.
+
+    Returns
+    -------
+    np.ndarray
+        Orbit rounded to doubles, of at most `max_iter + 1` values starting with 0.
+        The last value is outside the bailout radius when the orbit escapes.
+    """
+    cr = _integer(round(center[0] * (1 << bits)))
+    ci = _integer(round(center[1] * (1 << bits)))
+    bailout = _integer(round(Fraction(BAILOUT) * (1 << bits)))
+    zr = zi = _integer(0)
+    orbit = np.zeros((max_iter + 1, 2))
+    length = 1
+    for length in range(1, max_iter + 1):
+        zr2 = (zr * zr) >> bits
+        zi2 = (zi * zi) >> bits
+        if zr2 + zi2 > bailout:
+            length -= 1
+            break
+        zr, zi = zr2 - zi2 + cr, ((zr * zi) >> (bits - 1)) + ci
+        orbit[length] = _to_float(zr, bits), _to_float(zi, bits)
+    else:
+        length = max_iter
+    return orbit[: length + 1, 0] + 1j * orbit[: length + 1, 1]
+
+
+def series_coefficients(
+    orbit: np.ndarray, radius: float, tolerance: float = SERIES_TOLERANCE
+) -> Tuple[int, complex, complex, complex]:
+    """Third order series of the offsets of the orbits from the reference orbit.
+
+    The offset after `n` iterations of the orbit of the point at `dc` from the
+    reference is about `a*dc + b*dc**2 + c*dc**3`. The series is used as long as its
+    last term stays negligible for all the pixels, and their orbits stay inside the
+    bailout radius.
+
+    Parameters
+    ----------
+    orbit : np.ndarray
+        Reference orbit.
+    radius : float
+        Largest distance of the pixels from the reference point.
+    tolerance : float
+        Largest relative size of the last term of the series.
+
+    Returns
+    -------
+    Tuple[int, complex, complex, complex]
+        Number of iterations the series skips, and the coefficients of the series.
+    """
+    a = b = c = 0j
+    skip = 0
+    limit = math.sqrt(BAILOUT)
+    for n in range(orbit.size - 2):
+        z2 = 2 * complex(orbit[n])
+        a, b, c = z2 * a + 1, z2 * b + a * a, z2 * c + 2 * a * b
+        first, last = abs(a) * radius, abs(c) * radius**3
+        if not math.isfinite(last) or last > tolerance * first:
+            break
+        if abs(orbit[n + 1]) + first + abs(b) * radius**2 + last > limit:
+            break
+        skip = n + 1
+        coefficients = a, b, c
+    if skip == 0:
+        return 0, 0j, 0j, 0j
+    return (skip,) + coefficients
+
+
+def deep_mandelbrot(
+    center: Center,
+    pixel_size: Union[str, float],
+    width: int,
+    height: int,
+    max_iter: int,
+    num_threads: int = 0,
+    dtype: Optional[np.dtype] = None,
+    out: Optional[np.ndarray] = None,
+    series: bool = True,
+    precision: str = "perturbation",
+) -> np.ndarray:
+    """Compute the Mandelbrot set around a centre known to any precision.
+
+    Parameters
+    ----------
+    center : Union[complex, str, Sequence[str]]
+        Centre of the plot, as in `parse_center`.
+    pixel_size : Union[str, float]
+        Pixel size of the plot, down to about 1e-290.
+    width : int
+        Number of columns.
+    height : int
+        Number of rows, of increasing imaginary parts.
+    max_iter : int
+        Maximum number of iterations.
+    num_threads : int
+        Number of threads to use, all the available ones if 0.
+    dtype : Optional[np.dtype]
+        Type of the counts, as in `_fast_mandelbrot`.
+    out : Optional[np.ndarray]
+        Preallocated row-major buffer of shape `(height, width)` receiving the counts.
+    series : bool
+        Skip the first iterations with a series approximation of the orbits.
+    precision : str
+        "perturbation", or "double-double" to compute the orbits of the pixels in
+        double-double precision. It needs no reference orbit but is several times
+        slower, and only accurate down to pixel sizes of about 1e-20 times the
+        magnitude of the centre near the boundary of the set.
+
+    Returns
+    -------
+    np.ndarray
+        Counts of shape `(height, width)`.
+    """
+    pixel_size = float(pixel_size)
+    if not 1e-290 < pixel_size:
+        raise ValueError(f"pixel_size must be larger than 1e-290, got {pixel_size}")
+    if precision not in DEEP_PRECISIONS:
+        raise ValueError(
+            f"precision must be one of {DEEP_PRECISIONS}, got {precision!r}"
+        )
+    center = parse_center(center)
+    if out is None:
+        out = empty_counts((height, width), max_iter, dtype)
+    if precision == "double-double":
+        x0, x0_lo = _dd_split(center[0] - Fraction(width - 1, 2) * Fraction(pixel_size))
+        y0, y0_lo = _dd_split(
+            center[1] - Fraction(height - 1, 2) * Fraction(pixel_size)
+        )
+        x, x_lo = dd_grid(x0, pixel_size, width, x0_lo)
+        y, y_lo = dd_grid(y0, pixel_size, height, y0_lo)
+        return np.asarray(
+            render(
+                x,
+                y,
+                0,
+                max_iter,
+                out,
+                num_threads=num_threads,
+                interior_check=True,
+                periodicity_check=True,
+                x_lo=x_lo,
+                y_lo=y_lo,
+            )
+        )
+    # Enough bits for the pixels, plus a margin for the rounding errors of the orbit.
+    bits = max(128, -math.frexp(pixel_size)[1] + 128)
+    orbit = reference_orbit(center, max_iter, bits)
+    dx = (np.arange(width) - (width - 1) / 2) * pixel_size
+    dy = (np.arange(height) - (height - 1) / 2) * pixel_size
+    skip, a, b, c = 0, 0j, 0j, 0j
+    if series:
+        skip, a, b, c = series_coefficients(orbit, math.hypot(dx[0], dy[0]))
+    _logger.debug(
+        f"Reference orbit of {orbit.size - 1} iterations with {bits} bits, "
+        f"skipping {skip} iterations."
+    )
+    return np.asarray(
+        perturb(
+            orbit.real.copy(),
+            orbit.imag.copy(),
+            dx,
+            dy,
+            max_iter,
+            out,
+            skip,
+            a,
+            b,
+            c,
+            num_threads,
+        )
+    )
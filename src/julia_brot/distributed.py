@@ -0,0 +1,610 @@
+"""Rendering of very large images by several machines.
+
+A `Coordinator` splits a viewport into tiles and hands them to the workers connected
+to it over TCP or a Unix socket. Workers pull a tile whenever they are idle, which
+balances the load between machines of different speeds, and the tiles are handed out
+from the most to the least expensive, as estimated from a coarse sample of the
+counts, so that no slow tile is left for the end. Workers answer with the
+zlib-compressed counts of their tile, which the coordinator writes into a buffer or a
+memory map. Tiles of workers that disconnect or time out are handed out again.
+
+Every message is a JSON header followed by a binary body, both prefixed by their
+length as 32-bit big-endian integers.
+"""
+
+import argparse
+import collections
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+import zlib
+from typing import Callable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .common import _setup_logging
+
+if os.getenv("DOCS_BUILD", 0) == 0:
+    from julia_brot.engine import (
+        check_method,
+        count_dtype,
+        count_points,
+        empty_counts,
+        make_grid,
+        render,
+    )
+    from julia_brot.stream import write_image
+
+_logger = logging.getLogger(__name__)
+
+TILE_SIZE = 256
+# Number of samples per tile side estimating the cost of the tiles.
+COST_SAMPLES = 8
+_LENGTHS = struct.Struct(">II")
+
+Address = Union[Tuple[str, int], str]
+Tile = Tuple[int, int, int, int]
+
+
+def _socket(address: Address) -> socket.socket:
+    if isinstance(address, (str, os.PathLike)):
+        return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    return socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+
+def _send(sock: socket.socket, header: dict, body: bytes = b""):
+    """Send a message made of a JSON header and a binary body."""
+    data = json.dumps(header).encode()
+    sock.sendall(_LENGTHS.pack(len(data), len(body)) + data + body)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(min(size - len(buffer), 1 << 20))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        buffer += chunk
+    return bytes(buffer)
+
+
+def _recv(sock: socket.socket) -> Tuple[dict, bytes]:
+    """Receive a message sent by `_send`."""
+    header_size, body_size = _LENGTHS.unpack(_recv_exact(sock, _LENGTHS.size))
+    header = json.loads(_recv_exact(sock, header_size))
+    return header, _recv_exact(sock, body_size)
+
+
+class Coordinator:
+    """Server handing the tiles of a viewport to workers and merging their counts.
+
+    Parameters
+    ----------
+    julia : bool
+        Compute the Julia set of `c` instead of the Mandelbrot set.
+    c : complex
+        Julia constant, ignored for the Mandelbrot set.
+    zmin : complex
+        Lower bound limit.
+    zmax : complex
+        Upper bound limit.
+    pixel_size : float
+        Pixel size of the image, on the grid of `_fast_mandelbrot`/`_fast_julia`.
+    max_iter : int
+        Maximum number of iterations.
+    out : Optional[np.ndarray]
+        Row-major buffer of shape `(height, width)` receiving the counts, for
+        instance a memory map of a `.npy` file.
+    dtype : Optional[np.dtype]
+        Type of the counts when `out` is None, as in `_fast_mandelbrot`.
+    tile_size : int
+        Side of the square tiles, in pixels.
+    address : Union[Tuple[str, int], str]
+        Host and port to listen on, the port being picked by the system if 0, or
+        path of a Unix socket.
+    timeout : float
+        Seconds after which a worker which has not answered is considered lost, and
+        its tile handed to another one.
+    max_attempts : int
+        Number of workers a tile may be lost by before the render fails.
+    method : str
+        "escape" or "mariani", as in `render`.
+    """
+
+    def __init__(
+        self,
+        julia: bool = False,
+        c: complex = 0,
+        zmin: complex = -2 - 2j,
+        zmax: complex = 2 + 2j,
+        pixel_size: float = 0.01,
+        max_iter: int = 600,
+        out: Optional[np.ndarray] = None,
+        dtype: Optional[np.dtype] = None,
+        tile_size: int = TILE_SIZE,
+        address: Address = ("127.0.0.1", 0),
+        timeout: float = 60.0,
+        max_attempts: int = 3,
+        method: str = "escape",
+    ):
+        check_method(method)
+        if tile_size < 1:
+            raise ValueError(f"tile_size must be strictly positive, got {tile_size}")
+        self.julia = bool(julia)
+        self.c = complex(c) if julia else 0j
+        self.max_iter = max_iter
+        self.method = method
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.x, self.y, _, _ = make_grid(
+            zmin, zmax, pixel_size, "double", snap_x=julia, snap_y=True
+        )
+        shape = (self.y.size, self.x.size)
+        if out is None:
+            out = empty_counts(shape, max_iter, dtype)
+        if out.shape != shape:
+            raise ValueError(f"out must have shape {shape}, got {out.shape}")
+        if np.issubdtype(out.dtype, np.integer) and max_iter > np.iinfo(out.dtype).max:
+            # Checked by the workers too, but a bad type would only show as lost tiles.
+            raise ValueError(
+                f"max_iter={max_iter} does not fit in a {out.dtype} buffer"
+            )
+        self.counts = out
+        tiles = [
+            (row, min(row + tile_size, shape[0]), col, min(col + tile_size, shape[1]))
+            for row in range(0, shape[0], tile_size)
+            for col in range(0, shape[1], tile_size)
+        ]
+        costs = self._estimate_costs(tile_size)
+        tiles.sort(key=lambda t: -costs[t[0] // tile_size, t[2] // tile_size])
+        self._queue = collections.deque(tiles)
+        self._pending = len(tiles)
+        self._attempts = collections.Counter()
+        self._error = None
+        self._activity = time.monotonic()
+        self._condition = threading.Condition()
+        self._server = _socket(address)
+        if not isinstance(address, (str, os.PathLike)):
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(address)
+        self._server.listen()
+        self.address = self._server.getsockname()
+
+    def _estimate_costs(self, tile_size: int) -> np.ndarray:
+        """Sum of the counts of a coarse sample of the pixels of every tile."""
+        step = max(1, tile_size // COST_SAMPLES)
+        x, y = self.x[::step], self.y[::step]
+        points = (x[None, :] + 1j * y[:, None]).reshape(-1)
+        samples = np.empty(points.size, dtype=np.int32)
+        count_points(points, self.c, self.max_iter, samples, self.julia)
+        rows = np.arange(y.size) * step // tile_size
+        cols = np.arange(x.size) * step // tile_size
+        costs = np.zeros((-(-self.y.size // tile_size), -(-self.x.size // tile_size)))
+        np.add.at(
+            costs, (rows[:, None], cols[None, :]), samples.reshape(y.size, x.size)
+        )
+        return costs
+
+    def _take(self) -> Optional[Tile]:
+        """Next tile to compute, waiting for the lost ones, None once all are done."""
+        with self._condition:
+            while not self._queue and self._pending and self._error is None:
+                self._condition.wait()
+            if self._queue and self._error is None:
+                return self._queue.popleft()
+            return None
+
+    def _lost(self, tile: Tile, error: Exception):
+        with self._condition:
+            self._attempts[tile] += 1
+            _logger.warning(
+                f"Lost tile {tile} ({error}), attempt {self._attempts[tile]}."
+            )
+            if self._attempts[tile] >= self.max_attempts:
+                self._error = RuntimeError(
+                    f"tile {tile} was lost {self._attempts[tile]} times, "
+                    f"last by: {error}"
+                )
+            else:
+                self._queue.appendleft(tile)
+            self._condition.notify_all()
+
+    def _finished(self) -> bool:
+        with self._condition:
+            return self._pending == 0 or self._error is not None
+
+    def _handle(self, conn: socket.socket):
+        """Hand tiles to a connected worker until there are no more."""
+        conn.settimeout(self.timeout)
+        with conn:
+            while True:
+                tile = self._take()
+                if tile is None:
+                    try:
+                        _send(conn, {"type": "done"})
+                    except OSError:
+                        pass
+                    return
+                row0, row1, col0, col1 = tile
+                header = {
+                    "type": "tile",
+                    "julia": self.julia,
+                    "c": [self.c.real, self.c.imag],
+                    "max_iter": self.max_iter,
+                    "dtype": self.counts.dtype.str,
+                    "method": self.method,
+                    "width": col1 - col0,
+                    "height": row1 - row0,
+                }
+                body = self.x[col0:col1].tobytes() + self.y[row0:row1].tobytes()
+                try:
+                    _send(conn, header, body)
+                    _, data = _recv(conn)
+                    counts = np.frombuffer(
+                        zlib.decompress(data), dtype=self.counts.dtype
+                    ).reshape(row1 - row0, col1 - col0)
+                except (OSError, ValueError, zlib.error) as error:
+                    self._lost(tile, error)
+                    return
+                self.counts[row0:row1, col0:col1] = counts
+                with self._condition:
+                    self._pending -= 1
+                    self._activity = time.monotonic()
+                    self._condition.notify_all()
+
+    def _fail(self, error: Exception):
+        """Stop handing out tiles, the render failing with `error`."""
+        with self._condition:
+            if self._error is None:
+                self._error = error
+            self._condition.notify_all()
+
+    def serve(
+        self,
+        alive: Optional[Callable[[], bool]] = None,
+        idle_timeout: Optional[float] = 600.0,
+    ) -> np.ndarray:
+        """Hand out the tiles to the workers connecting until all are computed.
+
+        Parameters
+        ----------
+        alive : Optional[Callable[[], bool]]
+            Function telling whether any worker is still running, the render failing
+            once it returns False with tiles left to compute.
+        idle_timeout : Optional[float]
+            Seconds without a worker connecting or a tile being computed after which
+            the render fails, never if None.
+
+        Returns
+        -------
+        np.ndarray
+            The counts, of shape `(height, width)`.
+
+        Raises
+        ------
+        RuntimeError
+            If a tile was lost too many times, no worker is alive or the workers were
+            idle for too long.
+        """
+        self._server.settimeout(0.1)
+        while not self._finished():
+            if alive is not None and not alive() and not self._finished():
+                self._fail(RuntimeError("no worker is alive to compute the tiles left"))
+                break
+            with self._condition:
+                idle = time.monotonic() - self._activity
+            if idle_timeout is not None and idle > idle_timeout:
+                self._fail(
+                    RuntimeError(f"no tile was computed for {idle_timeout} seconds")
+                )
+                break
+            try:
+                conn, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            _logger.debug("Worker connected.")
+            with self._condition:
+                self._activity = time.monotonic()
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        if self._error is not None:
+            raise self._error
+        return self.counts
+
+    def close(self):
+        """Stop listening to workers."""
+        self._server.close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def __enter__(self) -> "Coordinator":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def run_worker(address: Address, num_threads: int = 0) -> int:
+    """Compute the tiles handed by a coordinator until it has no more.
+
+    Parameters
+    ----------
+    address : Union[Tuple[str, int], str]
+        Host and port, or Unix socket path, of the coordinator.
+    num_threads : int
+        Number of threads computing a tile, all the available ones if 0.
+
+    Returns
+    -------
+    int
+        Number of tiles computed.
+    """
+    if isinstance(address, list):
+        address = tuple(address)
+    computed = 0
+    with _socket(address) as sock:
+        sock.connect(address)
+        while True:
+            header, body = _recv(sock)
+            if header["type"] == "done":
+                return computed
+            width, height = header["width"], header["height"]
+            x = np.frombuffer(body, dtype=np.float64, count=width)
+            y = np.frombuffer(body, dtype=np.float64, offset=8 * width)
+            julia = header["julia"]
+            out = np.empty((height, width), dtype=np.dtype(header["dtype"]))
+            render(
+                x,
+                y,
+                complex(*header["c"]),
+                header["max_iter"],
+                out,
+                julia=julia,
+                num_threads=num_threads,
+                interior_check=not julia,
+                periodicity_check=not julia,
+                method=header["method"],
+            )
+            _send(sock, {"type": "result"}, zlib.compress(out.tobytes(), 1))
+            computed += 1
+
+
+def distributed_render(
+    julia: bool = False,
+    c: complex = 0,
+    zmin: complex = -2 - 2j,
+    zmax: complex = 2 + 2j,
+    pixel_size: float = 0.01,
+    max_iter: int = 600,
+    workers: int = 2,
+    num_threads: int = 1,
+    out: Optional[np.ndarray] = None,
+    dtype: Optional[np.dtype] = None,
+    tile_size: int = TILE_SIZE,
+    address: Address = ("127.0.0.1", 0),
+    method: str = "escape",
+) -> np.ndarray:
+    """Render a viewport with worker processes started on this machine.
+
+    Parameters
+    ----------
+    julia : bool
+        Compute the Julia set of `c` instead of the Mandelbrot set.
+    c : complex
+        Julia constant, ignored for the Mandelbrot set.
+    zmin : complex
+        Lower bound limit.
+    zmax : complex
+        Upper bound limit.
+    pixel_size : float
+        Pixel size of the image.
+    max_iter : int
+        Maximum number of iterations.
+    workers : int
+        Number of worker processes.
+    num_threads : int
+        Number of threads of every worker, all the available ones if 0.
+    out : Optional[np.ndarray]
+        Buffer receiving the counts, as in `Coordinator`.
+    dtype : Optional[np.dtype]
+        Type of the counts when `out` is None, as in `_fast_mandelbrot`.
+    tile_size : int
+        Side of the square tiles, in pixels.
+    address : Union[Tuple[str, int], str]
+        Address of the coordinator, as in `Coordinator`.
+    method : str
+        "escape" or "mariani", as in `render`.
+
+    Returns
+    -------
+    np.ndarray
+        The counts, of shape `(height, width)`.
+    """
+    context = multiprocessing.get_context("spawn")
+    with Coordinator(
+        julia,
+        c,
+        zmin,
+        zmax,
+        pixel_size,
+        max_iter,
+        out,
+        dtype,
+        tile_size,
+        address,
+        method=method,
+    ) as coordinator:
+        processes = [
+            context.Process(target=run_worker, args=(coordinator.address, num_threads))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            return coordinator.serve(lambda: any(p.is_alive() for p in processes))
+        finally:
+            for process in processes:
+                process.join(timeout=coordinator.timeout)
+                if process.is_alive():
+                    process.terminate()
+
+
+def _parse_address(text: str) -> Address:
+    """Read a `HOST:PORT` address, anything else being a Unix socket path."""
+    host, _, port = text.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+    return text
+
+
+def _parse_cluster_args(args: List[str]) -> argparse.Namespace:
+    """Parse the command line arguments of the distributed rendering CLI.
+
+    Parameters
+    ----------
+    args : List[str]
+        Raw arguments from the shell call.
+
+    Returns
+    -------
+    argparse.Namespace
+        Parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Distributed rendering CLI.")
+    parser.add_argument(
+        "-d",
+        "--debug",
+        help="Set logging level to DEBUG",
+        action="store_const",
+        dest="loglevel",
+        const=logging.DEBUG,
+        default=logging.WARNING,
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    coordinate = commands.add_parser(
+        "coordinate", help="Hand out the tiles of a plot and write the image."
+    )
+    coordinate.add_argument(
+        "--bind",
+        help="HOST:PORT or Unix socket path to listen on.",
+        type=_parse_address,
+        default=("127.0.0.1", 5555),
+    )
+    coordinate.add_argument(
+        "-c",
+        "--c",
+        help="Constant of a Julia set plot (ex: -1-1.5j), a Mandelbrot plot if not "
+        "given.",
+        type=complex,
+        default=None,
+    )
+    coordinate.add_argument(
+        "--zmin",
+        help="Lower bound of the plot, as a complex number (ex: -2-2j)",
+        type=complex,
+        default=-2 - 2j,
+    )
+    coordinate.add_argument(
+        "--zmax",
+        help="Upper bound of the plot, as a complex number (ex: 2+2j)",
+        type=complex,
+        default=2 + 2j,
+    )
+    coordinate.add_argument(
+        "--pixel_size",
+        help="Pixel size of the generated plot.",
+        type=float,
+        default=0.001,
+    )
+    coordinate.add_argument(
+        "--max-iter",
+        help="Number of iterations to generate the set.",
+        type=int,
+        default=600,
+    )
+    coordinate.add_argument(
+        "--tile-size",
+        help="Side of the tiles handed to the workers, in pixels.",
+        type=int,
+        default=TILE_SIZE,
+    )
+    coordinate.add_argument(
+        "--timeout",
+        help="Seconds after which the tile of a silent worker is handed out again.",
+        type=float,
+        default=60.0,
+    )
+    coordinate.add_argument(
+        "--idle-timeout",
+        help="Seconds without any tile computed after which the render fails.",
+        type=float,
+        default=600.0,
+    )
+    coordinate.add_argument(
+        "--memmap",
+        help="Merge the counts into this .npy file instead of memory.",
+        type=str,
+        default=None,
+    )
+    coordinate.add_argument(
+        "-o",
+        "--output",
+        help="Output path of the generated plot.",
+        type=str,
+        default="out.png",
+    )
+    work = commands.add_parser("work", help="Compute the tiles of a coordinator.")
+    work.add_argument(
+        "address", help="HOST:PORT or Unix socket path of the coordinator."
+    )
+    work.add_argument(
+        "-t",
+        "--threads",
+        help="Number of threads computing a tile, all the available ones if 0.",
+        type=int,
+        default=0,
+    )
+    return parser.parse_args(args)
+
+
+def _cluster_cli():
+    """Coordinate or compute a distributed render.
+    This function is meant to be called from the CLI.
+    """
+    args = _parse_cluster_args(sys.argv[1:])
+    _setup_logging(args.loglevel)
+    if args.command == "work":
+        run_worker(_parse_address(args.address), args.threads)
+        return
+    julia = args.c is not None
+    out = None
+    if args.memmap:
+        x, y, _, _ = make_grid(
+            args.zmin, args.zmax, args.pixel_size, "double", snap_x=julia, snap_y=True
+        )
+        out = np.lib.format.open_memmap(
+            args.memmap,
+            mode="w+",
+            dtype=count_dtype(args.max_iter),
+            shape=(y.size, x.size),
+        )
+    with Coordinator(
+        julia,
+        args.c or 0,
+        args.zmin,
+        args.zmax,
+        args.pixel_size,
+        args.max_iter,
+        out,
+        tile_size=args.tile_size,
+        address=args.bind,
+        timeout=args.timeout,
+    ) as coordinator:
+        print(f"Listening on {coordinator.address}", flush=True)
+        counts = coordinator.serve(idle_timeout=args.idle_timeout)
+    write_image(counts, args.output)
@@ -0,0 +1,1210 @@
+"""Tiled rendering engine shared by the Mandelbrot and Julia kernels.
+
+The viewport is split into square tiles small enough to stay in cache, the tiles
+are handed to the OpenMP threads and every tile writes its rows straight into a
+row-major `(height, width)` buffer.
+"""
+import contextlib
+
+import cython
+import numpy as np
+from cython.parallel import prange
+
+from julia_brot.parallel import check_schedule
+
+from libc.math cimport fabs, isfinite, round
+from libc.stdint cimport int64_t, uint8_t, uint16_t
+
+from julia_brot.escape cimport (
+    NSTATS,
+    RENDER_BAILOUT,
+    STAT_ESCAPED,
+    STAT_ITERATIONS,
+    STAT_PIXELS,
+    STAT_SHORTCUT,
+    count_t,
+    dd_add,
+    dd_t,
+    dd_two_prod,
+    in_main_bulbs,
+    jb_atomic_add,
+    julia_escape,
+    kernel_cancelled,
+    kernel_escape,
+    kernel_escape_dd,
+    kernel_t,
+    mandelbrot_escape,
+    smooth_count,
+)
+from julia_brot.lanes cimport (
+    JB_LANES,
+    jb_escape_lanes,
+    jb_lanes_enabled,
+    jb_simd,
+    jb_simd_detect,
+    jb_simd_set,
+)
+from julia_brot.parallel cimport resolve_threads
+
+TILE_SIZE = 64
+# Squared escape radius of the rendering kernels.
+BAILOUT = RENDER_BAILOUT
+# Version of the kernels, to bump whenever they compute different counts.
+KERNEL_VERSION = 1
+METHODS = ("escape", "mariani")
+PRECISIONS = ("auto", "double", "double-double", "single")
+# Instruction sets of the vectorized kernels, from `simd_level`.
+SIMD_LEVELS = ("none", "baseline", "avx2", "avx512")
+# Pixel size, relative to the magnitude of the coordinates, below which the "auto"
+# precision switches to double-double coordinates and orbits.
+DOUBLE_DOUBLE_THRESHOLD = 1e-13
+# Names of the work counters of `render`, in the order of its `stats` array.
+STATS = ("pixels", "iterations", "escaped", "shortcut")
+COUNT_DTYPES = tuple(np.dtype(t) for t in (np.uint8, np.uint16, np.int32, np.float32))
+
+
+def simd_level():
+    """Instruction set of the vectorized kernels.
+
+    Returns
+    -------
+    str
+        One of `SIMD_LEVELS`: "none" when the compiler does not support them,
+        "baseline" for 128-bit vectors (SSE2 or NEON), "avx2" or "avx512".
+    """
+    return SIMD_LEVELS[jb_simd + 1]
+
+
+def _set_simd_level(str level):
+    """Use another instruction set for the vectorized kernels, "none" disabling them.
+
+    Parameters
+    ----------
+    level : str
+        One of `SIMD_LEVELS`, at most the one detected on the machine.
+    """
+    if level not in SIMD_LEVELS:
+        raise ValueError(f"level must be one of {SIMD_LEVELS}, got {level!r}")
+    cdef int index = SIMD_LEVELS.index(level) - 1
+    if index > jb_simd_detect():
+        raise ValueError(f"{level} is not supported by this machine")
+    jb_simd_set(index)
+
+
+jb_simd_set(jb_simd_detect())
+
+
+def _no_stage(str name):
+    return contextlib.nullcontext()
+
+
+def check_method(str method):
+    """Validate the rendering method.
+
+    Parameters
+    ----------
+    method : str
+        One of "escape" or "mariani".
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}, got {method!r}")
+
+
+def use_double_double(double complex zmin, double complex zmax, double pixel_size,
+                      str precision="auto"):
+    """Whether a viewport is computed in double-double precision.
+
+    Parameters
+    ----------
+    zmin : complex
+        Lower bound limit.
+    zmax : complex
+        Upper bound limit.
+    pixel_size : float
+        Pixel size of the grid.
+    precision : str
+        "double", "double-double", or "auto" to only use double-double precision
+        when `pixel_size` is smaller than `DOUBLE_DOUBLE_THRESHOLD` times the
+        magnitude of the coordinates, where doubles lose the details of the sets.
+        "single" grids are double precision ones, iterated in single precision.
+
+    Returns
+    -------
+    bool
+        True for double-double precision.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision must be one of {PRECISIONS}, got {precision!r}")
+    if precision != "auto":
+        return precision == "double-double"
+    magnitude = max(abs(zmin.real), abs(zmin.imag), abs(zmax.real), abs(zmax.imag))
+    return pixel_size < DOUBLE_DOUBLE_THRESHOLD * magnitude
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def dd_grid(double start, double step, Py_ssize_t n, double start_lo=0):
+    """Coordinates `start + i * step` of a grid, rounded to double-double numbers.
+
+    Parameters
+    ----------
+    start : float
+        First coordinate.
+    step : float
+        Pixel size of the grid.
+    n : int
+        Number of coordinates.
+    start_lo : float
+        Low part of the first coordinate, as a double-double number.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        High and low parts of the coordinates.
+    """
+    hi = np.empty(n)
+    lo = np.empty(n)
+    cdef:
+        double[::1] hi_view = hi, lo_view = lo
+        dd_t origin, value
+        Py_ssize_t i
+
+    origin.hi = start
+    origin.lo = start_lo
+    for i in range(n):
+        value = dd_add(origin, dd_two_prod(<double> i, step))
+        hi_view[i] = value.hi
+        lo_view[i] = value.lo
+    return hi, lo
+
+
+def make_grid(double complex zmin, double complex zmax, double pixel_size,
+              str precision="auto", bint snap_x=False, bint snap_y=False):
+    """Coordinates of the pixels of a viewport.
+
+    Parameters
+    ----------
+    zmin : complex
+        Lower bound limit.
+    zmax : complex
+        Upper bound limit.
+    pixel_size : float
+        Pixel size of the grid.
+    precision : str
+        Precision of the coordinates, as in `use_double_double`.
+    snap_x : bool
+        Snap the real parts onto their mirror image about 0 when they overlap it, as
+        in `mirror_axis`. Only double precision grids are snapped.
+    snap_y : bool
+        Snap the imaginary parts onto their mirror image about 0 when they overlap it.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]
+        Real and imaginary parts of the grid, then their low parts in double-double
+        precision, None in double precision.
+    """
+    x = np.arange(zmin.real, zmax.real, pixel_size)
+    y = np.arange(zmin.imag, zmax.imag, pixel_size)
+    if not use_double_double(zmin, zmax, pixel_size, precision):
+        kx = mirror_index(zmin.real, pixel_size, x.size) if snap_x else -1
+        ky = mirror_index(zmin.imag, pixel_size, y.size) if snap_y else -1
+        if kx >= 0:
+            x = mirror_axis(kx, pixel_size, x.size)
+        if ky >= 0:
+            y = mirror_axis(ky, pixel_size, y.size)
+        return x, y, None, None
+    x, x_lo = dd_grid(zmin.real, pixel_size, x.size)
+    y, y_lo = dd_grid(zmin.imag, pixel_size, y.size)
+    return x, y, x_lo, y_lo
+
+
+def mirror_index(double start, double pixel_size, Py_ssize_t n):
+    """Sum of the indices of the pixels of a grid axis that are mirrors about 0.
+
+    The pixel `i` of the axis `start + i * pixel_size` mirrors the pixel `k - i`,
+    once the axis is moved by at most a quarter of a pixel onto `(2 * i - k) *
+    pixel_size / 2`.
+
+    Parameters
+    ----------
+    start : float
+        First coordinate of the axis.
+    pixel_size : float
+        Pixel size of the grid.
+    n : int
+        Number of pixels of the axis.
+
+    Returns
+    -------
+    int
+        The sum `k`, or -1 if the axis does not overlap its mirror image.
+    """
+    if not isfinite(start / pixel_size):
+        return -1
+    cdef double k = round(-2 * start / pixel_size)
+    if not 1 <= k <= 2 * n - 3:
+        return -1
+    return <Py_ssize_t> k
+
+
+def mirror_axis(Py_ssize_t k, double pixel_size, Py_ssize_t n):
+    """Coordinates of a grid axis snapped onto its mirror image about 0.
+
+    Parameters
+    ----------
+    k : int
+        Sum of the indices of the mirrored pixels, from `mirror_index`.
+    pixel_size : float
+        Pixel size of the grid.
+    n : int
+        Number of pixels of the axis.
+
+    Returns
+    -------
+    np.ndarray
+        Coordinates `(2 * i - k) * pixel_size / 2`, those of the pixels `i` and
+        `k - i` being exact opposites.
+    """
+    return (np.arange(n) * 2.0 - k) * (pixel_size / 2)
+
+
+def render_view(double complex zmin, double complex zmax, double pixel_size,
+                double complex c, int max_iter, out=None, dtype=None, bint julia=False,
+                int num_threads=0, str schedule="dynamic", int chunksize=1,
+                bint interior_check=False, bint periodicity_check=False,
+                str method="escape", bint exact=False, str precision="auto",
+                bint symmetry=True, profile=None, int supersample=1, bint adaptive=False,
+                progress=None, cancel=None):
+    """Compute the escape counts of a viewport.
+
+    The Mandelbrot set is symmetric about the real axis and the Julia sets are
+    symmetric about the origin. When the viewport overlaps its own mirror image, only
+    one side of the overlap is computed and mirrored into the other one.
+
+    Parameters
+    ----------
+    zmin : complex
+        Lower bound limit.
+    zmax : complex
+        Upper bound limit.
+    pixel_size : float
+        Pixel size of the grid.
+    c : complex
+        Julia constant, ignored for the Mandelbrot set.
+    max_iter : int
+        Maximum number of iterations.
+    out : Optional[np.ndarray]
+        Preallocated row-major buffer receiving the counts.
+    dtype : Optional[np.dtype]
+        Type of the counts when `out` is None, as in `empty_counts`.
+    julia : bool
+        Compute the Julia set of `c` instead of the Mandelbrot set.
+    num_threads : int
+        Number of threads to use, all the available ones if 0.
+    schedule : str
+        OpenMP schedule of the tiles, one of "static", "dynamic" or "guided".
+    chunksize : int
+        Number of tiles handed to a thread at once.
+    interior_check : bool
+        As in `render`.
+    periodicity_check : bool
+        As in `render`.
+    method : str
+        As in `render`.
+    exact : bool
+        As in `render`.
+    precision : str
+        Precision of the coordinates, as in `use_double_double`.
+    symmetry : bool
+        Mirror the counts of the symmetric parts of the viewport. The grid then moves
+        by at most a quarter of a pixel so that mirrored pixels line up exactly.
+        Double-double grids are always computed in full.
+    profile : Optional[RenderProfile]
+        Profile receiving the time and memory of the "grid", "kernel" and "mirror"
+        stages, and the work counters of the kernels.
+    supersample : int
+        As in `render`.
+    adaptive : bool
+        As in `render`.
+    progress : Optional[np.ndarray]
+        As in `render`, the mirrored pixels being added once mirrored.
+    cancel : Optional[np.ndarray]
+        As in `render`.
+
+    Returns
+    -------
+    np.ndarray
+        The counts, of shape `(height, width)`.
+    """
+    stage = _no_stage if profile is None else profile.stage
+    with stage("grid"):
+        x, y, x_lo, y_lo = make_grid(
+            zmin, zmax, pixel_size, precision, snap_x=symmetry and julia, snap_y=symmetry
+        )
+        if out is None:
+            out = empty_counts((y.size, x.size), max_iter, dtype)
+    options = dict(
+        julia=julia, num_threads=num_threads, schedule=schedule, chunksize=chunksize,
+        interior_check=interior_check, periodicity_check=periodicity_check,
+        method=method, exact=exact, stats=None if profile is None else profile.counters,
+        single=precision == "single", pixel_size=pixel_size, supersample=supersample,
+        adaptive=adaptive, progress=progress, cancel=cancel,
+    )
+    # Mirrored pixels count like computed ones, twice with adaptive supersampling.
+    cdef int passes = 2 if adaptive and supersample > 1 else 1
+    cdef Py_ssize_t kx = -1, ky = -1
+    if symmetry and x_lo is None:
+        ky = mirror_index(zmin.imag, pixel_size, y.size)
+        if julia:
+            kx = mirror_index(zmin.real, pixel_size, x.size)
+    if ky < 0 or (julia and kx < 0) or np.shape(out) != (y.size, x.size):
+        with stage("kernel"):
+            render(x, y, c, max_iter, out, x_lo=x_lo, y_lo=y_lo, **options)
+        return np.asarray(out)
+
+    # Rows [lo, mid) are the mirrors of rows (k - mid, k - lo], the others are computed.
+    cdef Py_ssize_t lo = max(0, ky - y.size + 1), mid = (ky + 1) // 2
+    counts = np.asarray(out)
+    with stage("kernel"):
+        if lo > 0:
+            render(x, y[:lo], c, max_iter, counts[:lo], **options)
+        render(x, y[mid:], c, max_iter, counts[mid:], **options)
+    mirror = counts[ky - mid + 1:ky - lo + 1][::-1]
+    if not julia:
+        with stage("mirror"):
+            counts[lo:mid] = mirror
+        if progress is not None:
+            progress[0] += passes * (mid - lo) * x.size
+        return counts
+    # The column i of the mirrored rows is the column k - i, reversed.
+    cdef Py_ssize_t left = max(0, kx - x.size + 1), right = min(x.size, kx + 1)
+    with stage("mirror"):
+        counts[lo:mid, left:right] = mirror[:, kx - right + 1:kx - left + 1][:, ::-1]
+    if progress is not None:
+        progress[0] += passes * (mid - lo) * (right - left)
+    for cols in (slice(0, left), slice(right, x.size)):
+        if cols.stop > cols.start:
+            with stage("kernel"):
+                block = np.empty((mid - lo, cols.stop - cols.start), counts.dtype)
+                render(x[cols], y[lo:mid], c, max_iter, block, **options)
+                counts[lo:mid, cols] = block
+    return counts
+
+
+def count_dtype(int max_iter):
+    """Smallest integer type holding iteration counts up to `max_iter`.
+
+    Parameters
+    ----------
+    max_iter : int
+        Maximum number of iterations.
+
+    Returns
+    -------
+    np.dtype
+        `np.uint8`, `np.uint16` or `np.int32`.
+    """
+    if max_iter < 256:
+        return np.dtype(np.uint8)
+    if max_iter < 65536:
+        return np.dtype(np.uint16)
+    return np.dtype(np.int32)
+
+
+def empty_counts(shape, int max_iter, dtype=None):
+    """Allocate a buffer receiving iteration counts.
+
+    Parameters
+    ----------
+    shape : Tuple[int, int]
+        Shape of the buffer, `(height, width)`.
+    max_iter : int
+        Maximum number of iterations.
+    dtype : Optional[np.dtype]
+        Type of the buffer, the smallest one holding `max_iter` if None.
+
+    Returns
+    -------
+    np.ndarray
+        Uninitialized buffer.
+    """
+    dtype = count_dtype(max_iter) if dtype is None else np.dtype(dtype)
+    if dtype not in COUNT_DTYPES:
+        raise TypeError(f"dtype must be one of {[str(t) for t in COUNT_DTYPES]}, got {dtype}")
+    return np.empty(shape, dtype=dtype)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int _check_fits(count_t[:, ::1] out, int max_iter) except -1:
+    """Raise a ValueError if `max_iter` does not fit in the type of `out`."""
+    if count_t is uint8_t:
+        if max_iter > 255:
+            raise ValueError(f"max_iter={max_iter} does not fit in a uint8 buffer")
+    elif count_t is uint16_t:
+        if max_iter > 65535:
+            raise ValueError(f"max_iter={max_iter} does not fit in a uint16 buffer")
+    return 0
+
+
+cdef inline void _count_stats(int64_t *stats, int ite, int executed,
+                              int max_iter) noexcept nogil:
+    if stats != NULL:
+        stats[STAT_PIXELS] += 1
+        stats[STAT_ITERATIONS] += executed
+        if ite < max_iter:
+            stats[STAT_ESCAPED] += 1
+        elif executed < max_iter:
+            stats[STAT_SHORTCUT] += 1
+
+
+cdef inline void _store_count(count_t[:, ::1] out, int j, int i, int ite, int executed,
+                              double mag2, const kernel_t *kernel,
+                              int64_t *stats) noexcept nogil:
+    _count_stats(stats, ite, executed, kernel.max_iter)
+    if count_t is float:
+        out[j, i] = smooth_count(ite, mag2, kernel.max_iter)
+    else:
+        out[j, i] = <count_t> ite
+
+
+cdef inline void _compute_samples(count_t[:, ::1] out, const double[::1] x,
+                                  const double[::1] y, int j, int i, const kernel_t *kernel,
+                                  int64_t *stats) noexcept nogil:
+    """Average the counts of the samples of a pixel."""
+    cdef:
+        int sx, sy, ite, executed, n = kernel.supersample
+        double mag2, total = 0, origin = -0.5 * (n - 1) * kernel.sample_step
+        dd_t xd, yd, dx, dy
+
+    dx.lo = dy.lo = 0
+    for sy in range(n):
+        dy.hi = origin + sy * kernel.sample_step
+        for sx in range(n):
+            dx.hi = origin + sx * kernel.sample_step
+            if kernel.x_lo != NULL:
+                xd.hi = x[i]
+                xd.lo = kernel.x_lo[i]
+                yd.hi = y[j]
+                yd.lo = kernel.y_lo[j]
+                ite = kernel_escape_dd(kernel, dd_add(xd, dx), dd_add(yd, dy), &mag2,
+                                       &executed)
+            else:
+                ite = kernel_escape(kernel, x[i] + dx.hi, y[j] + dy.hi, &mag2, &executed)
+            _count_stats(stats, ite, executed, kernel.max_iter)
+            if count_t is float:
+                total += smooth_count(ite, mag2, kernel.max_iter)
+            else:
+                total += ite
+    if count_t is float:
+        out[j, i] = <float> (total / (n * n))
+    else:
+        out[j, i] = <count_t> round(total / (n * n))
+
+
+cdef inline void _compute_pixel(count_t[:, ::1] out, const double[::1] x, const double[::1] y,
+                                int j, int i, const kernel_t *kernel,
+                                int64_t *stats) noexcept nogil:
+    cdef:
+        int ite, executed
+        double mag2
+        dd_t xd, yd
+
+    if kernel.supersample > 1:
+        _compute_samples(out, x, y, j, i, kernel, stats)
+        return
+    if kernel.x_lo != NULL:
+        xd.hi = x[i]
+        xd.lo = kernel.x_lo[i]
+        yd.hi = y[j]
+        yd.lo = kernel.y_lo[j]
+        ite = kernel_escape_dd(kernel, xd, yd, &mag2, &executed)
+    else:
+        ite = kernel_escape(kernel, x[i], y[j], &mag2, &executed)
+    _store_count(out, j, i, ite, executed, mag2, kernel, stats)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline void _compute_lanes(count_t[:, ::1] out, const double[::1] x, const double[::1] y,
+                                int j, int col0, int col1, const kernel_t *kernel,
+                                int64_t *stats) noexcept nogil:
+    """Compute the pixels `col0` to `col1` (excluded, at most `JB_LANES`) of row `j`
+    with the vector instructions."""
+    cdef:
+        double zr[JB_LANES]
+        double zi[JB_LANES]
+        double cr[JB_LANES]
+        double ci[JB_LANES]
+        double mag2[JB_LANES]
+        int todo[JB_LANES]
+        int ite[JB_LANES]
+        int executed[JB_LANES]
+        int l, n = col1 - col0, count = 0
+
+    for l in range(n):
+        todo[l] = True
+        if kernel.julia:
+            zr[l] = x[col0 + l]
+            zi[l] = y[j]
+            cr[l] = kernel.cr
+            ci[l] = kernel.ci
+        else:
+            zr[l] = zi[l] = 0
+            cr[l] = x[col0 + l]
+            ci[l] = y[j]
+            if kernel.interior_check and in_main_bulbs(cr[l], ci[l]):
+                # Settled like in `kernel_escape`, with an orbit staying at 0.
+                todo[l] = False
+                _store_count(out, j, col0 + l, kernel.max_iter, 0, 0, kernel, stats)
+        count += todo[l]
+    if not count:
+        return
+    jb_escape_lanes(kernel.single, n, zr, zi, cr, ci, todo, kernel.max_iter,
+                    RENDER_BAILOUT, kernel.periodicity_check and not kernel.julia,
+                    ite, executed, mag2)
+    for l in range(n):
+        if todo[l]:
+            _store_count(out, j, col0 + l, ite[l], executed[l], mag2[l], kernel, stats)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline void _count_lanes(count_t[::1] out, const double complex[::1] points,
+                              Py_ssize_t k0, Py_ssize_t k1,
+                              const kernel_t *kernel) noexcept nogil:
+    """Compute the points `k0` to `k1` (excluded, at most `JB_LANES`) of `count_points`
+    with the vector instructions."""
+    cdef:
+        double zr[JB_LANES]
+        double zi[JB_LANES]
+        double cr[JB_LANES]
+        double ci[JB_LANES]
+        double mag2[JB_LANES]
+        int todo[JB_LANES]
+        int ite[JB_LANES]
+        int executed[JB_LANES]
+        int l, n = k1 - k0, count = 0
+
+    for l in range(n):
+        todo[l] = True
+        if kernel.julia:
+            zr[l] = points[k0 + l].real
+            zi[l] = points[k0 + l].imag
+            cr[l] = kernel.cr
+            ci[l] = kernel.ci
+        else:
+            zr[l] = zi[l] = 0
+            cr[l] = points[k0 + l].real
+            ci[l] = points[k0 + l].imag
+            if kernel.interior_check and in_main_bulbs(cr[l], ci[l]):
+                todo[l] = False
+                out[k0 + l] = <count_t> kernel.max_iter
+        count += todo[l]
+    if not count:
+        return
+    jb_escape_lanes(False, n, zr, zi, cr, ci, todo, kernel.max_iter, RENDER_BAILOUT,
+                    kernel.periodicity_check and not kernel.julia, ite, executed, mag2)
+    for l in range(n):
+        if not todo[l]:
+            continue
+        if count_t is float:
+            out[k0 + l] = smooth_count(ite[l], mag2[l], kernel.max_iter)
+        else:
+            out[k0 + l] = <count_t> ite[l]
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _subdivide(count_t[:, ::1] out, const double[::1] x, const double[::1] y,
+                     int row0, int row1, int col0, int col1,
+                     const kernel_t *kernel, int64_t *stats) noexcept nogil:
+    """Fill the inside of a rectangle whose border, rows `row0`/`row1` and columns
+    `col0`/`col1` included, is already computed (Mariani-Silver algorithm)."""
+    cdef:
+        int i, j, mid
+        count_t value = out[row0, col0]
+        bint uniform = True
+
+    if row1 - row0 < 2 or col1 - col0 < 2:
+        return
+    if row1 - row0 <= 3 and col1 - col0 <= 3:
+        # Too small to be worth checking, compute the inside directly.
+        for j in range(row0 + 1, row1):
+            for i in range(col0 + 1, col1):
+                _compute_pixel(out, x, y, j, i, kernel, stats)
+        return
+
+    for i in range(col0, col1 + 1):
+        if out[row0, i] != value or out[row1, i] != value:
+            uniform = False
+            break
+    if uniform:
+        for j in range(row0 + 1, row1):
+            if out[j, col0] != value or out[j, col1] != value:
+                uniform = False
+                break
+    if uniform and kernel.exact_fill and value != <count_t> kernel.max_iter:
+        uniform = False
+
+    if uniform:
+        for j in range(row0 + 1, row1):
+            for i in range(col0 + 1, col1):
+                out[j, i] = value
+    elif row1 - row0 >= col1 - col0:
+        mid = (row0 + row1) // 2
+        for i in range(col0 + 1, col1):
+            _compute_pixel(out, x, y, mid, i, kernel, stats)
+        _subdivide(out, x, y, row0, mid, col0, col1, kernel, stats)
+        _subdivide(out, x, y, mid, row1, col0, col1, kernel, stats)
+    else:
+        mid = (col0 + col1) // 2
+        for j in range(row0 + 1, row1):
+            _compute_pixel(out, x, y, j, mid, kernel, stats)
+        _subdivide(out, x, y, row0, row1, col0, mid, kernel, stats)
+        _subdivide(out, x, y, row0, row1, mid, col1, kernel, stats)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline void _render_tile(count_t[:, ::1] out, const double[::1] x, const double[::1] y,
+                              int tile, int ntx, int tile_size,
+                              const kernel_t *kernel) noexcept nogil:
+    cdef:
+        int i, j
+        int row0 = (tile // ntx) * tile_size
+        int col0 = (tile % ntx) * tile_size
+        int row1 = min(row0 + tile_size, <int> y.shape[0])
+        int col1 = min(col0 + tile_size, <int> x.shape[0])
+        # Every tile has its own counters, the threads never share them.
+        int64_t *stats = NULL
+
+    if kernel_cancelled(kernel):
+        return
+    if kernel.stats != NULL:
+        stats = kernel.stats + tile * NSTATS
+    if kernel.lanes:
+        for j in range(row0, row1):
+            if kernel_cancelled(kernel):
+                return
+            i = col0
+            while i < col1:
+                _compute_lanes(out, x, y, j, i, min(i + JB_LANES, col1), kernel, stats)
+                i += JB_LANES
+        return
+    if not kernel.subdivide:
+        for j in range(row0, row1):
+            if kernel_cancelled(kernel):
+                return
+            for i in range(col0, col1):
+                _compute_pixel(out, x, y, j, i, kernel, stats)
+        return
+
+    for i in range(col0, col1):
+        _compute_pixel(out, x, y, row0, i, kernel, stats)
+        if row1 - 1 > row0:
+            _compute_pixel(out, x, y, row1 - 1, i, kernel, stats)
+    for j in range(row0 + 1, row1 - 1):
+        _compute_pixel(out, x, y, j, col0, kernel, stats)
+        if col1 - 1 > col0:
+            _compute_pixel(out, x, y, j, col1 - 1, kernel, stats)
+    _subdivide(out, x, y, row0, row1 - 1, col0, col1 - 1, kernel, stats)
+
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline bint _differs(count_t a, count_t b) noexcept nogil:
+    if count_t is float:
+        return fabs(a - b) >= 1
+    return a != b
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _mark_tile(count_t[:, ::1] out, uint8_t[:, ::1] marks, int tile, int ntx,
+                     int tile_size) noexcept nogil:
+    """Mark the pixels of a tile whose count differs from one of their 4 neighbours,
+    by at least 1 for smooth counts."""
+    cdef:
+        int i, j
+        int height = out.shape[0], width = out.shape[1]
+        int row0 = (tile // ntx) * tile_size
+        int col0 = (tile % ntx) * tile_size
+        int row1 = min(row0 + tile_size, height)
+        int col1 = min(col0 + tile_size, width)
+        count_t value
+
+    for j in range(row0, row1):
+        for i in range(col0, col1):
+            value = out[j, i]
+            marks[j, i] = (
+                (i > 0 and _differs(value, out[j, i - 1]))
+                or (i < width - 1 and _differs(value, out[j, i + 1]))
+                or (j > 0 and _differs(value, out[j - 1, i]))
+                or (j < height - 1 and _differs(value, out[j + 1, i]))
+            )
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _refine_tile(count_t[:, ::1] out, const double[::1] x, const double[::1] y,
+                       const uint8_t[:, ::1] marks, int tile, int ntx, int tile_size,
+                       const kernel_t *kernel) noexcept nogil:
+    """Supersample the marked pixels of a tile."""
+    cdef:
+        int i, j
+        int row0 = (tile // ntx) * tile_size
+        int col0 = (tile % ntx) * tile_size
+        int row1 = min(row0 + tile_size, <int> y.shape[0])
+        int col1 = min(col0 + tile_size, <int> x.shape[0])
+        int64_t *stats = NULL
+
+    if kernel.stats != NULL:
+        stats = kernel.stats + tile * NSTATS
+    for j in range(row0, row1):
+        if kernel_cancelled(kernel):
+            return
+        for i in range(col0, col1):
+            if marks[j, i]:
+                _compute_samples(out, x, y, j, i, kernel, stats)
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline void _finish_tile(int tile, int ntx, int tile_size, int width, int height,
+                              const kernel_t *kernel) noexcept nogil:
+    """Add the pixels of a tile to the progress counter, unless it was cancelled."""
+    cdef:
+        int row0 = (tile // ntx) * tile_size
+        int col0 = (tile % ntx) * tile_size
+
+    if kernel.progress != NULL and not kernel_cancelled(kernel):
+        jb_atomic_add(kernel.progress,
+                      <int64_t> (min(row0 + tile_size, height) - row0)
+                      * (min(col0 + tile_size, width) - col0))
+
+
+def render(const double[::1] x, const double[::1] y, double complex c, int max_iter,
+           count_t[:, ::1] out, bint julia=False, int num_threads=0, str schedule="dynamic",
+           int chunksize=1, int tile_size=TILE_SIZE, bint interior_check=False,
+           bint periodicity_check=False, str method="escape", bint exact=False,
+           const double[::1] x_lo=None, const double[::1] y_lo=None,
+           int64_t[::1] stats=None, bint vectorize=True, bint single=False,
+           double pixel_size=0, int supersample=1, bint adaptive=False,
+           int64_t[::1] progress=None, const uint8_t[::1] cancel=None):
+    """Compute the escape counts of a grid, tile by tile.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Real parts of the grid, one per column.
+    y : np.ndarray
+        Imaginary parts of the grid, one per row.
+    c : complex
+        Julia constant, ignored for the Mandelbrot set.
+    max_iter : int
+        Maximum number of iterations.
+    out : np.ndarray
+        Row-major buffer of shape `(y.size, x.size)` receiving the counts. Integer
+        buffers (`np.uint8`, `np.uint16` or `np.int32`) receive the iteration counts,
+        `np.float32` buffers receive smooth counts.
+    julia : bool
+        Compute the Julia set of `c` instead of the Mandelbrot set.
+    num_threads : int
+        Number of threads to use, all the available ones if 0.
+    schedule : str
+        OpenMP schedule of the tiles, one of "static", "dynamic" or "guided".
+    chunksize : int
+        Number of tiles handed to a thread at once.
+    tile_size : int
+        Side of the square tiles, in pixels.
+    interior_check : bool
+        Skip the iterations of the points of the main cardioid and of the period-2
+        bulb of the Mandelbrot set, which never escape.
+    periodicity_check : bool
+        Stop iterating the Mandelbrot orbits which exactly repeat themselves.
+    method : str
+        "escape" to compute every pixel, "mariani" to compute the borders of the tiles
+        and fill those with a uniform border, splitting the others in two until they
+        are small enough (Mariani-Silver algorithm).
+    exact : bool
+        With the "mariani" method, only fill the regions whose border is in the set.
+        As the sets have no holes, this only misses details thinner than a pixel
+        crossing the border.
+    x_lo : Optional[np.ndarray]
+        Low parts of the double-double real parts of the grid, `x` holding the high
+        parts. The orbits are then computed in double-double precision.
+    y_lo : Optional[np.ndarray]
+        Low parts of the double-double imaginary parts of the grid, given with `x_lo`.
+    stats : Optional[np.ndarray]
+        `np.int64` array receiving the work counters named in `STATS`, which are added
+        to it: the pixels computed by the kernels, the iterations they executed, the
+        pixels escaping before `max_iter` and the bounded ones settled before
+        `max_iter` by the interior or periodicity checks.
+    vectorize : bool
+        Iterate several pixels of the rows at once with the vector instructions of
+        `simd_level`, when they are faster than pixel by pixel: the counts are the
+        same. Only double precision grids computed with the "escape" method are
+        vectorized, and doubles need AVX2.
+    single : bool
+        Iterate the vectorized pixels in single precision, with twice as many pixels
+        per instruction. The counts of the pixels near the boundary of the set change
+        for pixel sizes below about 1e-3.
+    pixel_size : float
+        Spacing of the grid, needed to supersample.
+    supersample : int
+        Average the counts of `supersample` x `supersample` samples per pixel, on a
+        regular grid centred on the coordinates of the pixel, rounded for integer
+        counts. The samples are counted by `stats`.
+    adaptive : bool
+        Only supersample the pixels whose count differs from one of their 4
+        neighbours, by at least 1 for smooth counts, once every pixel is computed.
+        This takes a byte per pixel.
+    progress : Optional[np.ndarray]
+        `np.int64` array of one element to which the pixels of the tiles are added as
+        they are finished, twice with adaptive supersampling. It can be read by other
+        threads during the render.
+    cancel : Optional[np.ndarray]
+        `np.uint8` array of one element which other threads can set to stop the
+        render: the tiles not started yet are skipped and the others stop before their
+        next row, leaving the counts incomplete.
+
+    Returns
+    -------
+    np.ndarray
+        The `out` buffer.
+    """
+    check_schedule(schedule, chunksize)
+    check_method(method)
+    if out.shape[0] != y.shape[0] or out.shape[1] != x.shape[0]:
+        raise ValueError(
+            f"out must have shape {(y.shape[0], x.shape[0])}, got {(out.shape[0], out.shape[1])}"
+        )
+    _check_fits(out, max_iter)
+    if (x_lo is None) != (y_lo is None):
+        raise ValueError("x_lo and y_lo must be given together")
+    if x_lo is not None and (x_lo.shape[0] != x.shape[0] or y_lo.shape[0] != y.shape[0]):
+        raise ValueError("x_lo and y_lo must have the shapes of x and y")
+    if tile_size < 1:
+        raise ValueError(f"tile_size must be strictly positive, got {tile_size}")
+    if stats is not None and stats.shape[0] != NSTATS:
+        raise ValueError(f"stats must have {NSTATS} elements, got {stats.shape[0]}")
+    if supersample < 1:
+        raise ValueError(f"supersample must be strictly positive, got {supersample}")
+    if supersample > 1 and not pixel_size > 0:
+        raise ValueError(f"supersampling needs a positive pixel_size, got {pixel_size}")
+    if progress is not None and progress.shape[0] < 1:
+        raise ValueError("progress must have an element")
+    if cancel is not None and cancel.shape[0] < 1:
+        raise ValueError("cancel must have an element")
+    cdef:
+        int ntx = (x.shape[0] + tile_size - 1) // tile_size
+        int nty = (y.shape[0] + tile_size - 1) // tile_size
+        int tile, ntiles = ntx * nty
+        int width = x.shape[0], height = y.shape[0]
+        int n = resolve_threads(num_threads)
+        int64_t[:, ::1] tile_stats
+        uint8_t[:, ::1] marks
+        kernel_t kernel
+
+    kernel.julia = julia
+    kernel.cr = c.real
+    kernel.ci = c.imag
+    kernel.max_iter = max_iter
+    kernel.interior_check = interior_check
+    kernel.periodicity_check = periodicity_check
+    kernel.subdivide = method == "mariani"
+    kernel.exact_fill = exact
+    kernel.x_lo = NULL
+    kernel.y_lo = NULL
+    if x_lo is not None and x_lo.shape[0] > 0 and y_lo.shape[0] > 0:
+        kernel.x_lo = &x_lo[0]
+        kernel.y_lo = &y_lo[0]
+    kernel.lanes = (vectorize and jb_lanes_enabled(single) and kernel.x_lo == NULL
+                    and not kernel.subdivide)
+    kernel.single = single
+    # With adaptive supersampling, every pixel is first computed from a single sample.
+    kernel.supersample = 1 if adaptive else supersample
+    kernel.sample_step = pixel_size / supersample
+    if kernel.supersample > 1:
+        kernel.lanes = False
+    kernel.cancel = NULL if cancel is None else &cancel[0]
+    kernel.progress = NULL if progress is None else &progress[0]
+    kernel.stats = NULL
+    if stats is not None and ntiles > 0:
+        tile_stats = np.zeros((ntiles, NSTATS), dtype=np.int64)
+        kernel.stats = &tile_stats[0, 0]
+
+    if schedule == "static":
+        for tile in prange(ntiles, nogil=True, schedule='static', chunksize=chunksize, num_threads=n):
+            _render_tile(out, x, y, tile, ntx, tile_size, &kernel)
+            _finish_tile(tile, ntx, tile_size, width, height, &kernel)
+    elif schedule == "guided":
+        for tile in prange(ntiles, nogil=True, schedule='guided', chunksize=chunksize, num_threads=n):
+            _render_tile(out, x, y, tile, ntx, tile_size, &kernel)
+            _finish_tile(tile, ntx, tile_size, width, height, &kernel)
+    else:
+        for tile in prange(ntiles, nogil=True, schedule='dynamic', chunksize=chunksize, num_threads=n):
+            _render_tile(out, x, y, tile, ntx, tile_size, &kernel)
+            _finish_tile(tile, ntx, tile_size, width, height, &kernel)
+
+    if adaptive and supersample > 1:
+        # All the pixels are marked before any is refined, so that the marks only
+        # depend on the single sample counts.
+        marks = np.empty((out.shape[0], out.shape[1]), dtype=np.uint8)
+        kernel.supersample = supersample
+        for tile in prange(ntiles, nogil=True, schedule='static', num_threads=n):
+            _mark_tile(out, marks, tile, ntx, tile_size)
+        for tile in prange(ntiles, nogil=True, schedule='dynamic', num_threads=n):
+            _refine_tile(out, x, y, marks, tile, ntx, tile_size, &kernel)
+            _finish_tile(tile, ntx, tile_size, width, height, &kernel)
+
+    if kernel.stats != NULL:
+        np.asarray(stats)[:] += np.asarray(tile_stats).sum(axis=0)
+    return out.base
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def count_points(const double complex[::1] points, double complex c, int max_iter,
+                 count_t[::1] out, bint julia=False, int num_threads=0,
+                 bint interior_check=False, bint periodicity_check=False,
+                 bint vectorize=True):
+    """Compute the escape counts of arbitrary points, like `render` does for a grid.
+
+    Parameters
+    ----------
+    points : np.ndarray
+        Flat array of points: values of `c` for the Mandelbrot set, starting values of
+        the orbits for the Julia set.
+    c : complex
+        Julia constant, ignored for the Mandelbrot set.
+    max_iter : int
+        Maximum number of iterations.
+    out : np.ndarray
+        Flat buffer receiving the counts, with the same types as in `render`.
+    julia : bool
+        Compute the Julia set of `c` instead of the Mandelbrot set.
+    num_threads : int
+        Number of threads to use, all the available ones if 0.
+    interior_check : bool
+        Skip the iterations of the points of the main cardioid and of the period-2
+        bulb of the Mandelbrot set, as in `render`.
+    periodicity_check : bool
+        Stop iterating the Mandelbrot orbits which exactly repeat themselves, as in
+        `render`.
+    vectorize : bool
+        Iterate several points at once with the vector instructions, as in `render`.
+
+    Returns
+    -------
+    np.ndarray
+        The `out` buffer.
+    """
+    if out.shape[0] != points.shape[0]:
+        raise ValueError("out must have as many elements as points")
+    cdef:
+        Py_ssize_t k, size = points.shape[0]
+        int ite, executed
+        double mag2
+        kernel_t kernel
+        int n = resolve_threads(num_threads)
+
+    kernel.julia = julia
+    kernel.cr = c.real
+    kernel.ci = c.imag
+    kernel.max_iter = max_iter
+    kernel.interior_check = interior_check
+    kernel.periodicity_check = periodicity_check
+    if vectorize and jb_lanes_enabled(False):
+        for k in prange((size + JB_LANES - 1) // JB_LANES, nogil=True, schedule='guided',
+                        num_threads=n):
+            _count_lanes(out, points, k * JB_LANES, min((k + 1) * JB_LANES, size),
+                         &kernel)
+        return out.base
+
+    for k in prange(points.shape[0], nogil=True, schedule='guided', num_threads=n):
+        ite = kernel_escape(&kernel, points[k].real, points[k].imag, &mag2, &executed)
+        if count_t is float:
+            out[k] = smooth_count(ite, mag2, max_iter)
+        else:
+            out[k] = <count_t> ite
+
+    return out.base
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def bounded_points(const double complex[::1] points, double complex c, int max_iter,
+                   uint8_t[::1] out, bint julia=False, int num_threads=0):
+    """Check which points have an orbit staying in the disk of radius 2.
+
+    A point is bounded when none of the first `max_iter` iterates of its orbit has a
+    modulus greater than 2, like `is_in_mandelbrot` and `is_in_julia` check.
+
+    Parameters
+    ----------
+    points : np.ndarray
+        Flat array of points: values of `c` for the Mandelbrot set, starting values of
+        the orbits for the Julia set.
+    c : complex
+        Julia constant, ignored for the Mandelbrot set.
+    max_iter : int
+        Maximum number of iterations.
+    out : np.ndarray
+        Flat buffer receiving 1 for the bounded points and 0 for the others.
+    julia : bool
+        Compute the Julia set of `c` instead of the Mandelbrot set.
+    num_threads : int
+        Number of threads to use, all the available ones if 0.
+
+    Returns
+    -------
+    np.ndarray
+        The `out` buffer.
+    """
+    if out.shape[0] != points.shape[0]:
+        raise ValueError("out must have as many elements as points")
+    cdef:
+        Py_ssize_t k
+        double zr, zi, mag2
+        double cr = c.real, ci = c.imag
+        int n = resolve_threads(num_threads)
+
+    if max_iter <= 0:
+        out[:] = 1
+        return out.base
+
+    for k in prange(points.shape[0], nogil=True, schedule='guided', num_threads=n):
+        if julia:
+            # The starting point itself is not checked, only its iterates.
+            zr = points[k].real
+            zi = points[k].imag
+            zr, zi = zr*zr - zi*zi + cr, 2*zr*zi + ci
+            julia_escape(zr, zi, cr, ci, max_iter - 1, 4.0, &mag2)
+        else:
+            mandelbrot_escape(points[k].real, points[k].imag, max_iter, 4.0, &mag2)
+        # The loop stops on escaping or after computing the last iterate, which
+        # remains to be checked.
+        out[k] = mag2 <= 4.0
+
+    return out.base
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def resume_points(const int64_t[::1] index, double[::1] zr, double[::1] zi,
+                  const double[::1] x, const double[::1] y, double complex c,
+                  int start_iter, int max_iter, count_t[:, ::1] out, uint8_t[::1] status,
+                  bint julia=False, bint interior_check=False, bint periodicity_check=False,
+                  int num_threads=0):
+    """Continue the orbits of pixels of a grid still bounded after `start_iter` iterations.
+
+    The counts are the ones `render` computes with `max_iter` iterations, only the
+    iterations after `start_iter` are computed.
+
+    Parameters
+    ----------
+    index : np.ndarray
+        Flat indices of the pixels in the `(y.size, x.size)` grid.
+    zr : np.ndarray
+        Real parts of the last values of the orbits, updated in place.
+    zi : np.ndarray
+        Imaginary parts of the last values of the orbits, updated in place.
+    x : np.ndarray
+        Real parts of the grid, one per column.
+    y : np.ndarray
+        Imaginary parts of the grid, one per row.
+    c : complex
+        Julia constant, ignored for the Mandelbrot set.
+    start_iter : int
+        Number of iterations already computed.
+    max_iter : int
+        Maximum number of iterations.
+    out : np.ndarray
+        Row-major buffer of shape `(y.size, x.size)` receiving the counts of the
+        pixels, with the same types as in `render`.
+    status : np.ndarray
+        Buffer receiving 0 for the pixels which escaped, 1 for the ones still bounded
+        and 2 for the ones which never escape.
+    julia : bool
+        Compute the Julia set of `c` instead of the Mandelbrot set.
+    interior_check : bool
+        Skip the iterations of the points of the main cardioid and of the period-2
+        bulb of the Mandelbrot set, which never escape.
+    periodicity_check : bool
+        Stop iterating the orbits which exactly repeat themselves.
+    num_threads : int
+        Number of threads to use, all the available ones if 0.
+
+    Returns
+    -------
+    np.ndarray
+        The `status` buffer.
+    """
+    cdef Py_ssize_t npoints = index.shape[0]
+
+    if zr.shape[0] != npoints or zi.shape[0] != npoints or status.shape[0] != npoints:
+        raise ValueError("zr, zi and status must have as many elements as index")
+    if out.shape[0] != y.shape[0] or out.shape[1] != x.shape[0]:
+        raise ValueError(
+            f"out must have shape {(y.shape[0], x.shape[0])}, got {(out.shape[0], out.shape[1])}"
+        )
+    _check_fits(out, max_iter)
+    cdef:
+        Py_ssize_t k, row, col, width = x.shape[0]
+        int ite, step, window
+        uint8_t state
+        double ar, ai, br, bi, sr, si, mag2
+        int n = resolve_threads(num_threads)
+
+    for k in prange(npoints, nogil=True, schedule='guided', num_threads=n):
+        row = index[k] // width
+        col = index[k] % width
+        if julia:
+            br = c.real
+            bi = c.imag
+        else:
+            br = x[col]
+            bi = y[row]
+        ar = zr[k]
+        ai = zi[k]
+        ite = start_iter
+        state = 1
+        # Brent's cycle detection restarts from the current value of the orbit.
+        sr = ar
+        si = ai
+        step = 0
+        window = 1
+        if interior_check and not julia and in_main_bulbs(br, bi):
+            ite = max_iter
+            state = 2
+        while state == 1 and (ar*ar + ai*ai) <= RENDER_BAILOUT and ite < max_iter:
+            ar, ai = ar*ar - ai*ai + br, 2*ar*ai + bi
+            ite = ite + 1
+            if periodicity_check:
+                if ar == sr and ai == si:
+                    ite = max_iter
+                    state = 2
+                    break
+                step = step + 1
+                if step == window:
+                    step = 0
+                    if window < 1 << 20:
+                        window = window << 1
+                    sr = ar
+                    si = ai
+        mag2 = ar*ar + ai*ai
+        if ite < max_iter:
+            state = 0
+        zr[k] = ar
+        zi[k] = ai
+        status[k] = state
+        if count_t is float:
+            out[row, col] = smooth_count(ite, mag2, max_iter)
+        else:
+            out[row, col] = <count_t> ite
+
+    return status.base
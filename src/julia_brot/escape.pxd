@@ -0,0 +1,319 @@
+from libc.math cimport log, log2
+from libc.stdint cimport int32_t, int64_t, uint8_t, uint16_t
+
+
+cdef extern from *:
+    """
+    /* Squared escape radius of the rendering kernels. */
+    #define JB_RENDER_BAILOUT 2.0
+    """
+    const double RENDER_BAILOUT "JB_RENDER_BAILOUT"
+
+
+cdef extern from *:
+    """
+    /* Progress counter and cancellation flag of the renders, shared with the threads
+       of the caller. */
+    #if defined(_MSC_VER)
+    #include <intrin.h>
+    static void jb_atomic_add(int64_t *p, int64_t v) {
+        _InterlockedExchangeAdd64((volatile __int64 *) p, v);
+    }
+    static int jb_flag_set(const uint8_t *p) { return *(const volatile uint8_t *) p; }
+    #else
+    static void jb_atomic_add(int64_t *p, int64_t v) {
+        __atomic_fetch_add(p, v, __ATOMIC_RELAXED);
+    }
+    static int jb_flag_set(const uint8_t *p) { return __atomic_load_n(p, __ATOMIC_RELAXED); }
+    #endif
+    """
+    void jb_atomic_add(int64_t *p, int64_t v) noexcept nogil
+    bint jb_flag_set(const uint8_t *p) noexcept nogil
+
+
+ctypedef fused count_t:
+    uint8_t
+    uint16_t
+    int32_t
+    float
+
+
+cdef enum:
+    # Work counters of the rendering kernels, per tile.
+    STAT_PIXELS = 0  # Pixels computed by the kernels.
+    STAT_ITERATIONS = 1  # Iterations executed.
+    STAT_ESCAPED = 2  # Pixels escaping before max_iter.
+    STAT_SHORTCUT = 3  # Bounded pixels settled before max_iter by the interior checks.
+    NSTATS = 4
+
+
+ctypedef struct kernel_t:
+    # Options of the rendering kernels, shared by all the pixels of a render.
+    bint julia
+    double cr
+    double ci
+    int max_iter
+    bint interior_check
+    bint periodicity_check
+    # Mariani-Silver subdivision, only filling regions inside the set if exact_fill.
+    bint subdivide
+    bint exact_fill
+    # Low parts of the double-double coordinates of the grid, NULL in double precision.
+    const double *x_lo
+    const double *y_lo
+    # Work counters, NSTATS per tile, NULL when they are not collected.
+    int64_t *stats
+    # Iterate several pixels of the rows at once with the vector instructions, in
+    # single precision if single.
+    bint lanes
+    bint single
+    # Average supersample x supersample samples per pixel, sample_step apart and
+    # centred on the coordinates of the pixel.
+    int supersample
+    double sample_step
+    # Flag stopping the render once set, and counter receiving the pixels of the
+    # finished tiles, NULL when they are not used.
+    const uint8_t *cancel
+    int64_t *progress
+
+
+ctypedef struct dd_t:
+    # Double-double number, the unevaluated sum of two doubles with |lo| <= ulp(hi) / 2.
+    double hi
+    double lo
+
+
+cdef inline int mandelbrot_escape(double cr, double ci, int max_iter, double bailout,
+                                  double *mag2) noexcept nogil:
+    """Number of iterations before the orbit of 0 under z**2 + c escapes.
+
+    The orbit escapes once its squared modulus exceeds `bailout`. The squared modulus
+    of the last value of the orbit is stored in `mag2`.
+    """
+    cdef:
+        double zr = 0, zi = 0
+        int ite = 0
+
+    while (zr*zr + zi*zi) <= bailout and ite < max_iter:
+        zr, zi = zr*zr - zi*zi + cr, 2*zr*zi + ci
+        ite += 1
+    mag2[0] = zr*zr + zi*zi
+    return ite
+
+
+cdef inline bint in_main_bulbs(double cr, double ci) noexcept nogil:
+    """Whether c lies in the main cardioid or in the period-2 bulb of the Mandelbrot set.
+
+    The orbits of these points converge to an attracting fixed point or 2-cycle and
+    never escape.
+    """
+    cdef double xr = cr - 0.25, q = xr*xr + ci*ci
+
+    if q * (q + xr) < 0.25 * ci*ci:
+        return True
+    return (cr + 1)*(cr + 1) + ci*ci < 0.0625
+
+
+cdef inline int mandelbrot_escape_periodic(double cr, double ci, int max_iter, double bailout,
+                                           double *mag2, int *executed) noexcept nogil:
+    """Same as `mandelbrot_escape`, stopping early on periodic orbits.
+
+    The orbit is compared to a saved value, refreshed after windows of doubling length
+    (Brent's cycle detection). An orbit which exactly repeats a previous value is
+    periodic and never escapes, so it is given `max_iter` iterations right away. The
+    number of iterations actually computed is stored in `executed`.
+    """
+    cdef:
+        double zr = 0, zi = 0, sr = 0, si = 0
+        int ite = 0, step = 0, window = 1
+
+    executed[0] = -1
+    while (zr*zr + zi*zi) <= bailout and ite < max_iter:
+        zr, zi = zr*zr - zi*zi + cr, 2*zr*zi + ci
+        ite += 1
+        if zr == sr and zi == si:
+            executed[0] = ite
+            ite = max_iter
+            break
+        step += 1
+        if step == window:
+            step = 0
+            if window < 1 << 20:
+                window <<= 1
+            sr = zr
+            si = zi
+    if executed[0] < 0:
+        executed[0] = ite
+    mag2[0] = zr*zr + zi*zi
+    return ite
+
+
+cdef inline int julia_escape(double zr, double zi, double cr, double ci, int max_iter,
+                             double bailout, double *mag2) noexcept nogil:
+    """Number of iterations before the orbit of z under z**2 + c escapes.
+
+    The orbit escapes once its squared modulus exceeds `bailout`. The squared modulus
+    of the last value of the orbit is stored in `mag2`.
+    """
+    cdef int ite = 0
+
+    while (zr*zr + zi*zi) <= bailout and ite < max_iter:
+        zr, zi = zr*zr - zi*zi + cr, 2*zr*zi + ci
+        ite += 1
+    mag2[0] = zr*zr + zi*zi
+    return ite
+
+
+cdef inline float smooth_count(int ite, double mag2, int max_iter) noexcept nogil:
+    """Continuous iteration count, removing the banding of the integer counts.
+
+    The escape radius is factored out so that the count never exceeds `ite`, and
+    points of the set keep the largest count.
+    """
+    if ite >= max_iter:
+        return max_iter
+    return ite - log2(log(mag2) / log(RENDER_BAILOUT))
+
+
+cdef inline bint kernel_cancelled(const kernel_t *kernel) noexcept nogil:
+    """Whether the caller of the render asked to stop it."""
+    return kernel.cancel != NULL and jb_flag_set(kernel.cancel)
+
+
+cdef inline int kernel_escape(const kernel_t *kernel, double x, double y,
+                              double *mag2, int *executed) noexcept nogil:
+    """Number of iterations of the pixel at `x + iy` with the given kernel options.
+
+    The number of iterations actually computed, smaller than the count of the points
+    settled by the interior checks, is stored in `executed`.
+    """
+    if kernel.julia:
+        executed[0] = julia_escape(x, y, kernel.cr, kernel.ci, kernel.max_iter,
+                                   RENDER_BAILOUT, mag2)
+        return executed[0]
+    if kernel.interior_check and in_main_bulbs(x, y):
+        mag2[0] = 0
+        executed[0] = 0
+        return kernel.max_iter
+    if kernel.periodicity_check:
+        return mandelbrot_escape_periodic(x, y, kernel.max_iter, RENDER_BAILOUT, mag2,
+                                          executed)
+    executed[0] = mandelbrot_escape(x, y, kernel.max_iter, RENDER_BAILOUT, mag2)
+    return executed[0]
+
+
+cdef inline dd_t dd_quick_two_sum(double a, double b) noexcept nogil:
+    """Exact sum of two doubles with |a| >= |b|."""
+    cdef dd_t r
+    r.hi = a + b
+    r.lo = b - (r.hi - a)
+    return r
+
+
+cdef inline dd_t dd_two_sum(double a, double b) noexcept nogil:
+    """Exact sum of two doubles."""
+    cdef:
+        dd_t r
+        double bb
+
+    r.hi = a + b
+    bb = r.hi - a
+    r.lo = (a - (r.hi - bb)) + (b - bb)
+    return r
+
+
+cdef inline dd_t dd_two_prod(double a, double b) noexcept nogil:
+    """Exact product of two doubles, with Dekker's splitting."""
+    cdef:
+        dd_t r
+        double t, ah, al, bh, bl
+
+    t = 134217729.0 * a
+    ah = t - (t - a)
+    al = a - ah
+    t = 134217729.0 * b
+    bh = t - (t - b)
+    bl = b - bh
+    r.hi = a * b
+    r.lo = ((ah * bh - r.hi) + ah * bl + al * bh) + al * bl
+    return r
+
+
+cdef inline dd_t dd_add(dd_t a, dd_t b) noexcept nogil:
+    cdef dd_t s = dd_two_sum(a.hi, b.hi)
+    return dd_quick_two_sum(s.hi, s.lo + a.lo + b.lo)
+
+
+cdef inline dd_t dd_sub(dd_t a, dd_t b) noexcept nogil:
+    cdef dd_t s = dd_two_sum(a.hi, -b.hi)
+    return dd_quick_two_sum(s.hi, s.lo + a.lo - b.lo)
+
+
+cdef inline dd_t dd_mul(dd_t a, dd_t b) noexcept nogil:
+    cdef dd_t p = dd_two_prod(a.hi, b.hi)
+    return dd_quick_two_sum(p.hi, p.lo + a.hi * b.lo + a.lo * b.hi)
+
+
+cdef inline dd_t dd_sqr(dd_t a) noexcept nogil:
+    cdef dd_t p = dd_two_prod(a.hi, a.hi)
+    return dd_quick_two_sum(p.hi, p.lo + 2 * a.hi * a.lo)
+
+
+cdef inline int escape_dd(dd_t zr, dd_t zi, dd_t cr, dd_t ci, int max_iter, double bailout,
+                          bint periodicity_check, double *mag2, int *executed) noexcept nogil:
+    """Number of iterations before the orbit of z under z**2 + c escapes, computed in
+    double-double precision.
+
+    With `periodicity_check`, orbits which exactly repeat a previous value are given
+    `max_iter` iterations right away, like in `mandelbrot_escape_periodic`.
+    """
+    cdef:
+        dd_t zr2 = dd_sqr(zr), zi2 = dd_sqr(zi), prod, sr = zr, si = zi
+        int ite = 0, step = 0, window = 1
+
+    executed[0] = -1
+    while zr2.hi + zi2.hi <= bailout and ite < max_iter:
+        prod = dd_mul(zr, zi)
+        prod.hi *= 2
+        prod.lo *= 2
+        zi = dd_add(prod, ci)
+        zr = dd_add(dd_sub(zr2, zi2), cr)
+        zr2 = dd_sqr(zr)
+        zi2 = dd_sqr(zi)
+        ite += 1
+        if periodicity_check:
+            if zr.hi == sr.hi and zr.lo == sr.lo and zi.hi == si.hi and zi.lo == si.lo:
+                executed[0] = ite
+                ite = max_iter
+                break
+            step += 1
+            if step == window:
+                step = 0
+                if window < 1 << 20:
+                    window <<= 1
+                sr = zr
+                si = zi
+    if executed[0] < 0:
+        executed[0] = ite
+    mag2[0] = zr2.hi + zi2.hi
+    return ite
+
+
+cdef inline int kernel_escape_dd(const kernel_t *kernel, dd_t x, dd_t y,
+                                 double *mag2, int *executed) noexcept nogil:
+    """Same as `kernel_escape` for a pixel with double-double coordinates."""
+    cdef dd_t zero, cr, ci
+
+    zero.hi = zero.lo = 0
+    if kernel.julia:
+        cr.hi = kernel.cr
+        ci.hi = kernel.ci
+        cr.lo = ci.lo = 0
+        return escape_dd(x, y, cr, ci, kernel.max_iter, RENDER_BAILOUT,
+                         kernel.periodicity_check, mag2, executed)
+    if kernel.interior_check and in_main_bulbs(x.hi, y.hi):
+        mag2[0] = 0
+        executed[0] = 0
+        return kernel.max_iter
+    return escape_dd(zero, zero, x, y, kernel.max_iter, RENDER_BAILOUT,
+                     kernel.periodicity_check, mag2, executed)
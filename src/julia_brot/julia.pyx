@@ -1,32 +1,12 @@
-import cython
-import numpy as np
-from cython.parallel import prange
-
-from libc.stdlib cimport free, malloc
-
-
-@cython.boundscheck(False)
-@cython.wraparound(False)
-def fast_julia(double complex c, double complex zmin, double complex zmax, double pixel_size, int max_iter):
-    cdef:
-        double[:] x = np.arange(zmin.real, zmax.real, pixel_size)
-        double[:] y = np.arange(zmin.imag, zmax.imag, pixel_size)
-        int [:, ::1] julia = np.zeros((x.size, y.size), dtype = np.int32)
-        double zr, zi
-        double cr = c.real, ci = c.imag
-        int  i, j, nx=x.size, ny=y.size
-        int *ite
-
-    for j in prange(ny, nogil=True, schedule='dynamic'):
-        ite = <int *> malloc(sizeof(int))
-        for i in range(nx):
-            zr = x[i]
-            zi = y[j]
-            ite[0] = 0
-            while (zr*zr + zi*zi) <= 2 and ite[0] < max_iter:
-                zr, zi = zr*zr - zi*zi + cr, 2*zr*zi + ci
-                ite[0] += 1
-            julia[i, j] = ite[0]
-        free(ite)
-
-    return julia
\ No newline at end of file
+from julia_brot.engine import render_view
+
+
+def fast_julia(double complex c, double complex zmin, double complex zmax, double pixel_size, int max_iter,
+               int num_threads=0, str schedule="dynamic", int chunksize=1,
+               dtype=None, out=None, str method="escape", bint exact=False,
+               str precision="auto", bint symmetry=True, profile=None, int supersample=1,
+               bint adaptive=False):
+    return render_view(zmin, zmax, pixel_size, c, max_iter, out, dtype, julia=True,
+                       num_threads=num_threads, schedule=schedule, chunksize=chunksize,
+                       method=method, exact=exact, precision=precision, symmetry=symmetry,
+                       profile=profile, supersample=supersample, adaptive=adaptive)
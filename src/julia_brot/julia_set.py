@@ -1,16 +1,30 @@
 import logging
 import os
 import sys
-from typing import Optional, Union
+from typing import TYPE_CHECKING, Optional, Union
 
-import matplotlib.pyplot as plt
 import numpy as np
-from PIL import Image
+
+if TYPE_CHECKING:
+    from PIL.Image import Image
 
 if os.getenv("DOCS_BUILD", 0) == 0:
+    from julia_brot.engine import bounded_points, count_points, empty_counts
     from julia_brot.julia import fast_julia
 
-from .common import _handle_img, _normalize, _parse_args, _setup_logging
+from .cache import TileCache, as_tile_cache
+from .common import (
+    _colorize,
+    _flat_points,
+    _handle_img,
+    _parse_args,
+    _report_profile,
+    _setup_logging,
+)
+from .profiling import RenderProfile, stage
+from .progressive import _save_previews, progressive_julia
+from .state import resume_state
+from .stream import STRIP_HEIGHT, stream_render
 
 
 def _fast_julia(
@@ -19,6 +33,18 @@ def _fast_julia(
     zmax: complex,
     pixel_size: float,
     max_iter: int,
+    num_threads: int = 0,
+    schedule: str = "dynamic",
+    chunksize: int = 1,
+    dtype: Optional[np.dtype] = None,
+    out: Optional[np.ndarray] = None,
+    method: str = "escape",
+    exact: bool = False,
+    precision: str = "auto",
+    symmetry: bool = True,
+    profile: Optional[RenderProfile] = None,
+    supersample: int = 1,
+    adaptive: bool = False,
 ) -> np.ndarray:
     """Wrapper function around the Cython implementation of `fast_julia`.
 
@@ -34,14 +60,69 @@ def _fast_julia(
         Pixel size of the resulting plot.
     max_iter : int
         Maximum number of iterations.
+    num_threads : int
+        Number of threads to use, all the available ones if 0.
+    schedule : str
+        OpenMP schedule of the tiles, one of "static", "dynamic" or "guided".
+    chunksize : int
+        Number of tiles handed to a thread at once.
+    dtype : Optional[np.dtype]
+        Type of the counts: `np.uint8`, `np.uint16` or `np.int32` for iteration
+        counts, `np.float32` for smooth counts. Defaults to the smallest integer type
+        holding `max_iter`.
+    out : Optional[np.ndarray]
+        Preallocated row-major buffer of shape `(height, width)` receiving the counts,
+        which sets their type. Any object exposing a writable buffer is accepted.
+    method : str
+        "escape" to compute every pixel, "mariani" to skip the regions of uniform
+        count with the Mariani-Silver algorithm.
+    exact : bool
+        With the "mariani" method, only skip the regions inside the set.
+    precision : str
+        "double", "double-double", or "auto" to switch to double-double coordinates
+        and orbits when `pixel_size` is smaller than about 1e-13 times the magnitude
+        of the coordinates, where doubles lose the details of the sets. "single"
+        iterates the orbits in single precision with the vector instructions, which
+        is faster for overviews but changes the counts near the boundary of the sets.
+    symmetry : bool
+        Only compute one side of the parts of the viewport symmetric about the
+        origin, and mirror it. The grid moves by at most a quarter of a pixel so
+        that the mirrored pixels line up exactly.
+    profile : Optional[RenderProfile]
+        Profile receiving the time and memory of the stages and the work counters of
+        the kernels.
+    supersample : int
+        Average the counts of `supersample` x `supersample` samples per pixel,
+        computed inside the kernel so that the memory stays at the size of the image.
+    adaptive : bool
+        Only supersample the pixels whose count differs from one of their neighbours.
 
     Returns
     -------
     np.ndarray
-        Numpy array of the computed set with type `np.float32`
+        Numpy array of the computed set, of shape `(height, width)`. It shares its
+        memory with `out` when given.
     """
-    arr = fast_julia(c, zmin, zmax, pixel_size, max_iter)
-    return np.asarray(arr).astype(np.float32)
+    arr = fast_julia(
+        c,
+        zmin,
+        zmax,
+        pixel_size,
+        max_iter,
+        num_threads,
+        schedule,
+        chunksize,
+        dtype,
+        out,
+        method,
+        exact,
+        precision,
+        symmetry,
+        profile,
+        supersample,
+        adaptive,
+    )
+    return np.asarray(arr)
 
 
 def _generate_julia_img(
@@ -50,7 +131,16 @@ def _generate_julia_img(
     zmax: complex = 2 + 2j,
     pixel_size: float = 0.1,
     max_iter: int = 10,
-) -> Image:
+    num_threads: int = 0,
+    method: str = "escape",
+    cache: Optional[Union[TileCache, str, os.PathLike]] = None,
+    resume: Optional[Union[str, os.PathLike]] = None,
+    profile: Optional[RenderProfile] = None,
+    supersample: int = 1,
+    adaptive: bool = False,
+    schedule: str = "dynamic",
+    chunksize: int = 1,
+) -> "Image":
     """Generate an image of a Julia set.
 
     Parameters
@@ -65,6 +155,29 @@ def _generate_julia_img(
         Pixel size of the resulting plot.
     max_iter : int
         Maximum number of iterations.
+    num_threads : int
+        Number of threads to use, all the available ones if 0.
+    method : str
+        "escape" to compute every pixel, "mariani" to skip the regions of uniform
+        count with the Mariani-Silver algorithm.
+    cache : Optional[Union[TileCache, str, os.PathLike]]
+        Tile cache, or its directory, reusing the counts of previous renders. The
+        viewport is then aligned on a multiple of `pixel_size`.
+    resume : Optional[Union[str, os.PathLike]]
+        State file continuing the render of the same viewport with fewer iterations
+        saved there, which is updated. Takes precedence over `cache`.
+    profile : Optional[RenderProfile]
+        Profile receiving the time and memory of the stages and the work counters of
+        the kernels.
+    supersample : int
+        Anti-alias the image with `supersample` x `supersample` samples per pixel,
+        averaged by the kernel. Not supported with `cache` or `resume`.
+    adaptive : bool
+        Only supersample the pixels whose count differs from one of their neighbours.
+    schedule : str
+        OpenMP schedule of the tiles, one of "static", "dynamic" or "guided".
+    chunksize : int
+        Number of tiles handed to a thread at once.
 
     Returns
     -------
@@ -72,11 +185,39 @@ def _generate_julia_img(
         Handle of the image.
     """
     logging.debug(f"Generating a Julia set image.")
-    arr = _fast_julia(c, zmin, zmax, pixel_size, max_iter)
-    arr = 1 - _normalize(arr)
-    cm = plt.get_cmap("inferno")
-    arr = cm(arr.T)
-    return Image.fromarray((arr[:, :, :3] * 255).astype(np.uint8))
+    cache = as_tile_cache(cache)
+    if supersample > 1 and (cache is not None or resume is not None):
+        raise ValueError("supersample is not supported with a cache or a resume file")
+    if resume is not None:
+        with stage(profile, "resume"):
+            arr = resume_state(
+                resume, True, c, zmin, zmax, pixel_size, max_iter, num_threads
+            )
+    elif cache is not None:
+        with stage(profile, "cache"):
+            arr = cache.render(
+                True, c, zmin, zmax, pixel_size, max_iter, None, num_threads, method
+            )
+    else:
+        arr = _fast_julia(
+            c,
+            zmin,
+            zmax,
+            pixel_size,
+            max_iter,
+            num_threads,
+            method=method,
+            profile=profile,
+            supersample=supersample,
+            adaptive=adaptive,
+            schedule=schedule,
+            chunksize=chunksize,
+        )
+    rgb = _colorize(arr, num_threads=num_threads, profile=profile)
+    with stage(profile, "image"):
+        from PIL import Image
+
+        return Image.fromarray(rgb)
 
 
 def plot_julia(
@@ -86,7 +227,17 @@ def plot_julia(
     pixel_size: float = 0.1,
     max_iter: int = 10,
     figname: Optional[Union[str, bytes, os.PathLike]] = None,
-):
+    num_threads: int = 0,
+    show: Optional[bool] = None,
+    method: str = "escape",
+    cache: Optional[Union[TileCache, str, os.PathLike]] = None,
+    resume: Optional[Union[str, os.PathLike]] = None,
+    profile: bool = False,
+    supersample: int = 1,
+    adaptive: bool = False,
+    schedule: str = "dynamic",
+    chunksize: int = 1,
+) -> Optional[RenderProfile]:
     """Plot the Julia set corresponding to the given `c` constant.
 
     Parameters
@@ -103,6 +254,36 @@ def plot_julia(
         Maximum number of iterations.
     figname : Optional[Union[str, bytes, os.PathLike]]
         Optional path to save the image to. Will not be saved if None.
+    num_threads : int
+        Number of threads to use, all the available ones if 0.
+    show : Optional[bool]
+        Whether to show the image, only when a display is available if None.
+    method : str
+        "escape" to compute every pixel, "mariani" to skip the regions of uniform
+        count with the Mariani-Silver algorithm.
+    cache : Optional[Union[TileCache, str, os.PathLike]]
+        Tile cache, or its directory, reusing the counts of previous renders. The
+        viewport is then aligned on a multiple of `pixel_size`.
+    resume : Optional[Union[str, os.PathLike]]
+        State file continuing the render of the same viewport with fewer iterations
+        saved there, which is updated. Takes precedence over `cache`.
+    profile : bool
+        Profile the render.
+    supersample : int
+        Anti-alias the image with `supersample` x `supersample` samples per pixel,
+        averaged by the kernel. Not supported with `cache` or `resume`.
+    adaptive : bool
+        Only supersample the pixels whose count differs from one of their neighbours.
+    schedule : str
+        OpenMP schedule of the tiles, one of "static", "dynamic" or "guided".
+    chunksize : int
+        Number of tiles handed to a thread at once.
+
+    Returns
+    -------
+    Optional[RenderProfile]
+        Time and memory of the stages of the render and work counters of the kernels
+        if `profile`, None otherwise.
 
     Example
     -------
@@ -114,26 +295,48 @@ def plot_julia(
                    max_iter=100, figname=figname)
     None
     """
-    img = _generate_julia_img(c, zmin, zmax, pixel_size, max_iter)
-    _handle_img(img, figname)
+    profile = RenderProfile() if profile else None
+    img = _generate_julia_img(
+        c,
+        zmin,
+        zmax,
+        pixel_size,
+        max_iter,
+        num_threads,
+        method,
+        cache,
+        resume,
+        profile,
+        supersample,
+        adaptive,
+        schedule,
+        chunksize,
+    )
+    _handle_img(img, figname, show, profile)
+    return profile
 
 
-def is_in_julia(z: complex, c: complex, max_iter: int = 10) -> bool:
+def is_in_julia(
+    z: Union[complex, np.ndarray], c: complex, max_iter: int = 10, num_threads: int = 0
+) -> Union[bool, np.ndarray]:
     """Checks if a point is in a given Julia set for a maximum number of iterations.
 
     Parameters
     ----------
-    z : complex
-        Point to check for.
+    z : Union[complex, np.ndarray]
+        Point to check for, or array of points of any shape.
     c : complex
         Constant value of the Julia set.
     max_iter : int
         Maximum number of iterations.
+    num_threads : int
+        Number of threads checking an array of points, all the available ones if 0.
 
     Returns
     -------
-    bool
-        `True` if the point is in the set, `False` otherwise.
+    Union[bool, np.ndarray]
+        `True` if the point is in the set, `False` otherwise. A boolean array of the
+        shape of `z` if it is an array.
 
     Example
     -------
@@ -141,7 +344,14 @@ def is_in_julia(z: complex, c: complex, max_iter: int = 10) -> bool:
     True
     >>> is_in_julia(z=0.25 + 0.25j, c=0.25, max_iter=100)
     True
+    >>> is_in_julia(z=np.array([0.25 + 0.25j, 1 + 1j]), c=0.25)
+    array([ True, False])
     """
+    if np.ndim(z) > 0:
+        points = _flat_points(z)
+        inside = np.empty(points.shape, dtype=np.bool_)
+        bounded_points(points, c, max_iter, inside.view(np.uint8), True, num_threads)
+        return inside.reshape(np.shape(z))
     for i in range(max_iter):
         z = z**2 + c
         if abs(z) > 2.0:
@@ -149,13 +359,109 @@ def is_in_julia(z: complex, c: complex, max_iter: int = 10) -> bool:
     return True
 
 
+def julia_escape_counts(
+    z: np.ndarray,
+    c: complex,
+    max_iter: int = 10,
+    dtype: Optional[np.dtype] = None,
+    num_threads: int = 0,
+) -> np.ndarray:
+    """Compute the escape counts of arbitrary points, as `plot_julia` colours them.
+
+    Parameters
+    ----------
+    z : np.ndarray
+        Array of points of any shape.
+    c : complex
+        Constant value of the Julia set.
+    max_iter : int
+        Maximum number of iterations.
+    dtype : Optional[np.dtype]
+        Type of the counts: `np.uint8`, `np.uint16` or `np.int32` for iteration
+        counts, `np.float32` for smooth counts. Defaults to the smallest integer type
+        holding `max_iter`.
+    num_threads : int
+        Number of threads to use, all the available ones if 0.
+
+    Returns
+    -------
+    np.ndarray
+        Escape counts, of the shape of `z`.
+    """
+    points = _flat_points(z)
+    counts = empty_counts(points.shape, max_iter, dtype)
+    count_points(points, c, max_iter, counts, True, num_threads)
+    return counts.reshape(np.shape(z))
+
+
 def _plot_julia_cli():
     """Plot the Julia set corresponding to the given `c` constant and save it.
     This function is meant to be called from the CLI.
     """
     args = _parse_args(sys.argv[1:], "Julia")
     _setup_logging(args.loglevel)
+    profile = RenderProfile() if args.profile is not None else None
+    if args.strips or args.memmap:
+        if args.cache or args.resume or args.previews or args.show:
+            raise ValueError(
+                "--strips and --memmap write the image by strips, without a cache, a "
+                "resume file, previews or showing it"
+            )
+        with stage(profile, "stream"):
+            stream_render(
+                args.output,
+                args.memmap,
+                True,
+                args.c,
+                args.zmin,
+                args.zmax,
+                args.pixel_size,
+                args.max_iter,
+                args.strips or STRIP_HEIGHT,
+                args.threads,
+                args.method,
+                supersample=args.supersample,
+                adaptive=args.adaptive,
+            )
+        _report_profile(profile, args.profile)
+        return
+    if args.previews:
+        if args.cache or args.resume or args.adaptive or args.method != "escape":
+            raise ValueError(
+                "previews are only rendered with the escape method, without a cache, "
+                "a resume file or adaptive supersampling"
+            )
+        with stage(profile, "progressive"):
+            img = _save_previews(
+                progressive_julia(
+                    args.c,
+                    args.zmin,
+                    args.zmax,
+                    args.pixel_size,
+                    args.max_iter,
+                    image=True,
+                    num_threads=args.threads,
+                    supersample=args.supersample,
+                ),
+                args.previews,
+            )
+        _handle_img(img, args.output, args.show, profile)
+        _report_profile(profile, args.profile)
+        return
+    cache = TileCache(args.cache, args.cache_size << 20) if args.cache else None
     img = _generate_julia_img(
-        args.c, args.zmin, args.zmax, args.pixel_size, args.max_iter
+        args.c,
+        args.zmin,
+        args.zmax,
+        args.pixel_size,
+        args.max_iter,
+        args.threads,
+        args.method,
+        cache,
+        args.resume,
+        profile,
+        args.supersample,
+        args.adaptive,
     )
-    _handle_img(img, args.output)
+    _handle_img(img, args.output, args.show, profile)
+    _report_profile(profile, args.profile)
@@ -0,0 +1,269 @@
+cdef extern from *:
+    """
+    /* Escape loops iterating several orbits at once with vector instructions.
+     *
+     * Each lane of the vectors follows the orbit of a pixel, with the arithmetic of
+     * the scalar kernels so that the double precision counts are the same. A mask
+     * freezes the orbits which escaped or settled. The pixels are first iterated
+     * JB_LANES_UNROLL times by consecutive groups, which settles most of the pixels
+     * escaping quickly at the cost of plain vector loads. The remaining orbits are
+     * then loaded in the lanes one by one, each finished orbit making room for the
+     * next one every JB_LANES_UNROLL iterations, so that a lane does not wait for the
+     * slowest orbit of its vector. Each instruction set gets its own copy of the
+     * loops, picked at runtime.
+     */
+
+    /* Largest number of pixels of a call to `jb_escape_lanes`. */
+    #define JB_LANES 64
+
+    /* Number of iterations between two refills of the lanes. */
+    #define JB_LANES_UNROLL 4
+
+    #if defined(__GNUC__) || defined(__clang__)
+    #define JB_HAVE_LANES 1
+
+    /* Iterate the active lanes JB_LANES_UNROLL times, stopping early when none is
+     * left if `check`. */
+    #define JB_LANES_ITERATE(NAME, WIDTH, check)                                       \\
+        for (k = 0; k < JB_LANES_UNROLL; k++) {                                        \\
+            zr2 = zr * zr;                                                             \\
+            zi2 = zi * zi;                                                             \\
+            active &= (NAME##_int) (zr2 + zi2 <= limit) & (count < max_iter);          \\
+            nzr = zr2 - zi2 + cr;                                                      \\
+            nzi = 2 * zr * zi + ci;                                                    \\
+            zr = (NAME##_real) (((NAME##_int) nzr & active) | ((NAME##_int) zr & ~active)); \\
+            zi = (NAME##_real) (((NAME##_int) nzi & active) | ((NAME##_int) zi & ~active)); \\
+            count -= active;                                                           \\
+            if (periodicity_check) {                                                   \\
+                /* Brent's cycle detection of `mandelbrot_escape_periodic`. */         \\
+                repeat = active & (NAME##_int) (zr == sr) & (NAME##_int) (zi == si);   \\
+                periodic |= repeat;                                                    \\
+                active &= ~repeat;                                                     \\
+                step -= active;                                                        \\
+                save = active & (step == window);                                      \\
+                step &= ~save;                                                         \\
+                window += window & save & (window < (1 << 20));                        \\
+                sr = (NAME##_real) (((NAME##_int) zr & save) | ((NAME##_int) sr & ~save)); \\
+                si = (NAME##_real) (((NAME##_int) zi & save) | ((NAME##_int) si & ~save)); \\
+            }                                                                          \\
+            if (check) {                                                               \\
+                for (l = 0; l < WIDTH && !active[l]; l++)                              \\
+                    ;                                                                  \\
+                if (l == WIDTH)                                                        \\
+                    break;                                                             \\
+            }                                                                          \\
+        }
+
+    /* Copy the state of the orbits from the vectors to the arrays, at `g`. */
+    #define JB_LANES_STORE(g)                                                          \\
+        __builtin_memcpy(bzr + (g), &zr, sizeof(zr));                                  \\
+        __builtin_memcpy(bzi + (g), &zi, sizeof(zi));                                  \\
+        __builtin_memcpy(bcr + (g), &cr, sizeof(cr));                                  \\
+        __builtin_memcpy(bci + (g), &ci, sizeof(ci));                                  \\
+        __builtin_memcpy(bsr + (g), &sr, sizeof(sr));                                  \\
+        __builtin_memcpy(bsi + (g), &si, sizeof(si));                                  \\
+        __builtin_memcpy(bactive + (g), &active, sizeof(active));                      \\
+        __builtin_memcpy(bperiodic + (g), &periodic, sizeof(periodic));                \\
+        __builtin_memcpy(bcount + (g), &count, sizeof(count));                         \\
+        __builtin_memcpy(bstep + (g), &step, sizeof(step));                            \\
+        __builtin_memcpy(bwindow + (g), &window, sizeof(window));
+
+    /* The state of the orbits of the pixels is kept in arrays, prefixed with b. */
+    #define JB_DEFINE_LANES(NAME, ATTRIBUTES, REAL, INT, WIDTH)                        \\
+    typedef REAL NAME##_real __attribute__((vector_size(WIDTH * sizeof(REAL))));       \\
+    typedef INT NAME##_int __attribute__((vector_size(WIDTH * sizeof(REAL))));         \\
+    ATTRIBUTES static void NAME(int n, const double *zr0, const double *zi0,           \\
+                                const double *cr0, const double *ci0, const int *todo, \\
+                                int max_iter, double bailout, int periodicity_check,   \\
+                                int *ite, int *executed, double *mag2)                 \\
+    {                                                                                  \\
+        const REAL limit = (REAL) bailout;                                             \\
+        const NAME##_real rzero = {0};                                                 \\
+        const NAME##_int izero = {0}, ione = izero + 1;                                \\
+        REAL bzr[JB_LANES], bzi[JB_LANES], bcr[JB_LANES], bci[JB_LANES];               \\
+        REAL bsr[JB_LANES], bsi[JB_LANES];                                             \\
+        INT bactive[JB_LANES], bperiodic[JB_LANES], bcount[JB_LANES];                  \\
+        INT bstep[JB_LANES], bwindow[JB_LANES];                                        \\
+        NAME##_real zr, zi, cr, ci, sr, si, zr2, zi2, nzr, nzi;                        \\
+        NAME##_int active, periodic, count, step, window, repeat, save;                \\
+        int pixel[WIDTH];                                                              \\
+        int g, l, k, p, next, busy, end = (n + WIDTH - 1) / WIDTH * WIDTH;             \\
+                                                                                       \\
+        for (p = 0; p < end; p++) {                                                    \\
+            bzr[p] = p < n ? (REAL) zr0[p] : 0;                                        \\
+            bzi[p] = p < n ? (REAL) zi0[p] : 0;                                        \\
+            bcr[p] = p < n ? (REAL) cr0[p] : 0;                                        \\
+            bci[p] = p < n ? (REAL) ci0[p] : 0;                                        \\
+            bactive[p] = p < n && todo[p] ? -1 : 0;                                    \\
+        }                                                                              \\
+        /* First pass over consecutive pixels. */                                      \\
+        for (g = 0; g < end; g += WIDTH) {                                             \\
+            for (l = 0; l < WIDTH && !bactive[g + l]; l++)                             \\
+                ;                                                                      \\
+            if (l == WIDTH)                                                            \\
+                continue;                                                              \\
+            __builtin_memcpy(&zr, bzr + g, sizeof(zr));                                \\
+            __builtin_memcpy(&zi, bzi + g, sizeof(zi));                                \\
+            __builtin_memcpy(&cr, bcr + g, sizeof(cr));                                \\
+            __builtin_memcpy(&ci, bci + g, sizeof(ci));                                \\
+            __builtin_memcpy(&active, bactive + g, sizeof(active));                    \\
+            sr = zr;                                                                   \\
+            si = zi;                                                                   \\
+            periodic = count = step = izero;                                           \\
+            window = ione;                                                             \\
+            JB_LANES_ITERATE(NAME, WIDTH, 1)                                           \\
+            JB_LANES_STORE(g)                                                          \\
+        }                                                                              \\
+        /* Second pass over the remaining orbits, refilling the lanes. */              \\
+        next = 0;                                                                      \\
+        while (next < n && !bactive[next])                                             \\
+            next++;                                                                    \\
+        zr = zi = cr = ci = sr = si = rzero;                                           \\
+        active = periodic = count = step = izero;                                      \\
+        window = ione;                                                                 \\
+        for (l = 0; l < WIDTH; l++)                                                    \\
+            pixel[l] = -1;                                                             \\
+        busy = next < n;                                                               \\
+        while (busy) {                                                                 \\
+            busy = 0;                                                                  \\
+            for (l = 0; l < WIDTH; l++) {                                              \\
+                if (active[l]) {                                                       \\
+                    busy = 1;                                                          \\
+                    continue;                                                          \\
+                }                                                                      \\
+                p = pixel[l];                                                          \\
+                if (p >= 0) {                                                          \\
+                    bzr[p] = zr[l];                                                    \\
+                    bzi[p] = zi[l];                                                    \\
+                    bcount[p] = count[l];                                              \\
+                    bperiodic[p] = periodic[l];                                        \\
+                    pixel[l] = -1;                                                     \\
+                }                                                                      \\
+                while (next < n && !bactive[next])                                     \\
+                    next++;                                                            \\
+                if (next == n)                                                         \\
+                    continue;                                                          \\
+                pixel[l] = next;                                                       \\
+                zr[l] = bzr[next];                                                     \\
+                zi[l] = bzi[next];                                                     \\
+                cr[l] = bcr[next];                                                     \\
+                ci[l] = bci[next];                                                     \\
+                sr[l] = bsr[next];                                                     \\
+                si[l] = bsi[next];                                                     \\
+                count[l] = bcount[next];                                               \\
+                step[l] = bstep[next];                                                 \\
+                window[l] = bwindow[next];                                             \\
+                periodic[l] = 0;                                                       \\
+                active[l] = -1;                                                        \\
+                next++;                                                                \\
+                busy = 1;                                                              \\
+            }                                                                          \\
+            if (!busy)                                                                 \\
+                break;                                                                 \\
+            JB_LANES_ITERATE(NAME, WIDTH, 0)                                           \\
+        }                                                                              \\
+        for (p = 0; p < n; p++) {                                                      \\
+            if (!todo[p])                                                              \\
+                continue;                                                              \\
+            executed[p] = (int) bcount[p];                                             \\
+            ite[p] = bperiodic[p] ? max_iter : (int) bcount[p];                        \\
+            mag2[p] = (double) bzr[p] * bzr[p] + (double) bzi[p] * bzi[p];             \\
+        }                                                                              \\
+    }
+
+    /* Baseline: 128-bit vectors, SSE2 on x86-64 and NEON on AArch64. */
+    JB_DEFINE_LANES(jb_lanes_d2, , double, long long, 2)
+    JB_DEFINE_LANES(jb_lanes_f4, , float, int, 4)
+
+    #if defined(__x86_64__) || defined(__i386__)
+    #define JB_X86 1
+    JB_DEFINE_LANES(jb_lanes_d4, __attribute__((target("avx2"))), double, long long, 4)
+    JB_DEFINE_LANES(jb_lanes_f8, __attribute__((target("avx2"))), float, int, 8)
+    JB_DEFINE_LANES(jb_lanes_d8, __attribute__((target("avx512f"))), double, long long, 8)
+    JB_DEFINE_LANES(jb_lanes_f16, __attribute__((target("avx512f"))), float, int, 16)
+    #endif
+    #endif
+
+    /* Instruction set of the lanes: -1 for none, 0 for the baseline, 1 for AVX2 and
+     * 2 for AVX-512. */
+    static int jb_simd = -1;
+
+    static void jb_simd_set(int level)
+    {
+        jb_simd = level;
+    }
+
+    static int jb_simd_detect(void)
+    {
+    #if defined(JB_X86)
+        __builtin_cpu_init();
+        if (__builtin_cpu_supports("avx512f"))
+            return 2;
+        if (__builtin_cpu_supports("avx2"))
+            return 1;
+        return 0;
+    #elif defined(JB_HAVE_LANES)
+        return 0;
+    #else
+        return -1;
+    #endif
+    }
+
+    /* Whether the lanes beat the scalar kernels, which two lanes of doubles do not. */
+    static int jb_lanes_enabled(int single)
+    {
+        return jb_simd >= (single ? 0 : 1);
+    }
+
+    /* Compute the orbits of `n` pixels, at most JB_LANES, in single precision if
+     * `single`.
+     *
+     * The orbit of the pixel `i` starts at `zr0[i] + i zi0[i]` under z**2 + c, with
+     * `c = cr0[i] + i ci0[i]`. Only the pixels with a nonzero `todo` are computed:
+     * they receive their count in `ite`, the number of iterations actually computed in
+     * `executed` and the squared modulus of the last value of their orbit in `mag2`.
+     */
+    static void jb_escape_lanes(int single, int n, const double *zr0, const double *zi0,
+                                const double *cr0, const double *ci0, const int *todo,
+                                int max_iter, double bailout, int periodicity_check,
+                                int *ite, int *executed, double *mag2)
+    {
+    #if defined(JB_HAVE_LANES)
+    #if defined(JB_X86)
+        if (jb_simd == 2) {
+            if (single)
+                jb_lanes_f16(n, zr0, zi0, cr0, ci0, todo, max_iter, bailout,
+                             periodicity_check, ite, executed, mag2);
+            else
+                jb_lanes_d8(n, zr0, zi0, cr0, ci0, todo, max_iter, bailout,
+                            periodicity_check, ite, executed, mag2);
+            return;
+        }
+        if (jb_simd == 1) {
+            if (single)
+                jb_lanes_f8(n, zr0, zi0, cr0, ci0, todo, max_iter, bailout,
+                            periodicity_check, ite, executed, mag2);
+            else
+                jb_lanes_d4(n, zr0, zi0, cr0, ci0, todo, max_iter, bailout,
+                            periodicity_check, ite, executed, mag2);
+            return;
+        }
+    #endif
+        if (single)
+            jb_lanes_f4(n, zr0, zi0, cr0, ci0, todo, max_iter, bailout,
+                        periodicity_check, ite, executed, mag2);
+        else
+            jb_lanes_d2(n, zr0, zi0, cr0, ci0, todo, max_iter, bailout,
+                        periodicity_check, ite, executed, mag2);
+    #endif
+    }
+    """
+    enum: JB_LANES
+    int jb_simd
+    int jb_simd_detect()
+    void jb_simd_set(int level)
+    bint jb_lanes_enabled(bint single) noexcept nogil
+    void jb_escape_lanes(bint single, int n, const double *zr0, const double *zi0,
+                         const double *cr0, const double *ci0, const int *todo,
+                         int max_iter, double bailout, bint periodicity_check, int *ite,
+                         int *executed, double *mag2) noexcept nogil
@@ -0,0 +1,20 @@
+cdef extern from *:
+    """
+    #ifdef _OPENMP
+    #include <omp.h>
+    #define JB_OPENMP 1
+    #define jb_max_threads() omp_get_max_threads()
+    #else
+    #define JB_OPENMP 0
+    #define jb_max_threads() 1
+    #endif
+    """
+    enum: JB_OPENMP
+    int jb_max_threads() noexcept nogil
+
+
+cdef inline int resolve_threads(int num_threads) noexcept nogil:
+    """Number of threads to use, `num_threads <= 0` meaning all available."""
+    if num_threads <= 0:
+        return jb_max_threads()
+    return num_threads
@@ -0,0 +1,39 @@
+SCHEDULES = ("static", "dynamic", "guided")
+
+
+def openmp_enabled():
+    """Whether the compiled kernels were built with OpenMP support.
+
+    Returns
+    -------
+    bool
+        `True` if the kernels run in parallel, `False` if they are single-threaded.
+    """
+    return bool(JB_OPENMP)
+
+
+def max_threads():
+    """Number of threads the kernels use when `num_threads` is not set.
+
+    Returns
+    -------
+    int
+        Maximum number of OpenMP threads, 1 if OpenMP is not available.
+    """
+    return jb_max_threads()
+
+
+def check_schedule(str schedule, int chunksize):
+    """Validate the OpenMP scheduling options of the kernels.
+
+    Parameters
+    ----------
+    schedule : str
+        One of "static", "dynamic" or "guided".
+    chunksize : int
+        Number of rows handed to a thread at once.
+    """
+    if schedule not in SCHEDULES:
+        raise ValueError(f"schedule must be one of {SCHEDULES}, got {schedule!r}")
+    if chunksize < 1:
+        raise ValueError(f"chunksize must be strictly positive, got {chunksize}")
@@ -0,0 +1,135 @@
+"""Perturbation kernel of the deep zooms into the Mandelbrot set.
+
+The orbits of the pixels are followed as double precision offsets from a reference
+orbit computed once in arbitrary precision, which keeps the kernel at double speed
+whatever the depth of the zoom.
+"""
+import cython
+from cython.parallel import prange
+
+from julia_brot.parallel import check_schedule
+
+from julia_brot.escape cimport RENDER_BAILOUT, count_t, smooth_count
+from julia_brot.parallel cimport resolve_threads
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline void _perturb_row(count_t[:, ::1] out, Py_ssize_t row, const double[::1] ref_r,
+                              const double[::1] ref_i, const double[::1] dx, double dy,
+                              int max_iter, int skip, double ar, double ai, double br,
+                              double bi, double cr, double ci) noexcept nogil:
+    cdef:
+        Py_ssize_t col, last = ref_r.shape[0] - 1
+        int ite, m
+        double dr, di, er, ei, zr, zi, mag2, dr2, di2, sr, si
+
+    for col in range(dx.shape[0]):
+        er = dx[col]
+        ei = dy
+        # Offset after `skip` iterations, from its series in the offset of c.
+        dr2 = er*er - ei*ei
+        di2 = 2*er*ei
+        dr = ar*er - ai*ei + br*dr2 - bi*di2 + cr*(dr2*er - di2*ei) - ci*(dr2*ei + di2*er)
+        di = ar*ei + ai*er + br*di2 + bi*dr2 + cr*(dr2*ei + di2*er) + ci*(dr2*er - di2*ei)
+        ite = skip
+        m = skip
+        zr = ref_r[m] + dr
+        zi = ref_i[m] + di
+        mag2 = zr*zr + zi*zi
+        while mag2 <= RENDER_BAILOUT and ite < max_iter:
+            if m == last or mag2 < dr*dr + di*di:
+                # Rebase on the start of the reference orbit, when it ends or when
+                # the orbit gets closer to 0 than to the reference.
+                dr = zr
+                di = zi
+                m = 0
+            sr = ref_r[m]
+            si = ref_i[m]
+            dr, di = (2*(sr*dr - si*di) + dr*dr - di*di + er,
+                      2*(sr*di + si*dr) + 2*dr*di + ei)
+            m = m + 1
+            ite = ite + 1
+            zr = ref_r[m] + dr
+            zi = ref_i[m] + di
+            mag2 = zr*zr + zi*zi
+        if count_t is float:
+            out[row, col] = smooth_count(ite, mag2, max_iter)
+        else:
+            out[row, col] = <count_t> ite
+
+
+def perturb(const double[::1] ref_r, const double[::1] ref_i, const double[::1] dx,
+            const double[::1] dy, int max_iter, count_t[:, ::1] out, int skip=0,
+            double complex a=0, double complex b=0, double complex c=0,
+            int num_threads=0, str schedule="dynamic", int chunksize=1):
+    """Compute the escape counts of a grid from a reference orbit.
+
+    The orbit of the pixel of offset `dc` from the reference point is the reference
+    orbit plus an offset following `d -> 2*Z*d + d**2 + dc`, `Z` being the reference
+    orbit. When the reference orbit ends, or when the orbit gets closer to 0 than to
+    the reference, the offset is rebased on the start of the reference orbit, which
+    keeps it accurate.
+
+    Parameters
+    ----------
+    ref_r : np.ndarray
+        Real parts of the reference orbit, starting at 0.
+    ref_i : np.ndarray
+        Imaginary parts of the reference orbit.
+    dx : np.ndarray
+        Real parts of the offsets of the pixels, one per column.
+    dy : np.ndarray
+        Imaginary parts of the offsets of the pixels, one per row.
+    max_iter : int
+        Maximum number of iterations.
+    out : np.ndarray
+        Row-major buffer of shape `(dy.size, dx.size)` receiving the counts, with
+        the same types as in `render`.
+    skip : int
+        Number of iterations given by the series `a*dc + b*dc**2 + c*dc**3` of the
+        offset, which must be shorter than the reference orbit.
+    a : complex
+        First order coefficient of the series.
+    b : complex
+        Second order coefficient of the series.
+    c : complex
+        Third order coefficient of the series.
+    num_threads : int
+        Number of threads to use, all the available ones if 0.
+    schedule : str
+        OpenMP schedule of the rows, one of "static", "dynamic" or "guided".
+    chunksize : int
+        Number of rows handed to a thread at once.
+
+    Returns
+    -------
+    np.ndarray
+        The `out` buffer.
+    """
+    check_schedule(schedule, chunksize)
+    if ref_r.shape[0] == 0 or ref_i.shape[0] != ref_r.shape[0]:
+        raise ValueError("the reference orbit must be non-empty, with as many real and "
+                         "imaginary parts")
+    if not 0 <= skip < ref_r.shape[0]:
+        raise ValueError(f"skip must be in [0, {ref_r.shape[0]}), got {skip}")
+    if out.shape[0] != dy.shape[0] or out.shape[1] != dx.shape[0]:
+        raise ValueError(
+            f"out must have shape {(dy.shape[0], dx.shape[0])}, got {(out.shape[0], out.shape[1])}"
+        )
+    cdef:
+        Py_ssize_t row
+        int n = resolve_threads(num_threads)
+        double ar = a.real, ai = a.imag, br = b.real, bi = b.imag, cr = c.real, ci = c.imag
+
+    if schedule == "static":
+        for row in prange(dy.shape[0], nogil=True, schedule='static', chunksize=chunksize, num_threads=n):
+            _perturb_row(out, row, ref_r, ref_i, dx, dy[row], max_iter, skip, ar, ai, br, bi, cr, ci)
+    elif schedule == "guided":
+        for row in prange(dy.shape[0], nogil=True, schedule='guided', chunksize=chunksize, num_threads=n):
+            _perturb_row(out, row, ref_r, ref_i, dx, dy[row], max_iter, skip, ar, ai, br, bi, cr, ci)
+    else:
+        for row in prange(dy.shape[0], nogil=True, schedule='dynamic', chunksize=chunksize, num_threads=n):
+            _perturb_row(out, row, ref_r, ref_i, dx, dy[row], max_iter, skip, ar, ai, br, bi, cr, ci)
+
+    return out.base
@@ -0,0 +1,183 @@
+"""Per-stage profiling of the rendering pipeline.
+
+A `RenderProfile` is handed down the pipeline, which records the wall time and the
+memory allocated by each of its stages, and the work counters of the kernels. Without
+a profile, the stages only cost an empty context manager.
+"""
+
+import contextlib
+import json
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+
+# Names of the work counters of the kernels, as in `julia_brot.engine.STATS`.
+COUNTERS = ("pixels", "iterations", "escaped", "shortcut")
+
+
+@dataclass
+class StageStats:
+    """Time and memory of a stage of the pipeline, summed over its runs."""
+
+    name: str
+    seconds: float = 0.0
+    # Largest memory allocated during a run of the stage, above the memory allocated
+    # at its start.
+    allocated_bytes: int = 0
+    calls: int = 0
+
+
+@dataclass
+class RenderProfile:
+    """Time, memory and work of the stages of a render.
+
+    The stages are, in the order they run: "grid" (coordinates and counts buffer),
+    "kernel" (escape counts), "mirror" (copy of the symmetric parts), "range" (bounds
+    of the counts), "lut" (colour table), "colour" (RGB pixels), "image" (Pillow image)
+    and "encode" (PNG file). The counters are the pixels computed by the kernels
+    (every sample of the supersampled pixels), the iterations they executed, the
+    pixels escaping before `max_iter` and the bounded pixels settled before
+    `max_iter` by the interior or periodicity checks.
+    """
+
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+    counters: np.ndarray = field(
+        default_factory=lambda: np.zeros(len(COUNTERS), dtype=np.int64)
+    )
+    # Measure the memory of the stages with `tracemalloc`, which slows the Python
+    # code of the stages down.
+    trace_memory: bool = True
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[StageStats]:
+        """Record the time and memory of a stage.
+
+        Stages must not be nested.
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage, whose runs are summed.
+        """
+        stats = self.stages.setdefault(name, StageStats(name))
+        started = self.trace_memory and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.seconds += time.perf_counter() - start
+            stats.calls += 1
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                stats.allocated_bytes = max(stats.allocated_bytes, peak - before)
+            if started:
+                tracemalloc.stop()
+
+    @property
+    def seconds(self) -> float:
+        """Total time of the stages."""
+        return sum(stats.seconds for stats in self.stages.values())
+
+    def counter(self, name: str) -> int:
+        """Value of a work counter of the kernels.
+
+        Parameters
+        ----------
+        name : str
+            One of `COUNTERS`.
+
+        Returns
+        -------
+        int
+            Value of the counter.
+        """
+        return int(self.counters[COUNTERS.index(name)])
+
+    def as_dict(self) -> dict:
+        """JSON-serializable content of the profile."""
+        return {
+            "seconds": self.seconds,
+            "stages": [
+                {
+                    "name": stats.name,
+                    "seconds": stats.seconds,
+                    "allocated_bytes": stats.allocated_bytes,
+                    "calls": stats.calls,
+                }
+                for stats in self.stages.values()
+            ],
+            "counters": {name: self.counter(name) for name in COUNTERS},
+        }
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        """Profile as a JSON document.
+
+        Parameters
+        ----------
+        indent : Optional[int]
+            Indentation of the document, on a single line if None.
+
+        Returns
+        -------
+        str
+            JSON document.
+        """
+        return json.dumps(self.as_dict(), indent=indent)
+
+    def report(self) -> str:
+        """Human-readable breakdown of the profile.
+
+        Returns
+        -------
+        str
+            One line per stage, then the work counters.
+        """
+        total = self.seconds or 1
+        lines = [f"{'stage':<10}{'time (ms)':>12}{'share':>8}{'allocated':>12}"]
+        for stats in self.stages.values():
+            allocated = _format_bytes(stats.allocated_bytes)
+            lines.append(
+                f"{stats.name:<10}{stats.seconds * 1e3:>12.2f}"
+                f"{stats.seconds / total:>8.1%}{allocated:>12}"
+            )
+        lines.append(f"{'total':<10}{self.seconds * 1e3:>12.2f}")
+        pixels = self.counter("pixels")
+        if pixels:
+            iterations = self.counter("iterations")
+            lines.append(
+                f"{pixels} pixels computed, {iterations} iterations "
+                f"({iterations / pixels:.1f} per pixel), {self.counter('escaped')} "
+                f"escaped, {self.counter('shortcut')} settled by the interior checks"
+            )
+        return "\n".join(lines)
+
+
+def _format_bytes(size: int) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def stage(profile: Optional[RenderProfile], name: str):
+    """Context manager recording a stage in `profile`, doing nothing if None.
+
+    Parameters
+    ----------
+    profile : Optional[RenderProfile]
+        Profile of the render.
+    name : str
+        Name of the stage.
+    """
+    if profile is None:
+        return contextlib.nullcontext()
+    return profile.stage(name)
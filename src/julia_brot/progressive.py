@@ -0,0 +1,281 @@
+"""Progressive rendering, from a coarse preview to the full resolution.
+
+The passes compute the pixels on sub-grids of decreasing steps, interlaced like the
+passes of Adam7: the pass of step `s` following the pass of step `S` only computes the
+pixels of the sub-grid of step `s` which are not on the sub-grid of step `S`. Every
+pass yields a preview at the full resolution, each of its pixels taking the count of
+the nearest computed pixel above and to its left. The parts of the viewport mirroring
+others are mirrored after each pass instead of computed, as in `render_view`.
+"""
+
+import logging
+import os
+from typing import TYPE_CHECKING, Callable, Iterator, List, Sequence, Tuple, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from PIL.Image import Image
+
+from .common import _colorize
+
+if os.getenv("DOCS_BUILD", 0) == 0:
+    from julia_brot.engine import empty_counts, make_grid, mirror_index, render
+
+PROGRESSIVE_STEPS = (4, 2, 1)
+
+
+def _check_steps(steps: Sequence[int]):
+    if not steps or steps[-1] != 1:
+        raise ValueError(f"the last step must be 1, got {tuple(steps)}")
+    for coarse, fine in zip(steps, steps[1:]):
+        if fine >= coarse or coarse % fine:
+            raise ValueError(
+                f"each step must be a multiple of the next one, got {tuple(steps)}"
+            )
+
+
+def _fill(counts: np.ndarray, step: int) -> np.ndarray:
+    """Preview of the counts computed on the sub-grid of step `step`."""
+    if step == 1:
+        return counts
+    height, width = counts.shape
+    coarse = counts[::step, ::step]
+    return np.repeat(np.repeat(coarse, step, axis=0), step, axis=1)[:height, :width]
+
+
+def _symmetric_blocks(
+    zmin: complex, pixel_size: float, x: np.ndarray, y: np.ndarray, julia: bool
+) -> Tuple[List[Tuple[slice, slice]], Callable[[np.ndarray], None]]:
+    """Split a grid like `render_view` does into the blocks to compute and the
+    function mirroring them into the rest of the counts."""
+    height, width = y.size, x.size
+    ky = mirror_index(zmin.imag, pixel_size, height)
+    kx = mirror_index(zmin.real, pixel_size, width) if julia else 0
+    everything = slice(0, None)
+    if ky < 0 or kx < 0:
+        return [(everything, everything)], lambda counts: None
+    lo, mid = max(0, ky - height + 1), (ky + 1) // 2
+    blocks = [(slice(0, lo), everything), (slice(mid, None), everything)]
+    left, right = 0, width
+    if julia:
+        left, right = max(0, kx - width + 1), min(width, kx + 1)
+        blocks += [
+            (slice(lo, mid), slice(0, left)),
+            (slice(lo, mid), slice(right, None)),
+        ]
+
+    def mirror(counts: np.ndarray):
+        source = counts[ky - mid + 1 : ky - lo + 1][::-1]
+        if julia:
+            source = source[:, kx - right + 1 : kx - left + 1][:, ::-1]
+        counts[lo:mid, left:right] = source
+
+    return blocks, mirror
+
+
+def progressive_render(
+    zmin: complex,
+    zmax: complex,
+    pixel_size: float,
+    max_iter: int,
+    julia: bool = False,
+    c: complex = 0j,
+    steps: Sequence[int] = PROGRESSIVE_STEPS,
+    num_threads: int = 0,
+    dtype=None,
+    precision: str = "auto",
+    supersample: int = 1,
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """Compute the counts of a viewport pass by pass, yielding a preview after each.
+
+    The grid and the mirrored parts of the viewport are those of `_fast_mandelbrot`,
+    so that the last counts are those of a direct render, for the same work.
+
+    Parameters
+    ----------
+    zmin : complex
+        Lower bound limit.
+    zmax : complex
+        Upper bound limit.
+    pixel_size : float
+        Pixel size of the resulting plot.
+    max_iter : int
+        Maximum number of iterations.
+    julia : bool
+        Compute the Julia set of `c` instead of the Mandelbrot set.
+    c : complex
+        Julia constant, ignored for the Mandelbrot set.
+    steps : Sequence[int]
+        Steps of the sub-grids of the passes, each a multiple of the next one, the
+        last one being 1.
+    num_threads : int
+        Number of threads to use, all the available ones if 0.
+    dtype : Optional[np.dtype]
+        Type of the counts, as in `_fast_mandelbrot`.
+    precision : str
+        Precision of the coordinates, as in `_fast_mandelbrot`.
+    supersample : int
+        Average the counts of `supersample` x `supersample` samples per pixel.
+
+    Yields
+    ------
+    Tuple[int, np.ndarray]
+        Step of the pass and counts of shape `(height, width)`. The previews are new
+        arrays, the last counts are the buffer filled by the passes.
+    """
+    _check_steps(steps)
+    x, y, x_lo, y_lo = make_grid(
+        zmin, zmax, pixel_size, precision, snap_x=julia, snap_y=True
+    )
+    counts = empty_counts((y.size, x.size), max_iter, dtype)
+    blocks, mirror = [(slice(0, None), slice(0, None))], lambda counts: None
+    if x_lo is None:
+        blocks, mirror = _symmetric_blocks(zmin, pixel_size, x, y, julia)
+    options = dict(
+        julia=julia,
+        num_threads=num_threads,
+        interior_check=True,
+        periodicity_check=True,
+        single=precision == "single",
+        pixel_size=pixel_size,
+        supersample=supersample,
+    )
+
+    def compute(block: Tuple[slice, slice], rows: slice, cols: slice):
+        """Render the pixels `rows`, `cols` of a block."""
+        block_rows, block_cols = block
+        xs = np.ascontiguousarray(x[block_cols][cols])
+        ys = np.ascontiguousarray(y[block_rows][rows])
+        if not (xs.size and ys.size):
+            return
+        lo = {}
+        if x_lo is not None:
+            lo = dict(
+                x_lo=np.ascontiguousarray(x_lo[block_cols][cols]),
+                y_lo=np.ascontiguousarray(y_lo[block_rows][rows]),
+            )
+        out = empty_counts((ys.size, xs.size), max_iter, counts.dtype)
+        counts[block][rows, cols] = render(xs, ys, c, max_iter, out, **options, **lo)
+
+    def preview(step: int) -> np.ndarray:
+        """Fill every block from its own pixels, then mirror them."""
+        filled = counts if step == 1 else np.empty_like(counts)
+        for block in blocks:
+            filled[block] = _fill(counts[block], step)
+        mirror(filled)
+        return filled
+
+    for block in blocks:
+        compute(block, slice(0, None, steps[0]), slice(0, None, steps[0]))
+    yield steps[0], preview(steps[0])
+    for coarse, step in zip(steps, steps[1:]):
+        for block in blocks:
+            # The rows of the previous pass only miss some of their columns, the
+            # others miss all of them.
+            for offset in range(step, coarse, step):
+                compute(block, slice(0, None, coarse), slice(offset, None, coarse))
+            for offset in range(step, coarse, step):
+                compute(block, slice(offset, None, coarse), slice(0, None, step))
+        yield step, preview(step)
+
+
+def progressive_mandelbrot(
+    zmin: complex = -2 - 2j,
+    zmax: complex = 2 + 2j,
+    pixel_size: float = 0.1,
+    max_iter: int = 600,
+    steps: Sequence[int] = PROGRESSIVE_STEPS,
+    image: bool = False,
+    **options,
+) -> Iterator[Tuple[int, Union[np.ndarray, "Image"]]]:
+    """Render the Mandelbrot set progressively.
+
+    Parameters
+    ----------
+    zmin : complex
+        Lower bound limit.
+    zmax : complex
+        Upper bound limit.
+    pixel_size : float
+        Pixel size of the resulting plot.
+    max_iter : int
+        Maximum number of iterations.
+    steps : Sequence[int]
+        Steps of the sub-grids of the passes, as in `progressive_render`.
+    image : bool
+        Yield RGB `Image` previews instead of the counts.
+    **options
+        Options of `progressive_render`.
+
+    Returns
+    -------
+    Iterator[Tuple[int, Union[np.ndarray, Image]]]
+        Step of each pass and its preview, the last one being the full render.
+    """
+    previews = progressive_render(
+        zmin, zmax, pixel_size, max_iter, steps=steps, **options
+    )
+    return _as_images(previews, options.get("num_threads", 0)) if image else previews
+
+
+def progressive_julia(
+    c: complex,
+    zmin: complex = -2 - 2j,
+    zmax: complex = 2 + 2j,
+    pixel_size: float = 0.1,
+    max_iter: int = 600,
+    steps: Sequence[int] = PROGRESSIVE_STEPS,
+    image: bool = False,
+    **options,
+) -> Iterator[Tuple[int, Union[np.ndarray, "Image"]]]:
+    """Render a Julia set progressively.
+
+    Parameters
+    ----------
+    c : complex
+        Julia constant.
+    zmin : complex
+        Lower bound limit.
+    zmax : complex
+        Upper bound limit.
+    pixel_size : float
+        Pixel size of the resulting plot.
+    max_iter : int
+        Maximum number of iterations.
+    steps : Sequence[int]
+        Steps of the sub-grids of the passes, as in `progressive_render`.
+    image : bool
+        Yield RGB `Image` previews instead of the counts.
+    **options
+        Options of `progressive_render`.
+
+    Returns
+    -------
+    Iterator[Tuple[int, Union[np.ndarray, Image]]]
+        Step of each pass and its preview, the last one being the full render.
+    """
+    previews = progressive_render(
+        zmin, zmax, pixel_size, max_iter, julia=True, c=c, steps=steps, **options
+    )
+    return _as_images(previews, options.get("num_threads", 0)) if image else previews
+
+
+def _as_images(
+    previews: Iterator[Tuple[int, np.ndarray]], num_threads: int = 0
+) -> Iterator[Tuple[int, "Image"]]:
+    """Colour the previews of `progressive_render`, like `_generate_*_img` does."""
+    from PIL import Image
+
+    for step, counts in previews:
+        yield step, Image.fromarray(_colorize(counts, num_threads=num_threads))
+
+
+def _save_previews(previews: Iterator[Tuple[int, "Image"]], pattern: str) -> "Image":
+    """Save the previews of a progressive render as PNG files, named by formatting
+    `pattern` with their step, and give the full image."""
+    for step, img in previews:
+        if step == 1:
+            return img
+        logging.debug(f"Saving the preview of step {step}.")
+        img.save(pattern.format(step), "PNG")
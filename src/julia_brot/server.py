@@ -0,0 +1,437 @@
+"""HTTP server of XYZ map tiles of the Mandelbrot and Julia sets.
+
+`GET /{set}/{z}/{x}/{y}.png?c=...&max_iter=...` returns the 256x256 tile `(x, y)` of
+zoom level `z`, the level 0 tile covering the square from -2-2j to 2+2j and `y`
+growing downwards, as web maps expect. The kernels run in a thread pool, concurrent
+requests of a tile share a single render, and the encoded tiles are kept in an
+in-memory LRU cache, backed by an optional on-disk `TileCache` of the counts.
+`GET /metrics` returns the request latencies and cache counters in the Prometheus
+text format.
+"""
+
+import argparse
+import asyncio
+import collections
+import dataclasses
+import io
+import logging
+import math
+import os
+import sys
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .cache import TileCache, as_tile_cache
+from .common import _colorize, _default_cache_dir, _setup_logging
+
+if os.getenv("DOCS_BUILD", 0) == 0:
+    from julia_brot.julia import fast_julia
+    from julia_brot.mandelbrot import fast_mandelbrot
+    from julia_brot.parallel import max_threads
+    from julia_brot.stream import PngWriter
+
+_logger = logging.getLogger(__name__)
+
+MAP_TILE_SIZE = 256
+# Deeper levels have pixels smaller than doubles can tell apart.
+MAX_ZOOM = 36
+MAX_ITER_LIMIT = 100000
+# Upper bounds of the buckets of the latency histogram, in seconds.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+TileKey = Tuple[bool, complex, int, int, int, int]
+
+
+@dataclasses.dataclass
+class ServerStats:
+    """Counters of a `TileServer`."""
+
+    requests: int = 0
+    errors: int = 0
+    memory_hits: int = 0
+    renders: int = 0
+    coalesced: int = 0
+    evictions: int = 0
+    latency_sum: float = 0.0
+    latency_buckets: List[int] = dataclasses.field(
+        default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1)
+    )
+
+    def observe(self, seconds: float):
+        """Add the latency of a tile request to the histogram."""
+        self.latency_sum += seconds
+        index = next(
+            (i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound),
+            len(LATENCY_BUCKETS),
+        )
+        self.latency_buckets[index] += 1
+
+
+class TileServer:
+    """Asynchronous XYZ tile server.
+
+    Parameters
+    ----------
+    cache : Optional[Union[TileCache, str, os.PathLike]]
+        Tile cache, or its directory, keeping the counts of the rendered tiles on
+        disk across restarts.
+    memory_bytes : int
+        Size of the encoded tiles kept in memory, the least recently used ones being
+        evicted above it.
+    max_iter : int
+        Maximum number of iterations of the requests not giving one.
+    workers : int
+        Number of tiles rendered at once, all the available threads if 0.
+    cmap : str
+        Name of the matplotlib colormap. All the tiles colour the counts from 0 to
+        `max_iter` the same way, so that they join seamlessly.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[Union[TileCache, str, os.PathLike]] = None,
+        memory_bytes: int = 64 << 20,
+        max_iter: int = 200,
+        workers: int = 0,
+        cmap: str = "inferno",
+    ):
+        self.cache = as_tile_cache(cache)
+        self.memory_bytes = memory_bytes
+        self.max_iter = max_iter
+        self.cmap = cmap
+        self.stats = ServerStats()
+        self._memory: "collections.OrderedDict[TileKey, bytes]" = (
+            collections.OrderedDict()
+        )
+        self._memory_size = 0
+        self._inflight: Dict[TileKey, asyncio.Future] = {}
+        self._executor = ThreadPoolExecutor(workers or max_threads())
+
+    def render_tile(
+        self, julia: bool, c: complex, z: int, x: int, y: int, max_iter: int
+    ):
+        """Render and encode a tile, in the calling thread.
+
+        Parameters
+        ----------
+        julia : bool
+            Render the Julia set of `c` instead of the Mandelbrot set.
+        c : complex
+            Julia constant, ignored for the Mandelbrot set.
+        z : int
+            Zoom level.
+        x : int
+            Column of the tile, from the left.
+        y : int
+            Row of the tile, from the top.
+        max_iter : int
+            Maximum number of iterations.
+
+        Returns
+        -------
+        bytes
+            PNG image of the tile.
+        """
+        # Powers of two keep the pixels on the lattice of the multiples of their size.
+        pixel_size = math.ldexp(4 / MAP_TILE_SIZE, -z)
+        zmin = complex(
+            -2 + x * MAP_TILE_SIZE * pixel_size,
+            2 - (y + 1) * MAP_TILE_SIZE * pixel_size,
+        )
+        zmax = zmin + (MAP_TILE_SIZE - 0.5) * pixel_size * (1 + 1j)
+        if self.cache is not None:
+            counts = self.cache.render(
+                julia, c, zmin, zmax, pixel_size, max_iter, num_threads=1
+            )
+        elif julia:
+            counts = fast_julia(c, zmin, zmax, pixel_size, max_iter, num_threads=1)
+        else:
+            counts = fast_mandelbrot(zmin, zmax, pixel_size, max_iter, num_threads=1)
+        rgb = _colorize(np.asarray(counts)[::-1], self.cmap, 1, (0, max_iter))
+        buffer = io.BytesIO()
+        with PngWriter(buffer, rgb.shape[1], rgb.shape[0]) as writer:
+            writer.write(rgb)
+        return buffer.getvalue()
+
+    async def _render(self, key: TileKey) -> bytes:
+        try:
+            data = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self.render_tile, *key
+            )
+            self.stats.renders += 1
+            self._memory[key] = data
+            self._memory_size += len(data)
+            while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+                _, old = self._memory.popitem(last=False)
+                self._memory_size -= len(old)
+                self.stats.evictions += 1
+            return data
+        finally:
+            del self._inflight[key]
+
+    async def tile(
+        self, julia: bool, c: complex, z: int, x: int, y: int, max_iter: int
+    ) -> bytes:
+        """Get a tile from the memory cache, or render it once for all its requests.
+
+        Parameters are those of `render_tile`.
+
+        Returns
+        -------
+        bytes
+            PNG image of the tile.
+        """
+        key = (julia, complex(c) if julia else 0j, z, x, y, max_iter)
+        data = self._memory.get(key)
+        if data is not None:
+            self.stats.memory_hits += 1
+            self._memory.move_to_end(key)
+            return data
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._inflight[key] = asyncio.ensure_future(self._render(key))
+        else:
+            self.stats.coalesced += 1
+        # A cancelled request does not cancel the render shared with the others.
+        return await asyncio.shield(future)
+
+    def _parse_tile(self, path: str, query: str) -> TileKey:
+        """Read the tile of a request path, raising `LookupError` or `ValueError`."""
+        parts = path.strip("/").split("/")
+        if len(parts) != 4 or parts[0] not in ("mandelbrot", "julia"):
+            raise LookupError(path)
+        if not parts[3].endswith(".png"):
+            raise LookupError(path)
+        z, x, y = int(parts[1]), int(parts[2]), int(parts[3][:-4])
+        if not 0 <= z <= MAX_ZOOM or not (0 <= x < 1 << z and 0 <= y < 1 << z):
+            raise LookupError(path)
+        params = urllib.parse.parse_qs(query)
+        c = complex(params.get("c", ["0"])[0].replace(" ", "+"))
+        max_iter = int(params.get("max_iter", [self.max_iter])[0])
+        if not 1 <= max_iter <= MAX_ITER_LIMIT:
+            raise ValueError(f"max_iter must be in [1, {MAX_ITER_LIMIT}]")
+        return parts[0] == "julia", c, z, x, y, max_iter
+
+    def metrics(self) -> str:
+        """Counters of the server in the Prometheus text format."""
+        stats = self.stats
+        lines = [
+            "# TYPE julia_brot_requests_total counter",
+            f"julia_brot_requests_total {stats.requests}",
+            "# TYPE julia_brot_errors_total counter",
+            f"julia_brot_errors_total {stats.errors}",
+            "# TYPE julia_brot_memory_hits_total counter",
+            f"julia_brot_memory_hits_total {stats.memory_hits}",
+            "# TYPE julia_brot_renders_total counter",
+            f"julia_brot_renders_total {stats.renders}",
+            "# TYPE julia_brot_coalesced_total counter",
+            f"julia_brot_coalesced_total {stats.coalesced}",
+            "# TYPE julia_brot_memory_evictions_total counter",
+            f"julia_brot_memory_evictions_total {stats.evictions}",
+            "# TYPE julia_brot_memory_bytes gauge",
+            f"julia_brot_memory_bytes {self._memory_size}",
+        ]
+        if self.cache is not None:
+            lines += [
+                "# TYPE julia_brot_disk_hits_total counter",
+                f"julia_brot_disk_hits_total {self.cache.stats.hits}",
+                "# TYPE julia_brot_disk_misses_total counter",
+                f"julia_brot_disk_misses_total {self.cache.stats.misses}",
+            ]
+        lines.append("# TYPE julia_brot_tile_latency_seconds histogram")
+        total = 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), stats.latency_buckets):
+            total += count
+            lines.append(
+                f'julia_brot_tile_latency_seconds_bucket{{le="{bound}"}} {total}'
+            )
+        lines += [
+            f"julia_brot_tile_latency_seconds_sum {stats.latency_sum}",
+            f"julia_brot_tile_latency_seconds_count {total}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    async def _respond(self, method: str, target: str) -> Tuple[int, str, bytes]:
+        """Status, content type and body answering a request."""
+        url = urllib.parse.urlsplit(target)
+        if method != "GET":
+            return 405, "text/plain", b"only GET is supported\n"
+        if url.path == "/metrics":
+            return 200, "text/plain; version=0.0.4", self.metrics().encode()
+        start = time.perf_counter()
+        try:
+            key = self._parse_tile(url.path, url.query)
+        except LookupError:
+            return 404, "text/plain", b"no such tile\n"
+        except ValueError as error:
+            return 400, "text/plain", f"{error}\n".encode()
+        try:
+            data = await self.tile(*key)
+        except Exception:
+            _logger.exception(f"Rendering tile {key} failed.")
+            return 500, "text/plain", b"rendering failed\n"
+        self.stats.observe(time.perf_counter() - start)
+        return 200, "image/png", data
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answer the HTTP/1.1 requests of a connection."""
+        try:
+            while True:
+                request = await reader.readline()
+                if not request.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip().lower()
+                try:
+                    method, target, version = request.decode("latin-1").split()
+                except ValueError:
+                    status, kind, body = 400, "text/plain", b"malformed request\n"
+                    version = "HTTP/1.0"
+                else:
+                    status, kind, body = await self._respond(method, target)
+                self.stats.requests += 1
+                if status >= 400:
+                    self.stats.errors += 1
+                close = headers.get("connection") == "close" or version == "HTTP/1.0"
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                    f"Content-Type: {kind}\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    "Cache-Control: public, max-age=86400\r\n"
+                    f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(
+        self, host: str = "127.0.0.1", port: int = 8000
+    ) -> asyncio.AbstractServer:
+        """Start listening, returning the `asyncio` server.
+
+        Parameters
+        ----------
+        host : str
+            Address to listen on.
+        port : int
+            Port to listen on, picked by the system if 0.
+
+        Returns
+        -------
+        asyncio.AbstractServer
+            The server, whose `sockets` give the address it listens on.
+        """
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        """Stop the render threads."""
+        self._executor.shutdown(wait=False)
+
+
+def _parse_server_args(args: List[str]) -> argparse.Namespace:
+    """Parse the command line arguments of the tile server CLI.
+
+    Parameters
+    ----------
+    args : List[str]
+        Raw arguments from the shell call.
+
+    Returns
+    -------
+    argparse.Namespace
+        Parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="XYZ tile server CLI.")
+    parser.add_argument(
+        "--host", help="Address to listen on.", type=str, default="127.0.0.1"
+    )
+    parser.add_argument("--port", help="Port to listen on.", type=int, default=8000)
+    parser.add_argument(
+        "--max-iter",
+        help="Number of iterations of the requests not giving max_iter.",
+        type=int,
+        default=200,
+    )
+    parser.add_argument(
+        "--memory",
+        help="Size of the encoded tiles kept in memory, in MiB.",
+        type=int,
+        default=64,
+    )
+    parser.add_argument(
+        "--cache",
+        help="Keep the counts of the tiles in this directory, "
+        f"{_default_cache_dir()} if not given.",
+        type=str,
+        nargs="?",
+        const=_default_cache_dir(),
+        default=None,
+    )
+    parser.add_argument(
+        "--cache-size",
+        help="Size of the tile cache in MiB, the least recently used tiles are "
+        "evicted above it.",
+        type=int,
+        default=1024,
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        help="Number of tiles rendered at once, all the available threads if 0.",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "-d",
+        "--debug",
+        help="Set logging level to DEBUG",
+        action="store_const",
+        dest="loglevel",
+        const=logging.DEBUG,
+        default=logging.WARNING,
+    )
+    return parser.parse_args(args)
+
+
+def _serve_cli():
+    """Serve map tiles until interrupted.
+    This function is meant to be called from the CLI.
+    """
+    args = _parse_server_args(sys.argv[1:])
+    _setup_logging(args.loglevel)
+    cache = TileCache(args.cache, args.cache_size << 20) if args.cache else None
+    tiles = TileServer(cache, args.memory << 20, args.max_iter, args.workers)
+
+    async def serve():
+        server = await tiles.start(args.host, args.port)
+        print(f"Serving tiles on http://{args.host}:{args.port}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tiles.close()
@@ -0,0 +1,263 @@
+"""Resumable iteration state of a render.
+
+An `IterationState` keeps the last value of the orbits of the pixels which have not
+escaped yet, so that a render can be continued to a larger `max_iter` by only
+computing the extra iterations of these pixels.
+"""
+
+import logging
+import os
+from typing import Optional, Union
+
+import numpy as np
+
+if os.getenv("DOCS_BUILD", 0) == 0:
+    from julia_brot.engine import count_dtype, make_grid, resume_points
+
+_logger = logging.getLogger(__name__)
+
+
+class IterationState:
+    """Counts of a viewport and orbits of its pixels still bounded.
+
+    Only the still bounded pixels are stored besides the counts, as their flat index
+    and the last value of their orbit (24 bytes each). The points of the main
+    cardioid and period-2 bulb of the Mandelbrot set, and the orbits found to repeat
+    themselves, never escape and are not iterated anymore: like the bounded pixels,
+    their count is the current `max_iter`, which only escaped pixels lack.
+
+    Parameters
+    ----------
+    julia : bool
+        Compute the Julia set of `c` instead of the Mandelbrot set.
+    c : complex
+        Julia constant, ignored for the Mandelbrot set.
+    zmin : complex
+        Lower bound limit.
+    zmax : complex
+        Upper bound limit.
+    pixel_size : float
+        Pixel size of the grid.
+    dtype : Optional[np.dtype]
+        Type of the counts: `np.uint8`, `np.uint16` or `np.int32` for iteration
+        counts, `np.float32` for smooth counts. Defaults to the smallest integer type
+        holding the current `max_iter`, widened as it grows.
+
+    Example
+    -------
+    >>> state = IterationState(False, 0, -2 - 2j, 2 + 2j, 0.01)
+    >>> counts = state.advance(50)
+    >>> counts = state.advance(1000)  # Only iterates the pixels bounded after 50.
+    """
+
+    def __init__(
+        self,
+        julia: bool,
+        c: complex,
+        zmin: complex,
+        zmax: complex,
+        pixel_size: float,
+        dtype: Optional[np.dtype] = None,
+    ):
+        self.julia = bool(julia)
+        self.c = complex(c) if julia else 0j
+        self.zmin = complex(zmin)
+        self.zmax = complex(zmax)
+        self.pixel_size = float(pixel_size)
+        self.dtype = None if dtype is None else np.dtype(dtype)
+        self.max_iter = 0
+        x, y = self._grid()
+        self.counts = np.zeros((y.size, x.size), dtype=self.dtype or np.uint8)
+        self.index = np.arange(self.counts.size, dtype=np.int64)
+        if self.julia:
+            self.zr = np.tile(x, y.size)
+            self.zi = np.repeat(y, x.size)
+        else:
+            self.zr = np.zeros(self.index.size)
+            self.zi = np.zeros(self.index.size)
+
+    def _grid(self):
+        # The grid of `fast_mandelbrot`/`fast_julia`, snapped onto its mirror image.
+        x, y, _, _ = make_grid(
+            self.zmin,
+            self.zmax,
+            self.pixel_size,
+            "double",
+            snap_x=self.julia,
+            snap_y=True,
+        )
+        return x, y
+
+    @property
+    def active(self) -> int:
+        """Number of pixels still iterated."""
+        return self.index.size
+
+    def matches(
+        self, julia: bool, c: complex, zmin: complex, zmax: complex, pixel_size: float
+    ) -> bool:
+        """Whether the state belongs to the given render."""
+        return (
+            self.julia == bool(julia)
+            and (not julia or self.c == complex(c))
+            and self.zmin == complex(zmin)
+            and self.zmax == complex(zmax)
+            and self.pixel_size == float(pixel_size)
+        )
+
+    def advance(self, max_iter: int, num_threads: int = 0) -> np.ndarray:
+        """Continue the render up to `max_iter` iterations.
+
+        Parameters
+        ----------
+        max_iter : int
+            Maximum number of iterations, at least the current one.
+        num_threads : int
+            Number of threads to use, all the available ones if 0.
+
+        Returns
+        -------
+        np.ndarray
+            Counts of shape `(height, width)`, the ones `_fast_mandelbrot` and
+            `_fast_julia` compute with `max_iter` iterations. The array is owned by the
+            state and updated by the next calls.
+        """
+        if max_iter < self.max_iter:
+            raise ValueError(
+                f"max_iter can only increase, got {max_iter} after {self.max_iter}"
+            )
+        dtype = self.dtype or np.dtype(count_dtype(max_iter))
+        if self.counts.dtype != dtype:
+            self.counts = self.counts.astype(dtype)
+        # Raise the counts of the pixels which never escape.
+        self.counts[self.counts == self.max_iter] = max_iter
+        x, y = self._grid()
+        status = np.empty(self.index.size, dtype=np.uint8)
+        resume_points(
+            self.index,
+            self.zr,
+            self.zi,
+            x,
+            y,
+            self.c,
+            self.max_iter,
+            max_iter,
+            self.counts,
+            status,
+            self.julia,
+            True,
+            True,
+            num_threads,
+        )
+        keep = status == 1
+        self.index, self.zr, self.zi = self.index[keep], self.zr[keep], self.zi[keep]
+        _logger.debug(
+            f"Iterated {status.size} pixels up to {max_iter}, {self.index.size} left."
+        )
+        self.max_iter = max_iter
+        return self.counts
+
+    def save(self, path: Union[str, os.PathLike]):
+        """Spill the state to disk, in the `.npz` format.
+
+        Parameters
+        ----------
+        path : Union[str, os.PathLike]
+            Path of the file.
+        """
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                julia=self.julia,
+                c=self.c,
+                zmin=self.zmin,
+                zmax=self.zmax,
+                pixel_size=self.pixel_size,
+                dtype=str(self.dtype or ""),
+                max_iter=self.max_iter,
+                counts=self.counts,
+                index=self.index,
+                zr=self.zr,
+                zi=self.zi,
+            )
+
+    @classmethod
+    def load(cls, path: Union[str, os.PathLike]) -> "IterationState":
+        """Load a state saved with `save`.
+
+        Parameters
+        ----------
+        path : Union[str, os.PathLike]
+            Path of the file.
+
+        Returns
+        -------
+        IterationState
+            The loaded state.
+        """
+        state = cls.__new__(cls)
+        with np.load(path) as data:
+            state.julia = bool(data["julia"])
+            state.c = complex(data["c"])
+            state.zmin = complex(data["zmin"])
+            state.zmax = complex(data["zmax"])
+            state.pixel_size = float(data["pixel_size"])
+            state.dtype = np.dtype(str(data["dtype"])) if str(data["dtype"]) else None
+            state.max_iter = int(data["max_iter"])
+            for name in ("counts", "index", "zr", "zi"):
+                setattr(state, name, data[name])
+        return state
+
+
+def resume_state(
+    path: Union[str, os.PathLike],
+    julia: bool,
+    c: complex,
+    zmin: complex,
+    zmax: complex,
+    pixel_size: float,
+    max_iter: int,
+    num_threads: int = 0,
+) -> np.ndarray:
+    """Continue the render saved at `path` up to `max_iter`, and save it back.
+
+    A new render is started if the file does not exist, belongs to another render
+    or has more iterations than `max_iter`.
+
+    Parameters
+    ----------
+    path : Union[str, os.PathLike]
+        Path of the state file.
+    julia : bool
+        Compute the Julia set of `c` instead of the Mandelbrot set.
+    c : complex
+        Julia constant, ignored for the Mandelbrot set.
+    zmin : complex
+        Lower bound limit.
+    zmax : complex
+        Upper bound limit.
+    pixel_size : float
+        Pixel size of the grid.
+    max_iter : int
+        Maximum number of iterations.
+    num_threads : int
+        Number of threads to use, all the available ones if 0.
+
+    Returns
+    -------
+    np.ndarray
+        Counts of shape `(height, width)`.
+    """
+    state = None
+    if os.path.exists(path):
+        state = IterationState.load(path)
+        if not state.matches(julia, c, zmin, zmax, pixel_size) or (
+            state.max_iter > max_iter
+        ):
+            _logger.debug(f"Ignoring the state saved at {path}.")
+            state = None
+    if state is None:
+        state = IterationState(julia, c, zmin, zmax, pixel_size)
+    counts = state.advance(max_iter, num_threads)
+    state.save(path)
+    return counts
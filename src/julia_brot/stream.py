@@ -0,0 +1,292 @@
+"""Out-of-core rendering of images larger than the memory.
+
+The image is computed by horizontal strips into a memory-mapped buffer of counts,
+then coloured strip by strip and written incrementally to a PNG file and/or to a
+memory-mapped RGB array, so that the memory used is bounded by the strip size.
+"""
+
+import contextlib
+import logging
+import os
+import struct
+import tempfile
+import zlib
+from typing import BinaryIO, Optional, Tuple, Union
+
+import numpy as np
+
+from .common import _colorize
+
+if os.getenv("DOCS_BUILD", 0) == 0:
+    from julia_brot.color import count_range
+    from julia_brot.engine import check_method, count_dtype, make_grid, render
+
+_logger = logging.getLogger(__name__)
+
+STRIP_HEIGHT = 256
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class PngWriter:
+    """Write an 8-bit RGB PNG image row by row.
+
+    The rows are filtered with the "Sub" filter and deflated as they come, each call
+    to `write` flushing the compressed data in its own IDAT chunk.
+
+    Parameters
+    ----------
+    file : Union[str, os.PathLike, BinaryIO]
+        Path or binary file object to write the image to.
+    width : int
+        Width of the image.
+    height : int
+        Height of the image.
+    level : int
+        zlib compression level.
+    """
+
+    def __init__(
+        self,
+        file: Union[str, os.PathLike, BinaryIO],
+        width: int,
+        height: int,
+        level: int = 6,
+    ):
+        self._own = not hasattr(file, "write")
+        self._file = open(file, "wb") if self._own else file
+        self.width = width
+        self.height = height
+        self.rows = 0
+        self._compressor = zlib.compressobj(level)
+        self._file.write(PNG_SIGNATURE)
+        # 8 bits per sample, truecolour, default compression, filtering and no
+        # interlacing.
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+    def _chunk(self, kind: bytes, data: bytes):
+        self._file.write(struct.pack(">I", len(data)))
+        self._file.write(kind)
+        self._file.write(data)
+        self._file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind))))
+
+    def write(self, rows: np.ndarray):
+        """Append rows to the image.
+
+        Parameters
+        ----------
+        rows : np.ndarray
+            RGB rows of shape `(n, width, 3)` and type `np.uint8`.
+        """
+        if rows.shape[1:] != (self.width, 3):
+            raise ValueError(f"rows must have shape (n, {self.width}, 3)")
+        if self.rows + rows.shape[0] > self.height:
+            raise ValueError("too many rows for the image height")
+        rows = rows.reshape(rows.shape[0], -1)
+        filtered = np.empty((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 1
+        filtered[:, 1:4] = rows[:, :3]
+        np.subtract(rows[:, 3:], rows[:, :-3], out=filtered[:, 4:])
+        data = self._compressor.compress(filtered)
+        if data:
+            self._chunk(b"IDAT", data)
+        self.rows += rows.shape[0]
+
+    def close(self):
+        """Finish the image, which must have all its rows, and close the file."""
+        if self._compressor is None:
+            return
+        if self.rows != self.height:
+            raise ValueError(f"the image has {self.rows} rows out of {self.height}")
+        self._chunk(b"IDAT", self._compressor.flush())
+        self._chunk(b"IEND", b"")
+        self._compressor = None
+        if self._own:
+            self._file.close()
+
+    def __enter__(self) -> "PngWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._own:
+            self._file.close()
+
+
+def _merge_bounds(bounds: Optional[Tuple], low, high) -> Tuple:
+    if bounds is None:
+        return low, high
+    return min(bounds[0], low), max(bounds[1], high)
+
+
+def write_image(
+    counts: np.ndarray,
+    png: Optional[Union[str, os.PathLike, BinaryIO]] = None,
+    rgb: Optional[Union[str, os.PathLike]] = None,
+    cmap: str = "inferno",
+    num_threads: int = 0,
+    strip_height: int = STRIP_HEIGHT,
+    bounds: Optional[Tuple[float, float]] = None,
+):
+    """Colour counts strip by strip, writing them to a PNG file and/or a memory map.
+
+    Parameters
+    ----------
+    counts : np.ndarray
+        Counts of shape `(height, width)`, usually memory-mapped.
+    png : Optional[Union[str, os.PathLike, BinaryIO]]
+        Path or binary file object receiving the image as a PNG.
+    rgb : Optional[Union[str, os.PathLike]]
+        Path of a `.npy` file receiving the image, as a `(height, width, 3)` array of
+        type `np.uint8`.
+    cmap : str
+        Name of the matplotlib colormap.
+    num_threads : int
+        Number of threads to use, all the available ones if 0.
+    strip_height : int
+        Number of rows coloured and written at once.
+    bounds : Optional[Tuple[float, float]]
+        Smallest and largest counts, found with a first pass over the strips if None.
+    """
+    height, width = counts.shape
+    if bounds is None:
+        for row in range(0, height, strip_height):
+            strip = np.ascontiguousarray(counts[row : row + strip_height])
+            bounds = _merge_bounds(bounds, *count_range(strip, num_threads))
+    image = None
+    if rgb is not None:
+        image = np.lib.format.open_memmap(
+            rgb, mode="w+", dtype=np.uint8, shape=(height, width, 3)
+        )
+    with contextlib.ExitStack() as stack:
+        writer = None
+        if png is not None:
+            writer = stack.enter_context(PngWriter(png, width, height))
+        for row in range(0, height, strip_height):
+            colors = _colorize(
+                counts[row : row + strip_height], cmap, num_threads, bounds
+            )
+            if writer is not None:
+                writer.write(colors)
+            if image is not None:
+                image[row : row + len(colors)] = colors
+    if image is not None:
+        image.flush()
+        del image
+
+
+def stream_render(
+    png: Optional[Union[str, os.PathLike, BinaryIO]] = None,
+    rgb: Optional[Union[str, os.PathLike]] = None,
+    julia: bool = False,
+    c: complex = 0,
+    zmin: complex = -2 - 2j,
+    zmax: complex = 2 + 2j,
+    pixel_size: float = 0.1,
+    max_iter: int = 600,
+    strip_height: int = STRIP_HEIGHT,
+    num_threads: int = 0,
+    method: str = "escape",
+    dtype: Optional[np.dtype] = None,
+    counts: Optional[Union[str, os.PathLike]] = None,
+    cmap: str = "inferno",
+    supersample: int = 1,
+    adaptive: bool = False,
+) -> Tuple[int, int]:
+    """Render an image by strips, writing it to a PNG file and/or a memory map.
+
+    The counts are first computed strip by strip into a memory-mapped file, which
+    gives the range of counts of the whole image, then the strips are coloured like
+    `plot_mandelbrot` and `plot_julia` colour a full image and written out. Only a
+    few strips are held in memory at once.
+
+    Parameters
+    ----------
+    png : Optional[Union[str, os.PathLike, BinaryIO]]
+        Path or binary file object receiving the image as a PNG.
+    rgb : Optional[Union[str, os.PathLike]]
+        Path of a `.npy` file receiving the image, as a `(height, width, 3)` array of
+        type `np.uint8` which `np.load(rgb, mmap_mode="r")` maps back.
+    julia : bool
+        Compute the Julia set of `c` instead of the Mandelbrot set.
+    c : complex
+        Julia constant, ignored for the Mandelbrot set.
+    zmin : complex
+        Lower bound limit.
+    zmax : complex
+        Upper bound limit.
+    pixel_size : float
+        Pixel size of the image.
+    max_iter : int
+        Maximum number of iterations.
+    strip_height : int
+        Number of rows computed and written at once.
+    num_threads : int
+        Number of threads to use, all the available ones if 0.
+    method : str
+        "escape" to compute every pixel, "mariani" to skip the regions of uniform
+        count with the Mariani-Silver algorithm.
+    dtype : Optional[np.dtype]
+        Type of the counts, as in `_fast_mandelbrot`.
+    counts : Optional[Union[str, os.PathLike]]
+        Path of a `.npy` file keeping the counts if given. Otherwise they go to a
+        temporary file next to `png` or `rgb`, removed once the image is written.
+    cmap : str
+        Name of the matplotlib colormap.
+    supersample : int
+        Number of samples per pixel along each axis, as in `_fast_mandelbrot`.
+    adaptive : bool
+        Only supersample the pixels whose count differs from one of their neighbours
+        in the strip.
+
+    Returns
+    -------
+    Tuple[int, int]
+        Width and height of the image.
+    """
+    check_method(method)
+    if strip_height < 1:
+        raise ValueError(f"strip_height must be strictly positive, got {strip_height}")
+    x, y, _, _ = make_grid(zmin, zmax, pixel_size, "double", snap_x=julia, snap_y=True)
+    width, height = x.size, y.size
+    dtype = np.dtype(dtype or count_dtype(max_iter))
+    tmp = None
+    if counts is None:
+        # Next to the image rather than in a temporary directory often held in memory.
+        path = next((p for p in (png, rgb) if isinstance(p, (str, os.PathLike))), None)
+        directory = os.path.dirname(os.path.abspath(path)) if path else None
+        fd, tmp = tempfile.mkstemp(suffix=".npy", dir=directory)
+        os.close(fd)
+        counts = tmp
+    try:
+        buffer = np.lib.format.open_memmap(
+            counts, mode="w+", dtype=dtype, shape=(height, width)
+        )
+        bounds = None
+        for row in range(0, height, strip_height):
+            strip = buffer[row : row + strip_height]
+            render(
+                x,
+                y[row : row + strip_height],
+                c,
+                max_iter,
+                strip,
+                julia=julia,
+                num_threads=num_threads,
+                interior_check=True,
+                periodicity_check=True,
+                method=method,
+                pixel_size=pixel_size,
+                supersample=supersample,
+                adaptive=adaptive,
+            )
+            bounds = _merge_bounds(bounds, *count_range(strip, num_threads))
+            _logger.debug(f"Computed rows {row} to {row + len(strip)} of {height}.")
+        buffer.flush()
+
+        write_image(buffer, png, rgb, cmap, num_threads, strip_height, bounds)
+        del buffer
+    finally:
+        if tmp is not None:
+            os.unlink(tmp)
+    return width, height
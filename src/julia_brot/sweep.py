@@ -0,0 +1,360 @@
+"""Batch rendering of Julia set animations.
+
+The constant `c` follows a path, one frame per point, and the frames are rendered by
+a pool of threads: the kernels and the PNG compression release the GIL, so that
+frames are computed, coloured and encoded in parallel without the cost of starting a
+process per frame. Every frame is coloured with the same lookup table, over the
+counts from 0 to `max_iter`, which keeps the colours from flickering.
+"""
+
+import argparse
+import collections
+import logging
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, List, Optional, Sequence, Union
+
+import numpy as np
+
+from .common import _colorize, _grid_size, _setup_logging
+
+if os.getenv("DOCS_BUILD", 0) == 0:
+    from julia_brot.julia import fast_julia
+    from julia_brot.parallel import max_threads
+    from julia_brot.stream import PngWriter
+
+_logger = logging.getLogger(__name__)
+
+FRAME_PATTERN = "julia_{:05d}.png"
+
+
+def circle_path(center: complex, radius: float, frames: int) -> np.ndarray:
+    """Constants evenly spread on a circle, for a looping animation.
+
+    Parameters
+    ----------
+    center : complex
+        Centre of the circle.
+    radius : float
+        Radius of the circle.
+    frames : int
+        Number of constants.
+
+    Returns
+    -------
+    np.ndarray
+        Constants of the frames, the last one being just before the first one.
+    """
+    return center + radius * np.exp(2j * np.pi * np.arange(frames) / frames)
+
+
+def spline_path(
+    points: Sequence[complex], frames: int, closed: bool = False
+) -> np.ndarray:
+    """Constants on a Catmull-Rom spline going through the given points.
+
+    Parameters
+    ----------
+    points : Sequence[complex]
+        Points the spline goes through, at least 2.
+    frames : int
+        Number of constants, evenly spread between the points.
+    closed : bool
+        Go back from the last point to the first one, for a looping animation.
+
+    Returns
+    -------
+    np.ndarray
+        Constants of the frames, from the first point to the last one, or to just
+        before the first one if `closed`.
+    """
+    points = np.asarray(points, dtype=np.complex128).reshape(-1)
+    if points.size < 2:
+        raise ValueError("the spline needs at least 2 points")
+    if closed:
+        padded = np.concatenate([points[-1:], points, points[:2]])
+        segments = points.size
+    else:
+        padded = np.concatenate([points[:1], points, points[-1:]])
+        segments = points.size - 1
+    t = np.linspace(0, segments, frames, endpoint=not closed)
+    i = np.minimum(t.astype(np.intp), segments - 1)
+    u = t - i
+    p0, p1, p2, p3 = padded[i], padded[i + 1], padded[i + 2], padded[i + 3]
+    return 0.5 * (
+        2 * p1
+        + (p2 - p0) * u
+        + (2 * p0 - 5 * p1 + 4 * p2 - p3) * u**2
+        + (3 * (p1 - p2) + p3 - p0) * u**3
+    )
+
+
+def _write_png(path: str, rgb: np.ndarray):
+    """Write a PNG file atomically, so that a frame on disk is always complete."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(suffix=".png", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            with PngWriter(file, rgb.shape[1], rgb.shape[0]) as writer:
+                writer.write(rgb)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _write_frame(stream: Optional[BinaryIO], rgb: np.ndarray):
+    if stream is not None:
+        stream.write(rgb.tobytes())
+
+
+def julia_sweep(
+    path: Sequence[complex],
+    zmin: complex = -2 - 2j,
+    zmax: complex = 2 + 2j,
+    pixel_size: float = 0.01,
+    max_iter: int = 100,
+    frames: Optional[str] = FRAME_PATTERN,
+    raw: Optional[Union[str, os.PathLike, BinaryIO]] = None,
+    workers: int = 0,
+    num_threads: int = 1,
+    dtype: Optional[np.dtype] = None,
+    cmap: str = "inferno",
+    resume: bool = True,
+) -> int:
+    """Render the Julia sets of the constants of a path, one frame per constant.
+
+    Parameters
+    ----------
+    path : Sequence[complex]
+        Constants of the frames, from `circle_path` or `spline_path` for instance.
+    zmin : complex
+        Lower bound limit.
+    zmax : complex
+        Upper bound limit.
+    pixel_size : float
+        Pixel size of the frames.
+    max_iter : int
+        Maximum number of iterations.
+    frames : Optional[str]
+        Pattern of the paths of the PNG frames, formatted with the frame number. No
+        PNG is written if None.
+    raw : Optional[Union[str, os.PathLike, BinaryIO]]
+        Path or binary file object receiving the frames in order as raw RGB24
+        video, as read by ``ffmpeg -f rawvideo -pix_fmt rgb24 -s WIDTHxHEIGHT``.
+    workers : int
+        Number of frames rendered at once, all the available threads if 0.
+    num_threads : int
+        Number of threads rendering each frame, all the available ones if 0.
+    dtype : Optional[np.dtype]
+        Type of the counts, as in `_fast_julia`.
+    cmap : str
+        Name of the matplotlib colormap.
+    resume : bool
+        Skip the PNG frames already written and append to a raw video file holding
+        the first frames, so that an interrupted sweep continues where it stopped.
+
+    Returns
+    -------
+    int
+        Number of frames rendered.
+    """
+    path = np.asarray(path, dtype=np.complex128).reshape(-1)
+    if frames is None and raw is None:
+        raise ValueError("frames or raw must be given")
+    workers = workers or max_threads()
+    local = threading.local()
+
+    def render(index: int) -> np.ndarray:
+        # Every thread reuses its own buffer of counts.
+        local.counts = np.asarray(
+            fast_julia(
+                path[index],
+                zmin,
+                zmax,
+                pixel_size,
+                max_iter,
+                num_threads,
+                dtype=dtype,
+                out=getattr(local, "counts", None),
+            )
+        )
+        rgb = _colorize(local.counts, cmap, num_threads, (0, max_iter))
+        if frames is not None:
+            _write_png(frames.format(index), rgb)
+        return rgb
+
+    start = 0
+    stream = None
+    own = raw is not None and not hasattr(raw, "write")
+    if own:
+        width, height = _grid_size(zmin, zmax, pixel_size)
+        frame_size = width * height * 3
+        if resume and os.path.exists(raw):
+            # Drop the last frame if it was only partly written.
+            start = min(os.path.getsize(raw) // frame_size, path.size)
+        stream = open(raw, "r+b" if start else "wb")
+        stream.truncate(start * frame_size)
+        stream.seek(start * frame_size)
+    elif raw is not None:
+        stream = raw
+    todo = [
+        index
+        for index in range(start, path.size)
+        if stream is not None or not (resume and os.path.exists(frames.format(index)))
+    ]
+    _logger.debug(f"Rendering {len(todo)} frames out of {path.size}.")
+
+    try:
+        with ThreadPoolExecutor(workers) as executor:
+            # Only a few frames are rendered ahead of the one being written, which
+            # bounds the memory used whatever the number of frames.
+            pending = collections.deque()
+            for index in todo:
+                pending.append(executor.submit(render, index))
+                if len(pending) > 2 * workers:
+                    _write_frame(stream, pending.popleft().result())
+            while pending:
+                _write_frame(stream, pending.popleft().result())
+    finally:
+        if own:
+            stream.close()
+    return len(todo)
+
+
+def _complex_list(text: str) -> List[complex]:
+    return [complex(value) for value in text.split(",")]
+
+
+def _parse_sweep_args(args: List[str]) -> argparse.Namespace:
+    """Parse the command line arguments of the Julia sweep CLI.
+
+    Parameters
+    ----------
+    args : List[str]
+        Raw arguments from the shell call.
+
+    Returns
+    -------
+    argparse.Namespace
+        Parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Julia animation rendering CLI.")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument(
+        "--radius",
+        help="Sweep c along the circle of this radius around --center.",
+        type=float,
+    )
+    group.add_argument(
+        "--points",
+        help="Sweep c along a spline through these comma-separated points "
+        "(ex: --points=-0.8+0.156j,-0.4+0.6j).",
+        type=_complex_list,
+    )
+    parser.add_argument(
+        "--center",
+        help="Centre of the circle swept by c (ex: --center=-0.5).",
+        type=complex,
+        default=0,
+    )
+    parser.add_argument(
+        "--closed",
+        help="Loop the spline back to its first point.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-n", "--frames", help="Number of frames.", type=int, default=100
+    )
+    parser.add_argument(
+        "--zmin",
+        help="Lower bound of the plot, as a complex number (ex: -2-2j)",
+        type=complex,
+        default=-2 - 2j,
+    )
+    parser.add_argument(
+        "--zmax",
+        help="Upper bound of the plot, as a complex number (ex: 2+2j)",
+        type=complex,
+        default=2 + 2j,
+    )
+    parser.add_argument(
+        "--pixel_size",
+        help="Pixel size of the frames.",
+        type=float,
+        default=0.01,
+    )
+    parser.add_argument(
+        "--max-iter",
+        help="Number of iterations to generate the sets.",
+        type=int,
+        default=100,
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        help="Number of frames rendered at once, all the available threads if 0.",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Pattern of the paths of the PNG frames, formatted with the frame number. "
+        "Frames already written are skipped.",
+        type=str,
+        default=FRAME_PATTERN,
+    )
+    parser.add_argument(
+        "--raw",
+        help="Write the frames as raw RGB24 video to this file, or to the standard "
+        "output if '-', instead of PNG files (ex: --raw - | ffmpeg -f rawvideo "
+        "-pix_fmt rgb24 -s 400x400 -i - out.mp4).",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--no-resume",
+        help="Render all the frames again instead of continuing an interrupted sweep.",
+        action="store_false",
+        dest="resume",
+    )
+    parser.add_argument(
+        "-d",
+        "--debug",
+        help="Set logging level to DEBUG",
+        action="store_const",
+        dest="loglevel",
+        const=logging.DEBUG,
+        default=logging.WARNING,
+    )
+    return parser.parse_args(args)
+
+
+def _julia_sweep_cli():
+    """Render an animation of Julia sets.
+    This function is meant to be called from the CLI.
+    """
+    args = _parse_sweep_args(sys.argv[1:])
+    _setup_logging(args.loglevel)
+    if args.radius is not None:
+        path = circle_path(args.center, args.radius, args.frames)
+    else:
+        path = spline_path(args.points, args.frames, args.closed)
+    raw = args.raw
+    if raw == "-":
+        raw = sys.stdout.buffer
+    julia_sweep(
+        path,
+        args.zmin,
+        args.zmax,
+        args.pixel_size,
+        args.max_iter,
+        None if raw is not None else args.output,
+        raw,
+        args.workers,
+        resume=args.resume,
+    )
@@ -0,0 +1,268 @@
+"""Incremental rendering of a moving viewport.
+
+A session keeps the counts of the last viewport on the lattice of the multiples of
+the pixel size. Pixels shared with the next viewport keep their coordinates, so a pan
+only computes the newly exposed strips, and a zoom by a power of two reuses the
+pixels common to both lattices: every other pixel of each row and column on a 2x zoom
+in, every pixel of the new viewport on a 2x zoom out which stays inside the old one.
+"""
+
+import dataclasses
+import logging
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .common import _snap_to_lattice
+
+if os.getenv("DOCS_BUILD", 0) == 0:
+    from julia_brot.engine import empty_counts, render
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class ViewportStats:
+    """Counters of a `ViewportSession`."""
+
+    renders: int = 0
+    computed: int = 0
+    reused: int = 0
+
+
+def _scale_ratio(old: float, new: float) -> int:
+    """Power of two `r` such that `new * r == old` exactly, 0 if there is none."""
+    r = round(old / new)
+    if r >= 1 and r & (r - 1) == 0 and new * r == old:
+        return r
+    return 0
+
+
+def _axis_map(
+    start: int, n: int, pixel_size: float, old_start: int, old_n: int, old_size: float
+) -> np.ndarray:
+    """Match the pixels of a lattice axis to the pixels of a previous one.
+
+    Parameters
+    ----------
+    start : int
+        Lattice index of the first pixel of the axis.
+    n : int
+        Number of pixels of the axis.
+    pixel_size : float
+        Pixel size of the axis.
+    old_start : int
+        Lattice index of the first pixel of the previous axis.
+    old_n : int
+        Number of pixels of the previous axis.
+    old_size : float
+        Pixel size of the previous axis.
+
+    Returns
+    -------
+    np.ndarray
+        Index in the previous axis of each pixel at exactly the same coordinate, -1
+        for the pixels it does not have.
+    """
+    k = start + np.arange(n)
+    index = np.full(n, -1)
+    zoom_in = _scale_ratio(old_size, pixel_size)
+    zoom_out = _scale_ratio(pixel_size, old_size)
+    if zoom_in:
+        shared = k % zoom_in == 0
+        old = k // zoom_in - old_start
+    elif zoom_out:
+        shared = np.ones(n, dtype=bool)
+        old = k * zoom_out - old_start
+    else:
+        return index
+    shared &= (old >= 0) & (old < old_n)
+    index[shared] = old[shared]
+    return index
+
+
+def _as_slice(index: np.ndarray) -> slice:
+    """Slice of the increasing arithmetic progression `index`."""
+    if not index.size:
+        return slice(0, 0)
+    step = int(index[1] - index[0]) if index.size > 1 else 1
+    return slice(int(index[0]), int(index[-1]) + 1, step)
+
+
+class ViewportSession:
+    """Render successive viewports, only computing the pixels of the last one missing.
+
+    The viewports are snapped to the lattice of the multiples of their pixel size,
+    which moves them by less than half a pixel. The counts are those of a direct
+    render of the lattice with the "escape" method.
+
+    Parameters
+    ----------
+    max_iter : int
+        Maximum number of iterations.
+    julia : bool
+        Compute the Julia set of `c` instead of the Mandelbrot set.
+    c : complex
+        Julia constant, ignored for the Mandelbrot set.
+    dtype : Optional[np.dtype]
+        Type of the counts, the smallest integer type holding `max_iter` if None.
+    num_threads : int
+        Number of threads rendering the missing pixels, all the available ones if 0.
+    """
+
+    def __init__(
+        self,
+        max_iter: int,
+        julia: bool = False,
+        c: complex = 0j,
+        dtype: Optional[np.dtype] = None,
+        num_threads: int = 0,
+    ):
+        self.max_iter = max_iter
+        self.julia = julia
+        self.c = complex(c)
+        self.dtype = empty_counts((0, 0), max_iter, dtype).dtype
+        self.num_threads = num_threads
+        self.stats = ViewportStats()
+        self.reset()
+
+    def reset(self):
+        """Forget the last viewport, so that the next one is fully computed."""
+        self.counts = empty_counts((0, 0), self.max_iter, self.dtype)
+        self.col0 = self.row0 = 0
+        self.pixel_size = 1.0
+
+    @property
+    def viewport(self) -> Tuple[complex, complex]:
+        """Lower and upper bound limits of the last viewport, on the lattice."""
+        height, width = self.counts.shape
+        zmin = complex(self.col0, self.row0) * self.pixel_size
+        return zmin, zmin + complex(width, height) * self.pixel_size
+
+    def _compute(
+        self, out: np.ndarray, x: np.ndarray, y: np.ndarray, rows, cols
+    ) -> int:
+        """Render the pixels of `out` at the intersection of `rows` and `cols`."""
+        if not (len(rows) and len(cols)):
+            return 0
+        block = render(
+            np.ascontiguousarray(x[cols]),
+            np.ascontiguousarray(y[rows]),
+            self.c,
+            self.max_iter,
+            empty_counts((len(rows), len(cols)), self.max_iter, self.dtype),
+            julia=self.julia,
+            num_threads=self.num_threads,
+            interior_check=True,
+            periodicity_check=True,
+        )
+        out[np.ix_(rows, cols)] = block
+        return block.size
+
+    def render(self, zmin: complex, zmax: complex, pixel_size: float) -> np.ndarray:
+        """Compute the counts of a viewport, reusing those of the last one.
+
+        Parameters
+        ----------
+        zmin : complex
+            Lower bound limit.
+        zmax : complex
+            Upper bound limit.
+        pixel_size : float
+            Pixel size of the resulting plot.
+
+        Returns
+        -------
+        np.ndarray
+            Read-only counts of shape `(height, width)`, kept by the session until the
+            next viewport.
+        """
+        return self._render_lattice(
+            *_snap_to_lattice(zmin, zmax, pixel_size), pixel_size
+        )
+
+    def _render_lattice(
+        self, col0: int, row0: int, width: int, height: int, pixel_size: float
+    ) -> np.ndarray:
+        """Compute the counts of a viewport given by its lattice indices."""
+        out = empty_counts((height, width), self.max_iter, self.dtype)
+        old_height, old_width = self.counts.shape
+        cols = _axis_map(col0, width, pixel_size, self.col0, old_width, self.pixel_size)
+        rows = _axis_map(
+            row0, height, pixel_size, self.row0, old_height, self.pixel_size
+        )
+        shared_cols, new_cols = np.flatnonzero(cols >= 0), np.flatnonzero(cols < 0)
+        shared_rows, new_rows = np.flatnonzero(rows >= 0), np.flatnonzero(rows < 0)
+        # The shared pixels are regularly spaced in both viewports.
+        out[_as_slice(shared_rows), _as_slice(shared_cols)] = self.counts[
+            _as_slice(rows[shared_rows]), _as_slice(cols[shared_cols])
+        ]
+
+        # The missing pixels are the rows without any shared pixel, and the missing
+        # columns of the other rows.
+        x = (col0 + np.arange(width)) * pixel_size
+        y = (row0 + np.arange(height)) * pixel_size
+        computed = self._compute(out, x, y, new_rows, np.arange(width))
+        computed += self._compute(out, x, y, shared_rows, new_cols)
+
+        out.flags.writeable = False
+        self.counts = out
+        self.col0, self.row0, self.pixel_size = col0, row0, pixel_size
+        self.stats.renders += 1
+        self.stats.computed += computed
+        self.stats.reused += out.size - computed
+        _logger.debug(f"Viewport session: {self.stats}")
+        return out
+
+    def pan(self, dx: int, dy: int) -> np.ndarray:
+        """Move the last viewport by a whole number of pixels.
+
+        Parameters
+        ----------
+        dx : int
+            Number of pixels to move the viewport towards the increasing real parts.
+        dy : int
+            Number of pixels to move the viewport towards the increasing imaginary
+            parts.
+
+        Returns
+        -------
+        np.ndarray
+            Counts of the moved viewport, see `render`.
+        """
+        height, width = self.counts.shape
+        return self._render_lattice(
+            self.col0 + dx, self.row0 + dy, width, height, self.pixel_size
+        )
+
+    def zoom(self, factor: float, center: Optional[complex] = None) -> np.ndarray:
+        """Zoom the last viewport, keeping its size in pixels.
+
+        Parameters
+        ----------
+        factor : float
+            Zoom factor, dividing the pixel size. Powers of two reuse the pixels
+            common to both lattices, other factors compute the whole viewport.
+        center : Optional[complex]
+            Point kept in place, the center of the viewport if None.
+
+        Returns
+        -------
+        np.ndarray
+            Counts of the zoomed viewport, see `render`.
+        """
+        height, width = self.counts.shape
+        if center is None:
+            center = sum(self.viewport) / 2
+        pixel_size = self.pixel_size / factor
+        # Position of the center in the viewport, in pixels, kept by the zoom.
+        dx = center.real / self.pixel_size - self.col0
+        dy = center.imag / self.pixel_size - self.row0
+        return self._render_lattice(
+            round(center.real / pixel_size - dx),
+            round(center.imag / pixel_size - dy),
+            width,
+            height,
+            pixel_size,
+        )
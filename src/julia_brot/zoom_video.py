@@ -0,0 +1,458 @@
+"""Zoom videos rendered from an exponential map.
+
+Every frame of a zoom towards a point shows the same rings around it, only at other
+scales. The counts are computed once on the exponential map of the point: the pixel
+`(row, col)` of the map is at `center + exp((row + 1j * col) * step)` (plus an
+offset), so that its pixels are square at every radius and that zooming in only moves
+its rows. Each frame then reads its pixels from the map, the centre of the frames
+coming from the direct renders of the last frames, where the map would need rows down
+to a zero radius.
+"""
+
+import argparse
+import collections
+import logging
+import math
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, List, Optional, Union
+
+import numpy as np
+
+from .common import _colorize, _setup_logging
+from .sweep import _write_frame, _write_png
+
+if os.getenv("DOCS_BUILD", 0) == 0:
+    from julia_brot.engine import count_points, empty_counts, render, use_double_double
+    from julia_brot.parallel import max_threads
+
+_logger = logging.getLogger(__name__)
+
+FRAME_PATTERN = "zoom_{:05d}.png"
+
+
+class ExpMapZoom:
+    """Counts of the frames of a zoom, reprojected from an exponential map.
+
+    The frame `index` has a width of `2 * radius / zoom ** (index / (frames - 1))`
+    around `center`. `render` computes the map and the last frames, then `frame`
+    gives the counts of any frame.
+
+    Parameters
+    ----------
+    center : complex
+        Point zoomed into.
+    radius : float
+        Half-width of the first frame.
+    zoom : float
+        Zoom factor between the first and the last frames.
+    frames : int
+        Number of frames.
+    width : int
+        Width of the frames, in pixels.
+    height : int
+        Height of the frames, in pixels.
+    max_iter : int
+        Maximum number of iterations.
+    julia : bool
+        Compute the Julia set of `c` instead of the Mandelbrot set.
+    c : complex
+        Julia constant, ignored for the Mandelbrot set.
+    dtype : Optional[np.dtype]
+        Type of the counts, the smallest integer type holding `max_iter` if None.
+    direct : int
+        Number of last frames rendered directly. The first of them gives the centre
+        of the previous frames.
+    angles : Optional[int]
+        Number of pixels of the rows of the map, giving pixels as large as those of
+        the corners of the frames if None.
+    num_threads : int
+        Number of threads computing the map and the frames, all the available ones
+        if 0.
+    """
+
+    def __init__(
+        self,
+        center: complex,
+        radius: float,
+        zoom: float,
+        frames: int,
+        width: int,
+        height: int,
+        max_iter: int,
+        julia: bool = False,
+        c: complex = 0j,
+        dtype: Optional[np.dtype] = None,
+        direct: int = 1,
+        angles: Optional[int] = None,
+        num_threads: int = 0,
+    ):
+        if frames < 2 or zoom < 1:
+            raise ValueError("a zoom needs at least 2 frames and a zoom factor >= 1")
+        if not 1 <= direct <= frames:
+            raise ValueError("direct must be between 1 and the number of frames")
+        self.center = complex(center)
+        self.radius = radius
+        self.zoom = zoom
+        self.frames = frames
+        self.width = width
+        self.height = height
+        self.max_iter = max_iter
+        self.julia = julia
+        self.c = complex(c)
+        self.dtype = empty_counts((0, 0), max_iter, dtype).dtype
+        self.direct = direct
+        self.num_threads = num_threads
+        last = self.pixel_size(frames - 1)
+        half = complex(width, height) * last / 2
+        if use_double_double(self.center - half, self.center + half, last):
+            raise ValueError("the zoom is too deep for double precision")
+
+        diagonal = math.hypot(1, height / width)
+        if angles is None:
+            angles = math.ceil(math.pi * width * diagonal)
+        self.angles = angles
+        self.step = 2 * math.pi / angles
+        # The map goes from the inscribed circle of the centre given by the first
+        # direct frame to the corners of the first frame.
+        self.core = frames - direct
+        self.log_min = math.log(self.pixel_size(self.core) * min(width, height) / 2)
+        log_max = math.log(radius * diagonal)
+        self.rows = math.ceil((log_max - self.log_min) / self.step) + 1
+
+        # Lattice position in the map of the pixels of a frame of unit pixel size.
+        offsets = self._offsets(width)[None, :] + 1j * self._offsets(height)[:, None]
+        self._log_radius = np.log(np.maximum(np.abs(offsets), 0.5)) / self.step
+        self._cols = np.rint(np.angle(offsets) / self.step).astype(np.intp) % angles
+        self.strip = None
+        self.direct_frames: Dict[int, np.ndarray] = {}
+
+    @staticmethod
+    def _offsets(n: int) -> np.ndarray:
+        """Positions of the pixels of an axis from its centre, in pixels."""
+        return np.arange(n) + 0.5 - n / 2
+
+    def pixel_size(self, index: int) -> float:
+        """Pixel size of a frame.
+
+        Parameters
+        ----------
+        index : int
+            Number of the frame.
+
+        Returns
+        -------
+        float
+            Pixel size of the frame.
+        """
+        return 2 * self.radius / self.width / self.zoom ** (index / (self.frames - 1))
+
+    @property
+    def pixels(self) -> int:
+        """Number of pixels computed by `render`."""
+        return self.rows * self.angles + self.direct * self.width * self.height
+
+    def render(self) -> "ExpMapZoom":
+        """Compute the exponential map and the last frames.
+
+        Returns
+        -------
+        ExpMapZoom
+            The zoom itself.
+        """
+        u = self.log_min + np.arange(self.rows) * self.step
+        v = np.arange(self.angles) * self.step
+        points = self.center + np.exp(u[:, None] + 1j * v[None, :])
+        self.strip = count_points(
+            points.ravel(),
+            self.c,
+            self.max_iter,
+            empty_counts(points.size, self.max_iter, self.dtype),
+            julia=self.julia,
+            num_threads=self.num_threads,
+            interior_check=True,
+            periodicity_check=True,
+        )
+        self.strip = np.asarray(self.strip).reshape(points.shape)
+        for index in range(self.core, self.frames):
+            size = self.pixel_size(index)
+            self.direct_frames[index] = render(
+                self.center.real + self._offsets(self.width) * size,
+                self.center.imag + self._offsets(self.height) * size,
+                self.c,
+                self.max_iter,
+                empty_counts((self.height, self.width), self.max_iter, self.dtype),
+                julia=self.julia,
+                num_threads=self.num_threads,
+                interior_check=True,
+                periodicity_check=True,
+            )
+        _logger.debug(
+            f"Exponential map of {self.rows}x{self.angles} pixels and {self.direct} "
+            f"direct frames, {self.pixels / (self.width * self.height):.1f} frames "
+            f"of pixels for {self.frames} frames."
+        )
+        return self
+
+    def frame(self, index: int) -> np.ndarray:
+        """Counts of a frame.
+
+        Parameters
+        ----------
+        index : int
+            Number of the frame.
+
+        Returns
+        -------
+        np.ndarray
+            Counts of shape `(height, width)`.
+        """
+        if self.strip is None:
+            raise RuntimeError("render must be called before frame")
+        if index in self.direct_frames:
+            return np.asarray(self.direct_frames[index])
+        size = self.pixel_size(index)
+        shift = (math.log(size) - self.log_min) / self.step
+        rows = np.rint(self._log_radius + shift).astype(np.intp)
+        np.clip(rows, 0, self.rows - 1, out=rows)
+        out = self.strip[rows, self._cols]
+
+        # The centre comes from the nearest pixels of the first direct frame.
+        core = np.asarray(self.direct_frames[self.core])
+        scale = size / self.pixel_size(self.core)
+        cols = np.rint(self._offsets(self.width) * scale + self.width / 2 - 0.5)
+        rows = np.rint(self._offsets(self.height) * scale + self.height / 2 - 0.5)
+        i = np.flatnonzero((cols >= 0) & (cols < self.width))
+        j = np.flatnonzero((rows >= 0) & (rows < self.height))
+        if i.size and j.size:
+            out[j[0] : j[-1] + 1, i[0] : i[-1] + 1] = core[
+                np.ix_(rows[j].astype(np.intp), cols[i].astype(np.intp))
+            ]
+        return out
+
+
+def zoom_video(
+    center: complex,
+    radius: float = 2.0,
+    zoom: float = 1e6,
+    frames: int = 300,
+    width: int = 640,
+    height: int = 360,
+    max_iter: int = 1000,
+    output: Optional[str] = FRAME_PATTERN,
+    raw: Optional[Union[str, os.PathLike, BinaryIO]] = None,
+    julia: bool = False,
+    c: complex = 0j,
+    direct: int = 1,
+    workers: int = 0,
+    num_threads: int = 0,
+    dtype: Optional[np.dtype] = None,
+    cmap: str = "inferno",
+) -> ExpMapZoom:
+    """Render a zoom video from an exponential map of its centre.
+
+    Parameters
+    ----------
+    center : complex
+        Point zoomed into.
+    radius : float
+        Half-width of the first frame.
+    zoom : float
+        Zoom factor between the first and the last frames.
+    frames : int
+        Number of frames.
+    width : int
+        Width of the frames, in pixels.
+    height : int
+        Height of the frames, in pixels.
+    max_iter : int
+        Maximum number of iterations.
+    output : Optional[str]
+        Pattern of the paths of the PNG frames, formatted with the frame number. No
+        PNG is written if None.
+    raw : Optional[Union[str, os.PathLike, BinaryIO]]
+        Path or binary file object receiving the frames in order as raw RGB24
+        video, as read by ``ffmpeg -f rawvideo -pix_fmt rgb24 -s WIDTHxHEIGHT``.
+    julia : bool
+        Zoom into the Julia set of `c` instead of the Mandelbrot set.
+    c : complex
+        Julia constant, ignored for the Mandelbrot set.
+    direct : int
+        Number of last frames rendered directly.
+    workers : int
+        Number of frames reprojected, coloured and encoded at once, all the available
+        threads if 0.
+    num_threads : int
+        Number of threads computing the map and colouring each frame, all the
+        available ones if 0.
+    dtype : Optional[np.dtype]
+        Type of the counts, as in `_fast_mandelbrot`.
+    cmap : str
+        Name of the matplotlib colormap.
+
+    Returns
+    -------
+    ExpMapZoom
+        The rendered zoom.
+    """
+    if output is None and raw is None:
+        raise ValueError("output or raw must be given")
+    workers = workers or max_threads()
+    exp_map = ExpMapZoom(
+        center,
+        radius,
+        zoom,
+        frames,
+        width,
+        height,
+        max_iter,
+        julia,
+        c,
+        dtype,
+        direct,
+        num_threads=num_threads,
+    ).render()
+
+    def reproject(index: int) -> np.ndarray:
+        rgb = _colorize(exp_map.frame(index), cmap, num_threads, (0, max_iter))
+        if output is not None:
+            _write_png(output.format(index), rgb)
+        return rgb
+
+    own = raw is not None and not hasattr(raw, "write")
+    stream = open(raw, "wb") if own else raw
+    try:
+        with ThreadPoolExecutor(workers) as executor:
+            # Only a few frames are reprojected ahead of the one being written.
+            pending = collections.deque()
+            for index in range(frames):
+                pending.append(executor.submit(reproject, index))
+                if len(pending) > 2 * workers:
+                    _write_frame(stream, pending.popleft().result())
+            while pending:
+                _write_frame(stream, pending.popleft().result())
+    finally:
+        if own:
+            stream.close()
+    return exp_map
+
+
+def _parse_zoom_args(args: List[str]) -> argparse.Namespace:
+    """Parse the command line arguments of the zoom video CLI.
+
+    Parameters
+    ----------
+    args : List[str]
+        Raw arguments from the shell call.
+
+    Returns
+    -------
+    argparse.Namespace
+        Parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Zoom video rendering CLI.")
+    parser.add_argument(
+        "--center",
+        help="Point zoomed into (ex: --center=-0.743643887037151+0.131825904205330j).",
+        type=complex,
+        default=-0.743643887037151 + 0.131825904205330j,
+    )
+    parser.add_argument(
+        "--radius",
+        help="Half-width of the first frame.",
+        type=float,
+        default=2.0,
+    )
+    parser.add_argument(
+        "--zoom",
+        help="Zoom factor between the first and the last frames.",
+        type=float,
+        default=1e6,
+    )
+    parser.add_argument(
+        "-n", "--frames", help="Number of frames.", type=int, default=300
+    )
+    parser.add_argument(
+        "--size",
+        help="Width and height of the frames, in pixels (ex: --size 640x360).",
+        type=lambda text: tuple(int(n) for n in text.split("x")),
+        default=(640, 360),
+    )
+    parser.add_argument(
+        "--max-iter",
+        help="Number of iterations to generate the sets.",
+        type=int,
+        default=1000,
+    )
+    parser.add_argument(
+        "--julia",
+        help="Zoom into the Julia set of this constant instead of the Mandelbrot set.",
+        type=complex,
+        default=None,
+    )
+    parser.add_argument(
+        "--direct",
+        help="Number of last frames rendered directly.",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        help="Number of frames reprojected at once, all the available threads if 0.",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Pattern of the paths of the PNG frames, formatted with the frame number.",
+        type=str,
+        default=FRAME_PATTERN,
+    )
+    parser.add_argument(
+        "--raw",
+        help="Write the frames as raw RGB24 video to this file, or to the standard "
+        "output if '-', instead of PNG files (ex: --raw - | ffmpeg -f rawvideo "
+        "-pix_fmt rgb24 -s 640x360 -i - out.mp4).",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "-d",
+        "--debug",
+        help="Set logging level to DEBUG",
+        action="store_const",
+        dest="loglevel",
+        const=logging.DEBUG,
+        default=logging.WARNING,
+    )
+    return parser.parse_args(args)
+
+
+def _zoom_video_cli():
+    """Render a zoom video.
+    This function is meant to be called from the CLI.
+    """
+    args = _parse_zoom_args(sys.argv[1:])
+    _setup_logging(args.loglevel)
+    raw = args.raw
+    if raw == "-":
+        raw = sys.stdout.buffer
+    width, height = args.size
+    zoom_video(
+        args.center,
+        args.radius,
+        args.zoom,
+        args.frames,
+        width,
+        height,
+        args.max_iter,
+        None if raw is not None else args.output,
+        raw,
+        julia=args.julia is not None,
+        c=args.julia or 0j,
+        direct=args.direct,
+        workers=args.workers,
+    )
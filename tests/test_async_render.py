@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from julia_brot.async_render import AsyncRender, julia_async, mandelbrot_async
+from julia_brot.julia_set import _fast_julia, _generate_julia_img
+from julia_brot.mandelbrot_set import _fast_mandelbrot
+
+__author__ = "Charles Zablit"
+__copyright__ = "Charles Zablit"
+__license__ = "MIT"
+
+
+def test_async_render():
+    """Test that asynchronous renders match the blocking ones and report progress"""
+    reports = []
+
+    def progress(done, total):
+        reports.append((done, total))
+
+    async def run():
+        return await asyncio.gather(
+            mandelbrot_async(-2 - 1.5j, 1 + 1.5j, 0.01, 200, progress=progress),
+            julia_async(-0.8j, pixel_size=0.02, max_iter=100, image=True),
+        )
+
+    counts, img = asyncio.run(run())
+    np.testing.assert_array_equal(
+        counts, _fast_mandelbrot(-2 - 1.5j, 1 + 1.5j, 0.01, 200)
+    )
+    np.testing.assert_array_equal(
+        np.asarray(img),
+        np.asarray(_generate_julia_img(-0.8j, pixel_size=0.02, max_iter=100)),
+    )
+    assert reports and reports[-1] == (counts.size, counts.size)
+    assert [done for done, _ in reports] == sorted(done for done, _ in reports)
+
+
+def test_async_render_options():
+    """Test that the options of the caller override the defaults of the kernels"""
+    view = (-2 - 1.5j, 1 + 1.5j, 0.02, 100)
+    counts = asyncio.run(
+        mandelbrot_async(*view, interior_check=False, periodicity_check=False)
+    )
+    np.testing.assert_array_equal(counts, _fast_mandelbrot(*view))
+
+
+def test_async_render_iterate():
+    """Test that a render can be followed with async for, then awaited"""
+
+    async def run():
+        render = AsyncRender(-2 - 2j, 2 + 2j, 0.01, 300, julia=True, c=0.285 + 0.01j)
+        steps = [step async for step in render]
+        return steps, await render
+
+    steps, counts = asyncio.run(run())
+    assert steps[-1] == (counts.size, counts.size)
+    np.testing.assert_array_equal(
+        counts, _fast_julia(0.285 + 0.01j, -2 - 2j, 2 + 2j, 0.01, 300)
+    )
+
+
+def test_async_render_cancel():
+    """Test that cancelled renders stop their kernels within milliseconds"""
+    # Far too long to finish during the test.
+    view = (-0.75 - 0.1j, -0.73 + 0.1j, 1e-4, 200000)
+
+    async def run():
+        render = AsyncRender(*view, num_threads=1)
+        task = asyncio.ensure_future(render.result())
+        while not render.done:
+            await asyncio.sleep(0.005)
+        start = time.perf_counter()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        elapsed = time.perf_counter() - start
+        assert render.cancelled and render.done < render.total
+
+        # Cancelling the render itself cancels the tasks awaiting it.
+        other = AsyncRender(*view, num_threads=1)
+        other.start()
+        other.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await other
+        return elapsed
+
+    assert asyncio.run(run()) < 0.5
@@ -0,0 +1,57 @@
+import numpy as np
+
+from julia_brot.cache import TileCache
+from julia_brot.engine import render
+from julia_brot.mandelbrot_set import _generate_mandelbrot_img
+
+__author__ = "Charles Zablit"
+__copyright__ = "Charles Zablit"
+__license__ = "MIT"
+
+
+def test_cache_render(tmp_path):
+    """Test that cached viewports match a direct render on the lattice"""
+    cache = TileCache(tmp_path, tile_size=16)
+    counts = cache.render(False, 0, -1.5 - 0.6j, 0.3 + 0.7j, 0.05, 60)
+    x = np.arange(-30, -30 + counts.shape[1]) * 0.05
+    y = np.arange(-12, -12 + counts.shape[0]) * 0.05
+    reference = render(x, y, 0, 60, np.empty(counts.shape, dtype=counts.dtype))
+    np.testing.assert_array_equal(counts, reference)
+    assert cache.stats.hits == 0 and cache.stats.misses == len(cache)
+
+    # An overlapping viewport only renders the tiles it does not share.
+    tiles = len(cache)
+    shifted = cache.render(False, 0, -1.2 - 0.6j, 0.6 + 0.7j, 0.05, 60)
+    np.testing.assert_array_equal(shifted[:, : counts.shape[1] - 6], counts[:, 6:])
+    assert cache.stats.hits > 0
+    assert cache.stats.misses - tiles == len(cache) - tiles
+
+    # The cache persists across instances, and Julia sets get their own tiles.
+    cache = TileCache(tmp_path, tile_size=16)
+    np.testing.assert_array_equal(
+        cache.render(False, 0, -1.5 - 0.6j, 0.3 + 0.7j, 0.05, 60), counts
+    )
+    assert cache.stats.misses == 0
+    cache.render(True, -0.8j, -1.5 - 0.6j, 0.3 + 0.7j, 0.05, 60)
+    assert cache.stats.misses > 0
+
+
+def test_cache_eviction(tmp_path):
+    """Test that the least recently used tiles are evicted above the size limit"""
+    cache = TileCache(tmp_path, max_bytes=4000, tile_size=16)
+    cache.render(False, 0, -2 - 2j, 2 + 2j, 0.1, 20)
+    assert cache.stats.evictions > 0
+    assert cache.size <= 4000
+    assert sum(p.stat().st_size for p in tmp_path.glob("*.npy")) == cache.size
+    cache.clear()
+    assert len(cache) == 0 and not list(tmp_path.glob("*.npy"))
+
+
+def test_generate_img_cache(tmp_path):
+    """Test that images rendered through the cache match the direct render"""
+    # The viewport is already on the lattice of the multiples of the pixel size.
+    img = _generate_mandelbrot_img(-2 - 2j, 2 + 2j, 0.125, 30, cache=tmp_path)
+    np.testing.assert_array_equal(
+        np.asarray(img),
+        np.asarray(_generate_mandelbrot_img(-2 - 2j, 2 + 2j, 0.125, 30)),
+    )
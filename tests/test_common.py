@@ -0,0 +1,106 @@
+import subprocess
+import sys
+from unittest.mock import MagicMock
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from julia_brot.color import apply_lut, count_range
+from julia_brot.common import (
+    _colorize,
+    _flat_points,
+    _handle_img,
+    _normalize,
+    _parse_args,
+)
+from julia_brot.mandelbrot import fast_mandelbrot
+
+__author__ = "Charles Zablit"
+__copyright__ = "Charles Zablit"
+__license__ = "MIT"
+
+
+def _legacy_colorize(counts):
+    arr = 1 - _normalize(counts.astype(np.float32))
+    arr = plt.get_cmap("inferno")(arr)
+    return (arr[:, :, :3] * 255).astype(np.uint8)
+
+
+def test_colorize_matches_colormap():
+    """Test that the lookup table gives the same pixels as the colormap"""
+    counts = np.asarray(fast_mandelbrot(-2 - 2j, 2 + 2j, 0.02, 600))
+    np.testing.assert_array_equal(_colorize(counts), _legacy_colorize(counts))
+    counts = np.random.default_rng(0).integers(3, 70000, size=(50, 40), dtype=np.int32)
+    np.testing.assert_array_equal(_colorize(counts), _legacy_colorize(counts))
+
+
+def test_colorize_constant():
+    """Test that a constant image is coloured like the colormap does"""
+    counts = np.full((4, 5), 10, dtype=np.int32)
+    with np.errstate(invalid="ignore"):
+        np.testing.assert_array_equal(_colorize(counts), _legacy_colorize(counts))
+
+
+def test_apply_lut():
+    """Test the compiled lookup and range helpers"""
+    counts = np.array([[2, 3], [4, 2]], dtype=np.int32)
+    assert count_range(counts) == (2, 4)
+    lut = np.array([[1, 1], [2, 2], [3, 3]], dtype=np.uint8)
+    out = apply_lut(counts, lut, 2, np.empty((2, 2, 2), dtype=np.uint8))
+    np.testing.assert_array_equal(out[:, :, 0], counts - 1)
+    with pytest.raises(ValueError):
+        apply_lut(counts, lut, 3, np.empty((2, 2, 2), dtype=np.uint8))
+
+
+def test_colorize_smooth():
+    """Test the colouring of smooth counts"""
+    counts = np.asarray(fast_mandelbrot(-2 - 2j, 2 + 2j, 0.05, 100, dtype=np.float32))
+    rgb = _colorize(counts)
+    assert rgb.shape == counts.shape + (3,) and rgb.dtype == np.uint8
+    # The interior gets the first colour of the colormap, like with integer counts.
+    darkest = (np.array(plt.get_cmap("inferno")(0)[:3]) * 255).astype(np.uint8)
+    np.testing.assert_array_equal(rgb[counts == 100][0], darkest)
+    assert not _colorize(np.ones((2, 2), dtype=np.float32)).any()
+
+
+def test_lazy_imports():
+    """Test that importing and rendering do not pull in the heavy modules"""
+    code = (
+        "import sys, julia_brot\n"
+        "assert 'numpy' not in sys.modules and 'matplotlib' not in sys.modules\n"
+        "from julia_brot.mandelbrot_set import _generate_mandelbrot_img\n"
+        "assert 'matplotlib' not in sys.modules and 'PIL' not in sys.modules\n"
+        "_generate_mandelbrot_img(pixel_size=0.5, max_iter=10)\n"
+        "assert 'matplotlib.pyplot' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_handle_img_show(monkeypatch, tmp_path):
+    """Test that images are only shown when asked to or when a display exists"""
+    img = MagicMock()
+    monkeypatch.delenv("DISPLAY", raising=False)
+    monkeypatch.delenv("WAYLAND_DISPLAY", raising=False)
+    monkeypatch.setattr(sys, "platform", "linux")
+    _handle_img(img, tmp_path / "out.png")
+    img.save.assert_called_once()
+    img.show.assert_not_called()
+    _handle_img(img, None, show=True)
+    img.show.assert_called_once()
+    monkeypatch.setenv("DISPLAY", ":0")
+    _handle_img(img, None)
+    assert img.show.call_count == 2
+    _handle_img(img, None, show=False)
+    assert img.show.call_count == 2
+
+    assert _parse_args([], "Mandelbrot").show is None
+    assert _parse_args(["--no-show"], "Mandelbrot").show is False
+
+
+def test_flat_points():
+    """Test that contiguous complex arrays of points are not copied"""
+    points = np.zeros((3, 4), dtype=np.complex128)
+    assert np.shares_memory(_flat_points(points), points)
+    assert _flat_points(points.T).shape == (12,)
+    np.testing.assert_array_equal(_flat_points([1, 2j]), [1, 2j])
@@ -0,0 +1,100 @@
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from julia_brot.common import _parse_args
+from julia_brot.deep_zoom import deep_mandelbrot, parse_center, reference_orbit
+from julia_brot.engine import empty_counts, render
+
+__author__ = "Charles Zablit"
+__copyright__ = "Charles Zablit"
+__license__ = "MIT"
+
+# Point of the boundary of the Mandelbrot set, found by zooming on escaping pixels.
+CENTER = (
+    "-3648960829569528744328926314059558807/5316911983139663491615228241121378304",
+    "-31233857523726207308023172532691118617/106338239662793269832304564822427566080",
+)
+
+
+def _escape_count(c, max_iter, bits=256):
+    """Escape count of c computed in fixed-point arithmetic."""
+    cr, ci = round(c[0] * (1 << bits)), round(c[1] * (1 << bits))
+    zr = zi = 0
+    for n in range(max_iter):
+        zr2, zi2 = (zr * zr) >> bits, (zi * zi) >> bits
+        if zr2 + zi2 > 2 << bits:
+            return n
+        zr, zi = zr2 - zi2 + cr, ((zr * zi) >> (bits - 1)) + ci
+    return max_iter
+
+
+def test_parse_center():
+    """Test that centres are parsed without losing digits"""
+    digits = "-0.743643887037158704752191506114774"
+    assert parse_center(f"{digits}+0.1j") == (Fraction(digits), Fraction("0.1"))
+    assert parse_center((digits, "1e-3")) == (Fraction(digits), Fraction(1, 1000))
+    assert parse_center("(1-2.5e-1j)") == (1, Fraction(-1, 4))
+    assert parse_center("0.5j") == (0, Fraction(1, 2))
+    assert parse_center(-0.5 + 0.25j) == (Fraction(-1, 2), Fraction(1, 4))
+
+
+def test_reference_orbit():
+    """Test that the reference orbit stops once it escapes"""
+    assert reference_orbit((Fraction(1), Fraction(0)), 50, 64).tolist() == [0, 1, 2]
+    orbit = reference_orbit((Fraction(-1), Fraction(0)), 10, 64)
+    assert orbit.size == 11 and orbit[-1] == 0
+
+
+@pytest.mark.parametrize("series", [False, True])
+def test_deep_mandelbrot_shallow(series):
+    """Test that shallow deep zooms match the double precision kernel"""
+    x = -0.75 + (np.arange(120) - 59.5) * 1e-3
+    y = 0.1 + (np.arange(80) - 39.5) * 1e-3
+    expected = render(x, y, 0, 300, empty_counts((80, 120), 300))
+    counts = deep_mandelbrot("-0.75+0.1j", 1e-3, 120, 80, 300, series=series)
+    assert counts.dtype == expected.dtype
+    assert (counts != expected).mean() < 1e-3
+
+
+@pytest.mark.parametrize(
+    "series, precision",
+    [(False, "perturbation"), (True, "perturbation"), (False, "double-double")],
+)
+def test_deep_mandelbrot_deep(series, precision):
+    """Test deep zoom counts against an exact computation"""
+    pixel_size, width, height = 1e-15, 24, 16
+    counts = deep_mandelbrot(
+        CENTER, pixel_size, width, height, 2000, series=series, precision=precision
+    )
+    assert counts.min() < counts.max()
+    center = parse_center(CENTER)
+    rng = np.random.default_rng(0)
+    mismatches = 0
+    for _ in range(20):
+        i, j = int(rng.integers(width)), int(rng.integers(height))
+        c = (
+            center[0] + Fraction(2 * i - width + 1, 2) * Fraction(pixel_size),
+            center[1] + Fraction(2 * j - height + 1, 2) * Fraction(pixel_size),
+        )
+        mismatches += counts[j, i] != _escape_count(c, 2000)
+    # A few pixels of the chaotic regions may be off, like with the double kernel.
+    assert mismatches <= 2
+
+
+def test_deep_mandelbrot_invalid():
+    """Test that pixel sizes beyond the range of doubles are rejected"""
+    with pytest.raises(ValueError):
+        deep_mandelbrot(0, "1e-300", 4, 4, 10)
+    with pytest.raises(ValueError):
+        deep_mandelbrot(0, 1e-3, 4, 4, 10, precision="double")
+
+
+def test_deep_zoom_cli_flags(capsys):
+    """Test that the deep zoom CLI rejects the flags it cannot honour"""
+    argv = ["--center", "-0.75", "0.1", "--scale", "1e-20"]
+    assert _parse_args(argv, "Mandelbrot").center == ["-0.75", "0.1"]
+    with pytest.raises(SystemExit):
+        _parse_args(argv + ["--strips", "8", "--method", "mariani"], "Mandelbrot")
+    assert "--center does not support --method, --strips" in capsys.readouterr().err
@@ -0,0 +1,78 @@
+import threading
+
+import numpy as np
+import pytest
+
+from julia_brot.distributed import (
+    Coordinator,
+    _recv,
+    _socket,
+    distributed_render,
+    run_worker,
+)
+from julia_brot.julia_set import _fast_julia
+from julia_brot.mandelbrot_set import _fast_mandelbrot
+
+__author__ = "Charles Zablit"
+__copyright__ = "Charles Zablit"
+__license__ = "MIT"
+
+
+def _lose_tile(address):
+    """Connect like a worker, take a tile and disconnect without answering it."""
+    with _socket(address) as sock:
+        sock.connect(address)
+        assert _recv(sock)[0]["type"] == "tile"
+
+
+def test_distributed_render():
+    """Test that tiles computed by worker processes merge into the full image"""
+    counts = distributed_render(
+        zmin=-2 - 1.5j, zmax=1 + 1.5j, pixel_size=0.01, max_iter=200, tile_size=64
+    )
+    expected = _fast_mandelbrot(-2 - 1.5j, 1 + 1.5j, 0.01, 200)
+    np.testing.assert_array_equal(counts, expected)
+
+
+def test_coordinator_unix_socket(tmp_path):
+    """Test a Julia set render through a Unix socket, with a lost tile"""
+    path = str(tmp_path / "coordinator.sock")
+    with Coordinator(
+        True, -0.8j, pixel_size=0.05, max_iter=50, tile_size=16, address=path
+    ) as coordinator:
+        lost = threading.Thread(target=_lose_tile, args=(path,))
+        lost.start()
+
+        def work():
+            lost.join()
+            run_worker(path, 1)
+
+        worker = threading.Thread(target=work)
+        worker.start()
+        counts = coordinator.serve()
+        worker.join()
+        assert sum(coordinator._attempts.values()) == 1
+    np.testing.assert_array_equal(counts, _fast_julia(-0.8j, -2 - 2j, 2 + 2j, 0.05, 50))
+
+
+def test_coordinator_lost_tiles():
+    """Test that a tile lost by too many workers fails the render"""
+    with Coordinator(pixel_size=0.5, max_iter=10, max_attempts=2) as coordinator:
+        for _ in range(2):
+            threading.Thread(target=_lose_tile, args=(coordinator.address,)).start()
+        with pytest.raises(RuntimeError):
+            coordinator.serve()
+
+
+def test_coordinator_no_workers():
+    """Test that a render fails instead of waiting for workers which are gone"""
+    with pytest.raises(ValueError):
+        Coordinator(max_iter=600, dtype=np.uint8)
+    with Coordinator(pixel_size=0.5, max_iter=10) as coordinator:
+        with pytest.raises(RuntimeError, match="alive"):
+            coordinator.serve(alive=lambda: False)
+    with Coordinator(pixel_size=0.5, max_iter=10) as coordinator:
+        with pytest.raises(RuntimeError, match="seconds"):
+            coordinator.serve(idle_timeout=0.2)
+    with pytest.raises(RuntimeError, match="alive"):
+        distributed_render(pixel_size=0.5, max_iter=10, workers=0)
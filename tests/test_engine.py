@@ -0,0 +1,397 @@
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from julia_brot.engine import (
+    SIMD_LEVELS,
+    STATS,
+    _set_simd_level,
+    count_points,
+    dd_grid,
+    make_grid,
+    mirror_axis,
+    mirror_index,
+    render,
+    render_view,
+    simd_level,
+    use_double_double,
+)
+from julia_brot.mandelbrot import fast_mandelbrot
+
+__author__ = "Charles Zablit"
+__copyright__ = "Charles Zablit"
+__license__ = "MIT"
+
+
+def test_render_row_major():
+    """Test that `render` writes rows of constant imaginary part"""
+    x = np.arange(-2, 1, 0.05)
+    y = np.arange(-1, 1.5, 0.05)
+    out = render(x, y, 0, 50, np.empty((y.size, x.size), dtype=np.int32))
+    assert out.shape == (y.size, x.size)
+    np.testing.assert_array_equal(
+        out, np.asarray(fast_mandelbrot(-2 - 1j, 1 + 1.5j, 0.05, 50, symmetry=False))
+    )
+    # The set is symmetric about the real axis, so rows of opposite y match.
+    j = np.argmin(np.abs(y - 0.5))
+    k = np.argmin(np.abs(y + 0.5))
+    np.testing.assert_array_equal(out[j], out[k])
+
+
+@pytest.mark.parametrize("tile_size", [1, 7, 64, 1000])
+def test_render_tile_size(tile_size):
+    """Test that the tiling does not change the result"""
+    x = np.linspace(-2, 2, 101)
+    y = np.linspace(-2, 2, 77)
+    reference = render(x, y, -0.8j, 40, np.empty((77, 101), dtype=np.int32), julia=True)
+    out = render(
+        x,
+        y,
+        -0.8j,
+        40,
+        np.empty((77, 101), dtype=np.int32),
+        julia=True,
+        tile_size=tile_size,
+    )
+    np.testing.assert_array_equal(out, reference)
+
+
+def test_render_invalid():
+    """Test that `render` rejects inconsistent buffers"""
+    x = np.linspace(-2, 2, 10)
+    with pytest.raises(ValueError):
+        render(x, x, 0, 10, np.empty((10, 9), dtype=np.int32))
+    with pytest.raises(ValueError):
+        render(x, x, 0, 10, np.empty((10, 10), dtype=np.int32), tile_size=0)
+
+
+@pytest.mark.parametrize("julia", [False, True])
+@pytest.mark.parametrize("dtype", [np.uint16, np.float32])
+def test_render_mariani(julia, dtype):
+    """Test that the Mariani-Silver method agrees with computing every pixel"""
+    x = np.linspace(-2, 2, 203)
+    y = np.linspace(-1.5, 1.5, 150)
+    c = -0.123 + 0.745j
+    reference = render(x, y, c, 500, np.empty((150, 203), dtype=dtype), julia=julia)
+    for exact in (False, True):
+        out = render(
+            x,
+            y,
+            c,
+            500,
+            np.empty((150, 203), dtype=dtype),
+            julia=julia,
+            method="mariani",
+            exact=exact,
+            tile_size=37,
+        )
+        assert np.mean(out != reference) < 1e-3
+    with pytest.raises(ValueError):
+        render(x, y, c, 500, np.empty((150, 203), dtype=dtype), method="boundary")
+
+
+def test_render_mariani_fill():
+    """Test that a region of uniform count is filled"""
+    x = np.linspace(-0.3, 0.1, 64)
+    out = render(x, x, 0, 100, np.zeros((64, 64), dtype=np.uint8), method="mariani")
+    assert (out == 100).all()
+
+
+def test_double_double_selection():
+    """Test that double-double precision is only used for deep pixel sizes"""
+    assert not use_double_double(-2 - 2j, 2 + 2j, 1e-3)
+    assert use_double_double(-0.75 + 0.1j, -0.75 + 0.1000001j, 1e-15)
+    assert use_double_double(-2 - 2j, 2 + 2j, 1e-3, "double-double")
+    with pytest.raises(ValueError):
+        use_double_double(-2 - 2j, 2 + 2j, 1e-3, "quad")
+
+
+def test_dd_grid():
+    """Test that double-double grids are exact"""
+    hi, lo = dd_grid(0.1, 1e-17, 5, 1e-18)
+    for i in range(5):
+        expected = Fraction(0.1) + Fraction(1e-18) + i * Fraction(1e-17)
+        assert abs(Fraction(hi[i]) + Fraction(lo[i]) - expected) < 1e-32
+
+
+@pytest.mark.parametrize("julia", [False, True])
+def test_render_double_double(julia):
+    """Test that double-double kernels match double ones at shallow zooms"""
+    x = np.linspace(-2, 1, 61)
+    y = np.linspace(-1.5, 1.5, 41)
+    expected = render(x, y, -0.8j, 80, np.empty((41, 61), np.int32), julia=julia)
+    out = render(
+        x,
+        y,
+        -0.8j,
+        80,
+        np.empty((41, 61), np.int32),
+        julia=julia,
+        interior_check=True,
+        periodicity_check=True,
+        x_lo=np.zeros(61),
+        y_lo=np.zeros(41),
+    )
+    np.testing.assert_array_equal(out, expected)
+
+
+@pytest.mark.parametrize("julia", [False, True])
+@pytest.mark.parametrize(
+    "zmin, zmax",
+    [
+        (-2 - 2j, 2 + 2j),
+        (-2.01 - 1.01j, 1.5 + 0.5j),
+        (-1.5 - 0.3j, 1 + 1.2j),
+        (-0.5 - 1j, 2 + 1.5j),
+        (-2 + 0.2j, 1 + 1.5j),
+    ],
+)
+def test_render_view_symmetry(julia, zmin, zmax):
+    """Test that mirrored counts match computed ones on the snapped grid"""
+    x, y, _, _ = make_grid(zmin, zmax, 0.02, snap_x=julia, snap_y=True)
+    expected = render(
+        x, y, -0.8 + 0.156j, 100, np.empty((y.size, x.size), np.float32), julia=julia
+    )
+    counts = render_view(
+        zmin, zmax, 0.02, -0.8 + 0.156j, 100, dtype=np.float32, julia=julia
+    )
+    np.testing.assert_array_equal(counts, expected)
+    k = mirror_index(zmin.imag, 0.02, y.size)
+    rows = np.arange(max(0, k - y.size + 1), min(y.size, k + 1))
+    np.testing.assert_array_equal(y[k - rows], -y[rows])
+
+
+def test_render_view_output(tmp_path):
+    """Test that mirrored and computed views give the same kind of array"""
+    for symmetry in (False, True):
+        out = np.memmap(tmp_path / f"{symmetry}.dat", np.uint8, "w+", shape=(40, 40))
+        counts = render_view(-2 - 2j, 2 + 2j, 0.1, 0, 50, out=out, symmetry=symmetry)
+        assert type(counts) is np.ndarray
+        assert np.shares_memory(counts, out)
+
+
+def test_mirror_index():
+    """Test the detection of the axes overlapping their mirror image"""
+    assert mirror_index(-2, 0.5, 8) == 8
+    assert mirror_index(-0.25, 0.5, 2) == 1
+    assert mirror_index(0.5, 0.5, 4) == -1
+    assert mirror_index(-0.5, 0.5, 2) == -1
+    assert mirror_axis(3, 0.5, 4).tolist() == [-0.75, -0.25, 0.25, 0.75]
+
+
+@pytest.mark.parametrize("dd", [False, True])
+def test_render_stats(dd):
+    """Test the work counters of `render`"""
+    x = np.arange(-2, 1, 0.05)
+    y = np.arange(-1.5, 1.5, 0.05)
+    lo = dict(x_lo=np.zeros_like(x), y_lo=np.zeros_like(y)) if dd else {}
+    out = np.empty((y.size, x.size), dtype=np.int32)
+    stats = np.zeros(len(STATS), dtype=np.int64)
+    render(x, y, 0, 100, out, stats=stats, **lo)
+    pixels, iterations, escaped, shortcut = stats
+    assert pixels == out.size
+    assert iterations == out.sum()
+    assert escaped == np.count_nonzero(out < 100)
+    assert shortcut == 0
+
+    checked = np.zeros_like(stats)
+    render(
+        x,
+        y,
+        0,
+        100,
+        out,
+        interior_check=True,
+        periodicity_check=True,
+        stats=checked,
+        **lo,
+    )
+    assert checked[0] == pixels and checked[2] == escaped
+    assert 0 < checked[3] <= out.size - escaped
+    assert checked[1] < iterations
+
+    # The counters add up, and the Mariani-Silver method computes fewer pixels.
+    render(x, y, 0, 100, out, method="mariani", stats=checked, **lo)
+    assert pixels < checked[0] < 2 * pixels
+    with pytest.raises(ValueError):
+        render(x, y, 0, 100, out, stats=np.zeros(2, dtype=np.int64))
+
+
+@pytest.mark.parametrize("options", [{}, {"method": "mariani"}, {"adaptive": True}])
+def test_render_progress(options):
+    """Test that the progress counts every pixel and that cancelled renders stop"""
+    x = np.linspace(-2, 1, 150)
+    y = np.linspace(-1.2, 1.3, 100)
+    out = np.zeros((y.size, x.size), dtype=np.uint16)
+    progress = np.zeros(1, dtype=np.int64)
+    cancel = np.zeros(1, dtype=np.uint8)
+    options = dict(pixel_size=0.02, supersample=2, tile_size=16, **options)
+    render(x, y, 0, 100, out, progress=progress, cancel=cancel, **options)
+    passes = 2 if options.get("adaptive") else 1
+    assert progress[0] == passes * out.size
+
+    # A render cancelled before it starts leaves the counts untouched.
+    progress[:] = 0
+    cancel[:] = 1
+    out[:] = 0
+    render(x, y, 0, 100, out, progress=progress, cancel=cancel, **options)
+    assert progress[0] == 0 and not out.any()
+
+
+@pytest.fixture
+def simd_levels():
+    """Instruction sets supported by the machine, restoring the detected one."""
+    detected = simd_level()
+    yield SIMD_LEVELS[: SIMD_LEVELS.index(detected) + 1]
+    _set_simd_level(detected)
+
+
+@pytest.mark.parametrize("julia", [False, True])
+@pytest.mark.parametrize("dtype", [np.uint16, np.float32])
+@pytest.mark.parametrize("checks", [False, True])
+def test_render_vectorized(simd_levels, julia, dtype, checks):
+    """Test that the vectorized kernels compute the counts of the scalar ones"""
+    x = np.linspace(-2, 1, 301)
+    y = np.linspace(-1.2, 1.3, 203)
+    c = -0.8 + 0.156j
+    options = dict(interior_check=checks, periodicity_check=checks, tile_size=50)
+    expected = np.empty((y.size, x.size), dtype=dtype)
+    expected_stats = np.zeros(len(STATS), dtype=np.int64)
+    render(
+        x, y, c, 300, expected, julia, stats=expected_stats, vectorize=False, **options
+    )
+    for level in simd_levels:
+        _set_simd_level(level)
+        for single in [False, True]:
+            out = np.empty_like(expected)
+            stats = np.zeros_like(expected_stats)
+            render(x, y, c, 300, out, julia, stats=stats, single=single, **options)
+            if not single:
+                np.testing.assert_array_equal(out, expected)
+                np.testing.assert_array_equal(stats, expected_stats)
+            elif level != "none":
+                # Single precision only moves the counts near the boundary.
+                moved = np.abs(out.astype(np.float64) - expected) >= 1
+                assert np.mean(moved) < 0.05
+
+
+@pytest.mark.parametrize("julia", [False, True])
+@pytest.mark.parametrize("dtype", [np.uint16, np.float32])
+def test_count_points_vectorized(simd_levels, julia, dtype):
+    """Test that arbitrary points get the counts of the same points of a grid"""
+    x = np.linspace(-2, 1, 151)
+    y = np.linspace(-1.2, 1.3, 103)
+    c = -0.8 + 0.156j
+    options = dict(interior_check=True, periodicity_check=True)
+    expected = render(x, y, c, 300, np.empty((y.size, x.size), dtype=dtype), julia)
+    points = (x[None, :] + 1j * y[:, None]).ravel()
+    for level in simd_levels:
+        _set_simd_level(level)
+        out = np.empty(points.size, dtype=dtype)
+        count_points(points, c, 300, out, julia, **options)
+        np.testing.assert_array_equal(out.reshape(expected.shape), expected)
+
+
+def test_simd_level(simd_levels):
+    """Test the selection of the instruction set of the vectorized kernels"""
+    assert simd_level() in SIMD_LEVELS
+    _set_simd_level("none")
+    assert simd_level() == "none"
+    with pytest.raises(ValueError):
+        _set_simd_level("sse9")
+    if simd_levels[-1] != "avx512":
+        with pytest.raises(ValueError):
+            _set_simd_level("avx512")
+
+
+def test_single_precision():
+    """Test that single precision views mostly agree with double precision ones"""
+    double = np.asarray(fast_mandelbrot(-2 - 1.5j, 1 + 1.5j, 0.01, 200))
+    single = np.asarray(
+        fast_mandelbrot(-2 - 1.5j, 1 + 1.5j, 0.01, 200, precision="single")
+    )
+    assert single.shape == double.shape
+    assert np.mean(single == double) > 0.95
+
+
+@pytest.mark.parametrize("dtype", [np.uint16, np.float32])
+def test_render_supersample(dtype):
+    """Test that supersampling averages the samples around the pixels"""
+    pixel_size = 0.03
+    x = np.arange(-2, 1, pixel_size)
+    y = np.arange(-1.2, 1.2, pixel_size)
+    single = render(x, y, 0, 100, np.empty((y.size, x.size), dtype))
+    stats = np.zeros(len(STATS), dtype=np.int64)
+    full = render(
+        x,
+        y,
+        0,
+        100,
+        np.empty((y.size, x.size), dtype),
+        pixel_size=pixel_size,
+        supersample=3,
+        stats=stats,
+    )
+    assert stats[0] == 9 * full.size
+    # Anti-aliasing only moves the counts of the pixels near the boundary.
+    moved = np.abs(full.astype(np.float64) - single) >= 1
+    assert 0 < np.mean(moved) < 0.5
+    offsets = (np.arange(3) - 1) * pixel_size / 3
+    samples = np.empty((3, 3) + full.shape, dtype)
+    for sy, dy in enumerate(offsets):
+        for sx, dx in enumerate(offsets):
+            render(x + dx, y + dy, 0, 100, samples[sy, sx])
+    mean = samples.astype(np.float64).mean(axis=(0, 1))
+    if dtype == np.float32:
+        np.testing.assert_allclose(full, mean, rtol=1e-5)
+    else:
+        np.testing.assert_array_equal(full, np.round(mean))
+
+    # Only the pixels with a different neighbour are supersampled.
+    adaptive = render(
+        x,
+        y,
+        0,
+        100,
+        np.empty((y.size, x.size), dtype),
+        pixel_size=pixel_size,
+        supersample=3,
+        adaptive=True,
+    )
+    padded = np.pad(single.astype(np.float64), 1, mode="edge")
+    neighbours = [
+        padded[:-2, 1:-1],
+        padded[2:, 1:-1],
+        padded[1:-1, :-2],
+        padded[1:-1, 2:],
+    ]
+    threshold = 1 if dtype == np.float32 else 0.5
+    marks = np.any([np.abs(single - n) >= threshold for n in neighbours], axis=0)
+    assert 0 < np.mean(marks) < 1
+    np.testing.assert_array_equal(adaptive[marks], full[marks])
+    np.testing.assert_array_equal(adaptive[~marks], single[~marks])
+
+    with pytest.raises(ValueError):
+        render(x, y, 0, 100, np.empty((y.size, x.size), dtype), supersample=2)
+    with pytest.raises(ValueError):
+        render(x, y, 0, 100, np.empty((y.size, x.size), dtype), supersample=0)
+
+
+@pytest.mark.parametrize("julia", [False, True])
+def test_render_view_supersample_symmetry(julia):
+    """Test that supersampled views are mirrored exactly"""
+    options = dict(dtype=np.float32, julia=julia, supersample=2)
+    mirrored = render_view(-2 - 1.5j, 2 + 1.5j, 0.03, -0.8 + 0.156j, 100, **options)
+    x, y, _, _ = make_grid(-2 - 1.5j, 2 + 1.5j, 0.03, snap_x=julia, snap_y=True)
+    expected = render(
+        x,
+        y,
+        -0.8 + 0.156j,
+        100,
+        np.empty((y.size, x.size), np.float32),
+        julia=julia,
+        pixel_size=0.03,
+        supersample=2,
+    )
+    np.testing.assert_array_equal(mirrored, expected)
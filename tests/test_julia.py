@@ -1,9 +1,12 @@
 import pathlib
 from unittest.mock import patch
 
+import numpy as np
 import pytest
 
-from julia_brot import is_in_julia, plot_julia
+from julia_brot import is_in_julia, julia_escape_counts, plot_julia
+from julia_brot.julia import fast_julia
+from julia_brot.julia_set import _fast_julia
 
 __author__ = "Charles Zablit"
 __copyright__ = "Charles Zablit"
@@ -36,3 +39,56 @@ def test_plot_julia(mock_show, tmp_path: pathlib.Path):
         is None
     )
     assert figname.exists()
+
+
+def test_fast_julia_threads():
+    """Test that the scheduling options of `fast_julia` do not change the result"""
+    reference = np.asarray(fast_julia(-0.8 + 0.156j, -2 - 2j, 2 + 2j, 0.05, 50))
+    for schedule in ("static", "dynamic", "guided"):
+        arr = fast_julia(
+            -0.8 + 0.156j,
+            -2 - 2j,
+            2 + 2j,
+            0.05,
+            50,
+            num_threads=2,
+            schedule=schedule,
+            chunksize=3,
+        )
+        np.testing.assert_array_equal(np.asarray(arr), reference)
+    with pytest.raises(ValueError):
+        fast_julia(0, -2 - 2j, 2 + 2j, 0.05, 50, chunksize=0)
+    plot_julia(-0.8j, pixel_size=0.05, show=False, schedule="static", chunksize=4)
+    with pytest.raises(ValueError):
+        plot_julia(-0.8j, pixel_size=0.05, show=False, chunksize=0)
+
+
+def test_fast_julia_out():
+    """Test that `_fast_julia` fills a preallocated buffer without copying it"""
+    reference = np.asarray(fast_julia(-0.8j, -2 - 2j, 2 + 2j, 0.05, 100))
+    assert reference.dtype == np.uint8
+    buffer = np.empty(reference.shape, dtype=np.uint16)
+    arr = _fast_julia(-0.8j, -2 - 2j, 2 + 2j, 0.05, 100, out=buffer)
+    assert arr.base is buffer or arr is buffer
+    np.testing.assert_array_equal(arr, reference)
+    with pytest.raises(ValueError):
+        _fast_julia(-0.8j, -2 - 2j, 2 + 2j, 0.05, 100, out=buffer[1:])
+
+
+def test_is_in_julia_array():
+    """Test that checking arrays of points agrees with checking them one by one"""
+    rng = np.random.default_rng(1)
+    z = rng.uniform(-3, 3, 500) + 1j * rng.uniform(-3, 3, 500)
+    for max_iter in (0, 1, 10, 100):
+        inside = is_in_julia(z, c=-0.8 + 0.156j, max_iter=max_iter)
+        expected = [is_in_julia(p, c=-0.8 + 0.156j, max_iter=max_iter) for p in z]
+        np.testing.assert_array_equal(inside, expected)
+
+
+def test_julia_escape_counts():
+    """Test that the escape counts of points match the rendered ones"""
+    reference = np.asarray(fast_julia(-0.8j, -2 - 2j, 2 + 2j, 0.1, 60, symmetry=False))
+    x = np.arange(-2, 2, 0.1)
+    points = x[None, :] + 1j * x[:, None]
+    counts = julia_escape_counts(points, -0.8j, max_iter=60, num_threads=1)
+    np.testing.assert_array_equal(counts, reference)
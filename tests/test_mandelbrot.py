@@ -1,9 +1,19 @@
+import json
 import pathlib
 from unittest.mock import patch
 
+import numpy as np
 import pytest
 
-from julia_brot import is_in_mandelbrot, plot_mandelbrot
+from julia_brot import (
+    is_in_mandelbrot,
+    mandelbrot_escape_counts,
+    max_threads,
+    openmp_enabled,
+    plot_mandelbrot,
+)
+from julia_brot.mandelbrot import fast_mandelbrot
+from julia_brot.mandelbrot_set import _fast_mandelbrot, _plot_mandelbrot_cli
 
 __author__ = "Charles Zablit"
 __copyright__ = "Charles Zablit"
@@ -35,3 +45,156 @@ def test_plot_mandelbrot(mock_show, tmp_path: pathlib.Path):
         is None
     )
     assert figname.exists()
+
+
+def test_fast_mandelbrot_threads():
+    """Test that the scheduling options of `fast_mandelbrot` do not change the result"""
+    reference = np.asarray(fast_mandelbrot(-2 - 2j, 2 + 2j, 0.05, 50))
+    for schedule in ("static", "dynamic", "guided"):
+        arr = fast_mandelbrot(
+            -2 - 2j, 2 + 2j, 0.05, 50, num_threads=2, schedule=schedule, chunksize=3
+        )
+        np.testing.assert_array_equal(np.asarray(arr), reference)
+    with pytest.raises(ValueError):
+        fast_mandelbrot(-2 - 2j, 2 + 2j, 0.05, 50, schedule="auto")
+    plot_mandelbrot(pixel_size=0.05, show=False, schedule="guided", chunksize=2)
+    with pytest.raises(ValueError):
+        plot_mandelbrot(pixel_size=0.05, show=False, schedule="auto")
+    assert isinstance(openmp_enabled(), bool)
+    assert max_threads() >= 1
+
+
+def test_fast_mandelbrot_dtype():
+    """Test the output types and buffers of `fast_mandelbrot`"""
+    reference = np.asarray(fast_mandelbrot(-2 - 2j, 2 + 2j, 0.05, 300, dtype=np.int32))
+    arr = np.asarray(fast_mandelbrot(-2 - 2j, 2 + 2j, 0.05, 300))
+    assert arr.dtype == np.uint16
+    np.testing.assert_array_equal(arr, reference)
+    assert np.asarray(fast_mandelbrot(-2 - 2j, 2 + 2j, 0.05, 255)).dtype == np.uint8
+    with pytest.raises(ValueError):
+        fast_mandelbrot(-2 - 2j, 2 + 2j, 0.05, 300, dtype=np.uint8)
+    with pytest.raises(TypeError):
+        fast_mandelbrot(-2 - 2j, 2 + 2j, 0.05, 300, dtype=np.float64)
+
+    smooth = _fast_mandelbrot(-2 - 2j, 2 + 2j, 0.05, 300, dtype=np.float32)
+    assert smooth.dtype == np.float32
+    assert np.all(smooth > reference - 2) and np.all(smooth <= reference)
+
+    buffer = np.zeros(reference.shape, dtype=np.int32)
+    arr = _fast_mandelbrot(-2 - 2j, 2 + 2j, 0.05, 300, out=memoryview(buffer))
+    assert np.shares_memory(arr, buffer)
+    np.testing.assert_array_equal(buffer, reference)
+
+
+def test_is_in_mandelbrot_array():
+    """Test that checking arrays of points agrees with checking them one by one"""
+    rng = np.random.default_rng(0)
+    c = rng.uniform(-2.5, 1, (20, 30)) + 1j * rng.uniform(-1.5, 1.5, (20, 30))
+    for max_iter in (0, 1, 10, 100):
+        inside = is_in_mandelbrot(c, max_iter=max_iter)
+        assert inside.shape == c.shape and inside.dtype == np.bool_
+        expected = [is_in_mandelbrot(complex(p), max_iter=max_iter) for p in c.flat]
+        np.testing.assert_array_equal(inside.ravel(), expected)
+    assert is_in_mandelbrot([0.251], max_iter=100).tolist() == [False]
+
+
+def test_mandelbrot_escape_counts():
+    """Test that the escape counts of points match the rendered ones"""
+    reference = np.asarray(fast_mandelbrot(-2 - 2j, 2 + 2j, 0.1, 100, symmetry=False))
+    x = np.arange(-2, 2, 0.1)
+    points = x[None, :] + 1j * x[:, None]
+    counts = mandelbrot_escape_counts(points, max_iter=100)
+    assert counts.dtype == np.uint8
+    np.testing.assert_array_equal(counts, reference)
+    counts = mandelbrot_escape_counts(points.T, max_iter=100, dtype=np.float32)
+    np.testing.assert_array_equal(counts.T == 100, reference == 100)
+
+
+@pytest.mark.parametrize(
+    "zmin, zmax, pixel_size",
+    [
+        (-2 - 2j, 2 + 2j, 0.02),
+        (-0.8 - 0.2j, -0.6 + 0.0j, 0.002),
+        (0.24 - 1e-3j, 0.26 + 1e-3j, 1e-4),
+    ],
+)
+def test_fast_mandelbrot_shortcuts(zmin, zmax, pixel_size):
+    """Test that the interior shortcuts do not change the counts"""
+    reference = np.asarray(
+        fast_mandelbrot(
+            zmin,
+            zmax,
+            pixel_size,
+            3000,
+            interior_check=False,
+            periodicity_check=False,
+        )
+    )
+    for interior_check, periodicity_check in (
+        (True, False),
+        (False, True),
+        (True, True),
+    ):
+        arr = fast_mandelbrot(
+            zmin,
+            zmax,
+            pixel_size,
+            3000,
+            interior_check=interior_check,
+            periodicity_check=periodicity_check,
+        )
+        np.testing.assert_array_equal(np.asarray(arr), reference)
+
+
+@patch("PIL.Image.Image.show")
+def test_plot_mandelbrot_profile(mock_show, tmp_path: pathlib.Path, capsys):
+    """Test the profile of `plot_mandelbrot` and of the CLI"""
+    profile = plot_mandelbrot(
+        pixel_size=0.01, max_iter=100, figname=tmp_path / "m.png", profile=True
+    )
+    assert list(profile.stages) == [
+        "grid",
+        "kernel",
+        "mirror",
+        "range",
+        "lut",
+        "colour",
+        "image",
+        "encode",
+    ]
+    assert profile.stages["grid"].allocated_bytes >= 400 * 400
+    # The bottom half of the view is mirrored.
+    assert profile.counter("pixels") == 400 * 201
+    assert profile.counter("escaped") + profile.counter("shortcut") <= 400 * 201
+
+    output = tmp_path / "profile.json"
+    argv = ["MandelBrotPlot", "--pixel_size", "0.05", "--no-show", "-o"]
+    argv += [str(tmp_path / "cli.png"), "--profile", str(output)]
+    with patch("sys.argv", argv):
+        _plot_mandelbrot_cli()
+    assert "kernel" in capsys.readouterr().err
+    report = json.loads(output.read_text())
+    assert report["counters"]["pixels"] == 80 * 41
+    assert [stage["name"] for stage in report["stages"]][:2] == ["grid", "kernel"]
+
+
+@patch("PIL.Image.Image.show")
+def test_plot_mandelbrot_supersample(mock_show, tmp_path: pathlib.Path):
+    """Test the supersampled plots, from the API and the CLI"""
+    profile = plot_mandelbrot(
+        pixel_size=0.05,
+        max_iter=50,
+        figname=tmp_path / "m.png",
+        profile=True,
+        supersample=2,
+    )
+    # Four samples per computed pixel, the bottom half of the view being mirrored.
+    assert profile.counter("pixels") == 4 * 80 * 41
+    with pytest.raises(ValueError):
+        plot_mandelbrot(pixel_size=0.05, cache=tmp_path / "cache", supersample=2)
+
+    argv = ["MandelBrotPlot", "--pixel_size", "0.05", "--no-show", "-o"]
+    argv += [str(tmp_path / "cli.png"), "--supersample", "3", "--adaptive"]
+    with patch("sys.argv", argv):
+        _plot_mandelbrot_cli()
+    assert (tmp_path / "cli.png").exists()
@@ -0,0 +1,80 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from julia_brot.julia_set import _fast_julia, _plot_julia_cli
+from julia_brot.mandelbrot_set import (
+    _fast_mandelbrot,
+    _generate_mandelbrot_img,
+    _plot_mandelbrot_cli,
+)
+from julia_brot.progressive import progressive_julia, progressive_mandelbrot
+
+__author__ = "Charles Zablit"
+__copyright__ = "Charles Zablit"
+__license__ = "MIT"
+
+
+@pytest.mark.parametrize("steps", [(4, 2, 1), (8, 2, 1), (3, 1), (1,)])
+def test_progressive_mandelbrot(steps):
+    """Test that the last pass matches a direct render and reuses the earlier ones"""
+    view = (-2 - 1.3j, 0.7 + 1.1j, 0.0107, 300)
+    expected = _fast_mandelbrot(*view)
+    previews = list(progressive_mandelbrot(*view, steps=steps))
+    assert [step for step, _ in previews] == list(steps)
+    accuracy = []
+    for step, preview in previews:
+        assert preview.shape == expected.shape
+        # At least the pixels of the sub-grid of the pass are final.
+        accuracy.append(np.mean(preview == expected))
+        assert accuracy[-1] >= 1 / step**2
+    assert accuracy == sorted(accuracy)
+    np.testing.assert_array_equal(previews[-1][1], expected)
+
+
+def test_progressive_julia():
+    """Test the progressive renders of Julia sets, in every precision"""
+    c = -0.8 + 0.156j
+    view = (-1.6 - 1j, 1.3 + 0.7j, 0.0093, 300)
+    for dtype in (None, np.float32):
+        *_, (step, counts) = progressive_julia(c, *view, dtype=dtype)
+        assert step == 1
+        np.testing.assert_array_equal(counts, _fast_julia(c, *view, dtype=dtype))
+
+    deep = (-0.75 - 1e-13j, -0.75 + 1e-13j, 1e-15, 300)
+    *_, (_, counts) = progressive_mandelbrot(*deep)
+    np.testing.assert_array_equal(counts, _fast_mandelbrot(*deep))
+
+    with pytest.raises(ValueError):
+        next(progressive_julia(c, *view, steps=(4, 3, 1)))
+    with pytest.raises(ValueError):
+        next(progressive_julia(c, *view, steps=(4, 2)))
+
+
+def test_progressive_previews_cli(tmp_path):
+    """Test that the CLIs save the coarse previews and the full image"""
+    previews = progressive_mandelbrot(pixel_size=0.05, max_iter=50, image=True)
+    *_, (_, img) = previews
+    np.testing.assert_array_equal(
+        np.asarray(img),
+        np.asarray(_generate_mandelbrot_img(pixel_size=0.05, max_iter=50)),
+    )
+
+    for cli, name in [
+        (_plot_mandelbrot_cli, "MandelBrotPlot"),
+        (_plot_julia_cli, "JuliaPlot"),
+    ]:
+        pattern = str(tmp_path / f"{cli.__name__}_{{}}.png")
+        argv = [name, "--pixel_size", "0.05", "--no-show", "-o"]
+        argv += [pattern.format("full"), "--previews", pattern]
+        if cli is _plot_julia_cli:
+            argv += ["-c", "0.285+0.01j"]
+        with patch("sys.argv", argv):
+            cli()
+        for step in ("4", "2", "full"):
+            assert Image.open(pattern.format(step)).size == (80, 80)
+        with patch("sys.argv", argv + ["--method", "mariani"]):
+            with pytest.raises(ValueError):
+                cli()
@@ -0,0 +1,77 @@
+import asyncio
+import io
+
+import numpy as np
+from PIL import Image
+
+from julia_brot.common import _colorize
+from julia_brot.julia_set import _fast_julia
+from julia_brot.server import TileServer
+
+__author__ = "Charles Zablit"
+__copyright__ = "Charles Zablit"
+__license__ = "MIT"
+
+
+async def _get(port, target):
+    """Send a GET request, returning the status and the body of the response."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {target} HTTP/1.1\r\nConnection: close\r\n\r\n".encode())
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), body
+
+
+def _serve(tiles, *targets):
+    """Request targets concurrently from a running server."""
+
+    async def run():
+        server = await tiles.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await asyncio.gather(*(_get(port, t) for t in targets))
+
+    return asyncio.run(run())
+
+
+def test_tile_server(tmp_path):
+    """Test tiles, the coalescing of concurrent requests and the metrics"""
+    tiles = TileServer(tmp_path, workers=2)
+    target = "/julia/1/0/1.png?c=-0.8%2B0.156j&max_iter=50"
+    responses = _serve(tiles, target, target, target, "/mandelbrot/0/0/0.png")
+    assert [status for status, _ in responses] == [200] * 4
+    assert responses[0][1] == responses[1][1] == responses[2][1]
+    assert tiles.stats.renders == 2 and tiles.stats.coalesced == 2
+    # The bottom left quarter of the level 0 square, rows going downwards.
+    counts = _fast_julia(-0.8 + 0.156j, -2 - 2j, -1 / 256 - 1j / 256, 1 / 128, 50)
+    expected = _colorize(counts[::-1], bounds=(0, 50))
+    image = np.asarray(Image.open(io.BytesIO(responses[0][1])))
+    np.testing.assert_array_equal(image, expected)
+
+    (status, _), (_, metrics) = _serve(tiles, target, "/metrics")
+    assert status == 200 and tiles.stats.memory_hits == 1
+    assert b"julia_brot_renders_total 2" in metrics
+    assert b'julia_brot_tile_latency_seconds_bucket{le="+Inf"} 5' in metrics
+    tiles.close()
+
+    # A new server finds the counts in the disk cache.
+    tiles = TileServer(tmp_path)
+    assert _serve(tiles, target)[0] == responses[0]
+    assert tiles.cache.stats.hits == 1
+    tiles.close()
+
+
+def test_tile_server_errors():
+    """Test the answers to invalid requests"""
+    tiles = TileServer()
+    responses = _serve(
+        tiles,
+        "/mandelbrot/1/2/0.png",
+        "/sierpinski/0/0/0.png",
+        "/mandelbrot/0/0/0.png?max_iter=0",
+        "/julia/0/0/0.png?c=abc",
+    )
+    assert [status for status, _ in responses] == [404, 404, 400, 400]
+    assert tiles.stats.errors == 4
+    tiles.close()
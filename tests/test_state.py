@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from julia_brot.julia_set import _fast_julia
+from julia_brot.mandelbrot_set import _fast_mandelbrot, _generate_mandelbrot_img
+from julia_brot.state import IterationState
+
+__author__ = "Charles Zablit"
+__copyright__ = "Charles Zablit"
+__license__ = "MIT"
+
+
+def test_state_mandelbrot():
+    """Test that resumed Mandelbrot counts match fresh renders"""
+    state = IterationState(False, 0, -2 - 1.5j, 1 + 1.5j, 0.02)
+    active = state.active
+    for max_iter in (10, 50, 300, 1000):
+        counts = state.advance(max_iter)
+        np.testing.assert_array_equal(
+            counts, _fast_mandelbrot(-2 - 1.5j, 1 + 1.5j, 0.02, max_iter)
+        )
+        assert counts.dtype == _fast_mandelbrot(0, 0.1, 0.1, max_iter).dtype
+        assert state.active < active
+        active = state.active
+    with pytest.raises(ValueError):
+        state.advance(100)
+
+
+def test_state_julia_smooth(tmp_path):
+    """Test that Julia states are resumed after a save to disk"""
+    state = IterationState(True, -0.8j, -2 - 1j, 2 + 1j, 0.02, dtype=np.float32)
+    state.advance(20)
+    state.save(tmp_path / "state.npz")
+    state = IterationState.load(tmp_path / "state.npz")
+    assert state.max_iter == 20
+    np.testing.assert_array_equal(
+        state.advance(100),
+        _fast_julia(-0.8j, -2 - 1j, 2 + 1j, 0.02, 100, dtype=np.float32),
+    )
+
+
+def test_generate_img_resume(tmp_path):
+    """Test that images resumed from a state file match the direct render"""
+    path = tmp_path / "state.npz"
+    _generate_mandelbrot_img(-2 - 2j, 2 + 2j, 0.05, 20, resume=path)
+    assert IterationState.load(path).max_iter == 20
+    img = _generate_mandelbrot_img(-2 - 2j, 2 + 2j, 0.05, 80, resume=path)
+    np.testing.assert_array_equal(
+        np.asarray(img), np.asarray(_generate_mandelbrot_img(-2 - 2j, 2 + 2j, 0.05, 80))
+    )
+    # Another viewport starts over.
+    img = _generate_mandelbrot_img(-1 - 1j, 1 + 1j, 0.05, 40, resume=path)
+    assert IterationState.load(path).zmin == -1 - 1j
@@ -0,0 +1,81 @@
+import io
+import tempfile
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from julia_brot.common import _colorize
+from julia_brot.julia_set import _fast_julia
+from julia_brot.mandelbrot_set import _generate_mandelbrot_img, _plot_mandelbrot_cli
+from julia_brot.stream import PngWriter, stream_render
+
+__author__ = "Charles Zablit"
+__copyright__ = "Charles Zablit"
+__license__ = "MIT"
+
+
+@pytest.mark.parametrize("strip_height", [1, 17, 1000])
+def test_stream_render(tmp_path, strip_height):
+    """Test that streamed images match the ones rendered at once"""
+    png, rgb, counts = tmp_path / "out.png", tmp_path / "out.npy", tmp_path / "c.npy"
+    size = stream_render(
+        png,
+        rgb,
+        zmin=-2 - 1.5j,
+        zmax=1 + 1.5j,
+        pixel_size=0.02,
+        max_iter=80,
+        strip_height=strip_height,
+        counts=counts,
+    )
+    expected = np.asarray(_generate_mandelbrot_img(-2 - 1.5j, 1 + 1.5j, 0.02, 80))
+    assert size == (expected.shape[1], expected.shape[0])
+    np.testing.assert_array_equal(np.asarray(Image.open(png)), expected)
+    np.testing.assert_array_equal(np.load(rgb, mmap_mode="r"), expected)
+    assert np.load(counts).max() == 80
+
+
+def test_stream_render_julia_smooth():
+    """Test streaming smooth counts of a Julia set to a file object"""
+    buffer = io.BytesIO()
+    stream_render(
+        buffer,
+        julia=True,
+        c=-0.8j,
+        pixel_size=0.05,
+        max_iter=50,
+        strip_height=7,
+        dtype=np.float32,
+    )
+    counts = _fast_julia(-0.8j, -2 - 2j, 2 + 2j, 0.05, 50, dtype=np.float32)
+    np.testing.assert_array_equal(
+        np.asarray(Image.open(io.BytesIO(buffer.getvalue()))), _colorize(counts)
+    )
+
+
+def test_stream_render_temporary_counts(tmp_path):
+    """Test that the temporary counts go next to the image and are removed"""
+    png = tmp_path / "out.png"
+    with patch("tempfile.mkstemp", wraps=tempfile.mkstemp) as mkstemp:
+        stream_render(png, pixel_size=0.1, max_iter=20)
+    assert mkstemp.call_args.kwargs["dir"] == str(tmp_path)
+    assert [path.name for path in tmp_path.iterdir()] == ["out.png"]
+
+    argv = ["MandelBrotPlot", "--pixel_size", "0.1", "--strips", "8", "-o", str(png)]
+    for flag in (["--cache", str(tmp_path)], ["--resume", "state.npz"], ["--show"]):
+        with patch("sys.argv", argv + flag):
+            with pytest.raises(ValueError):
+                _plot_mandelbrot_cli()
+
+
+def test_png_writer_rows():
+    """Test that `PngWriter` rejects images with missing or extra rows"""
+    rows = np.zeros((2, 4, 3), dtype=np.uint8)
+    writer = PngWriter(io.BytesIO(), 4, 3)
+    writer.write(rows)
+    with pytest.raises(ValueError):
+        writer.write(rows)
+    with pytest.raises(ValueError):
+        writer.close()
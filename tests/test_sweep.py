@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from julia_brot.julia_set import _generate_julia_img
+from julia_brot.sweep import circle_path, julia_sweep, spline_path
+
+__author__ = "Charles Zablit"
+__copyright__ = "Charles Zablit"
+__license__ = "MIT"
+
+
+def test_paths():
+    """Test that the paths go through their points"""
+    path = circle_path(0.5j, 0.25, 4)
+    np.testing.assert_allclose(
+        path, [0.25 + 0.5j, 0.75j, -0.25 + 0.5j, 0.25j], atol=1e-15
+    )
+    points = [0, 1 + 1j, 2]
+    np.testing.assert_allclose(
+        spline_path(points, 5), [0, 0.4375 + 0.5625j, 1 + 1j, 1.5625 + 0.5625j, 2]
+    )
+    assert spline_path(points, 6, closed=True)[::2].tolist() == points
+    with pytest.raises(ValueError):
+        spline_path([0], 3)
+
+
+def test_julia_sweep(tmp_path):
+    """Test that frames are written in order and that sweeps resume"""
+    path = circle_path(0, 0.7885, 6)
+    pattern = str(tmp_path / "frame_{:03d}.png")
+    raw = tmp_path / "frames.rgb"
+    options = dict(pixel_size=0.05, max_iter=40, workers=3)
+    assert julia_sweep(path, frames=pattern, raw=raw, **options) == 6
+    frames = np.fromfile(raw, dtype=np.uint8).reshape(6, 80, 80, 3)
+    for index, c in enumerate(path):
+        image = np.asarray(Image.open(pattern.format(index)))
+        np.testing.assert_array_equal(image, frames[index])
+        expected = np.asarray(_generate_julia_img(c, pixel_size=0.05, max_iter=40))
+        # Colours only differ where the frame has a narrower range of counts.
+        assert (image == expected).all(axis=-1).mean() > 0.5
+
+    # An interrupted sweep: a missing frame and a partly written video.
+    (tmp_path / "frame_004.png").unlink()
+    assert julia_sweep(path, frames=pattern, **options) == 1
+    with open(raw, "r+b") as file:
+        file.truncate(4 * frames[0].nbytes + 100)
+    assert julia_sweep(path, frames=None, raw=raw, **options) == 2
+    np.testing.assert_array_equal(np.fromfile(raw, dtype=np.uint8), frames.ravel())
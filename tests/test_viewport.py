@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from julia_brot.engine import empty_counts, render
+from julia_brot.viewport import ViewportSession
+
+__author__ = "Charles Zablit"
+__copyright__ = "Charles Zablit"
+__license__ = "MIT"
+
+
+def _direct_render(session):
+    """Render the last viewport of a session from scratch"""
+    height, width = session.counts.shape
+    x = (session.col0 + np.arange(width)) * session.pixel_size
+    y = (session.row0 + np.arange(height)) * session.pixel_size
+    out = empty_counts((height, width), session.max_iter, session.dtype)
+    return render(x, y, session.c, session.max_iter, out, julia=session.julia)
+
+
+@pytest.mark.parametrize("julia", [False, True])
+def test_viewport_pan(julia):
+    """Test that pans only compute the exposed pixels and match a direct render"""
+    session = ViewportSession(80, julia=julia, c=-0.8 + 0.156j)
+    counts = session.render(-2 - 1.2j, 0.6 + 1.2j, 0.02)
+    np.testing.assert_array_equal(counts, _direct_render(session))
+    assert session.stats.computed == counts.size and session.stats.reused == 0
+    assert not counts.flags.writeable
+
+    for dx, dy in [(7, 0), (-3, 5), (0, -11), (500, 0)]:
+        computed = session.stats.computed
+        shifted = session.pan(dx, dy)
+        np.testing.assert_array_equal(shifted, _direct_render(session))
+        height, width = shifted.shape
+        shared = max(0, width - abs(dx)) * max(0, height - abs(dy))
+        assert session.stats.computed - computed == shifted.size - shared
+
+
+def test_viewport_zoom():
+    """Test that zooms by powers of two reuse the pixels of both lattices"""
+    session = ViewportSession(100, dtype=np.float32)
+    session.render(-2 - 1.2j, 0.6 + 1.2j, 0.02)
+    height, width = session.counts.shape
+
+    # Every other pixel of every other row is already computed.
+    computed = session.stats.computed
+    np.testing.assert_array_equal(session.zoom(2), _direct_render(session))
+    assert session.counts.shape == (height, width)
+    even_cols = np.count_nonzero((session.col0 + np.arange(width)) % 2 == 0)
+    even_rows = np.count_nonzero((session.row0 + np.arange(height)) % 2 == 0)
+    shared = even_cols * even_rows
+    assert session.stats.computed - computed == width * height - shared
+
+    # Zooming out reuses every pixel of the central quarter.
+    reused = session.stats.reused
+    session.zoom(0.5)
+    np.testing.assert_array_equal(session.counts, _direct_render(session))
+    assert session.stats.reused - reused == shared
+
+    # Other factors do not share any pixel.
+    computed = session.stats.computed
+    session.zoom(3, center=-0.75 + 0.1j)
+    np.testing.assert_array_equal(session.counts, _direct_render(session))
+    assert session.stats.computed - computed == session.counts.size
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from julia_brot.engine import empty_counts, render
+from julia_brot.zoom_video import ExpMapZoom, zoom_video
+
+__author__ = "Charles Zablit"
+__copyright__ = "Charles Zablit"
+__license__ = "MIT"
+
+CENTER = -0.743643887037151 + 0.131825904205330j
+
+
+def _direct_frame(exp_map, index, shift=0.0):
+    """Render a frame of a zoom from scratch, moved by `shift` pixels"""
+    size = exp_map.pixel_size(index)
+    x = exp_map.center.real + (np.arange(exp_map.width) + 0.5 + shift) * size
+    y = exp_map.center.imag + (np.arange(exp_map.height) + 0.5 + shift) * size
+    out = empty_counts((exp_map.height, exp_map.width), exp_map.max_iter)
+    return render(
+        x - exp_map.width * size / 2,
+        y - exp_map.height * size / 2,
+        0,
+        exp_map.max_iter,
+        out,
+    ).astype(np.int64)
+
+
+def test_exp_map_zoom():
+    """Test that reprojected frames match direct renders up to resampling"""
+    exp_map = ExpMapZoom(CENTER, 2.0, 1e4, 60, 96, 64, 200, num_threads=1).render()
+    assert exp_map.pixels < 0.6 * 60 * 96 * 64
+    np.testing.assert_array_equal(exp_map.frame(59), _direct_frame(exp_map, 59))
+    for index in range(0, 59, 7):
+        frame = exp_map.frame(index).astype(np.int64)
+        assert frame.shape == (64, 96)
+        # The counts differ like those of the same frame moved by half a pixel.
+        expected = _direct_frame(exp_map, index)
+        moved = _direct_frame(exp_map, index, 0.5)
+        assert np.mean(frame == expected) >= np.mean(moved == expected) - 0.1
+
+    with pytest.raises(RuntimeError):
+        ExpMapZoom(CENTER, 2.0, 10, 5, 8, 8, 20).frame(0)
+    with pytest.raises(ValueError):
+        ExpMapZoom(CENTER, 2.0, 1e16, 5, 8, 8, 20)
+
+
+def test_zoom_video(tmp_path):
+    """Test that the frames are written in order as PNG files and raw video"""
+    pattern = str(tmp_path / "zoom_{:03d}.png")
+    raw = tmp_path / "zoom.rgb"
+    options = dict(width=40, height=30, max_iter=50, workers=3, num_threads=1)
+    exp_map = zoom_video(CENTER, 1.5, 100, 8, output=pattern, raw=raw, **options)
+    frames = np.fromfile(raw, dtype=np.uint8).reshape(8, 30, 40, 3)
+    for index in range(8):
+        image = np.asarray(Image.open(pattern.format(index)))
+        np.testing.assert_array_equal(image, frames[index])
+    assert not np.array_equal(frames[0], frames[-1])
+    assert exp_map.direct_frames.keys() == {7}